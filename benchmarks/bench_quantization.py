@@ -0,0 +1,181 @@
+"""
+Benchmark memory, recall@k and latency of quantized numpy vector stores.
+
+Each setting stores the same vectors with int8 or binary codes in RAM and the
+float32 matrix memory-mapped on disk, and is compared with an exact float32
+search. Recall@k is the fraction of the exact top-k found, and ``ram_mb``
+the arrays kept in memory; rows of the memory-mapped matrix read for
+rescoring stay in the OS page cache, which the OS reclaims. The vectors are
+clustered synthetic embeddings and the queries noisy copies of stored
+vectors, so no Ollama server is needed; measure recall on your own documents
+with ``src/evaluation/evaluate.py --backend numpy --quantization ...``.
+
+After the searches, ``--writes`` chunks are upserted and as many deleted, as
+an ingestion replacing a document does, and ``ram_mb_after_writes`` shows
+the RAM this adds. ``persist_s`` is the time the next ``persist`` takes.
+
+Usage:
+    python benchmarks/bench_quantization.py --chunks 10000 100000 --k 4 10
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "src"))
+from rag_manger.numpy_store import NumpyVectorStore
+
+
+def clustered_vectors(n: int, dim: int, clusters: int, rng: np.random.Generator) -> np.ndarray:
+    """Unit vectors scattered around random topics, closer to embeddings than uniform noise."""
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, n)]
+    vectors += rng.standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def directory_bytes(path: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(path)
+        for name in names
+    )
+
+
+def open_store(
+    vectors: np.ndarray, workdir: str, quantization: str, rescore_factor: int
+) -> NumpyVectorStore:
+    """Fill a store, persist it and reopen it, as a collection is used after ingestion."""
+    persist_directory = os.path.join(workdir, f"{quantization}-{rescore_factor}")
+    store = NumpyVectorStore(
+        embedding_function=None,
+        persist_directory=persist_directory,
+        quantization=None if quantization == "float32" else quantization,
+        rescore_factor=rescore_factor,
+    )
+    for offset in range(0, len(vectors), 5000):
+        batch = vectors[offset : offset + 5000]
+        ids = [str(offset + i) for i in range(len(batch))]
+        store.upsert_embeddings(ids, batch, [""] * len(batch), [None] * len(batch))
+    store.persist()
+    return NumpyVectorStore(
+        embedding_function=None,
+        persist_directory=persist_directory,
+        quantization=store.quantization,
+        rescore_factor=rescore_factor,
+    )
+
+
+def bench(
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    exact: list,
+    k: int,
+    quantization: str,
+    rescore_factor: int,
+    float_bytes: int,
+    writes: int,
+) -> dict:
+    workdir = tempfile.mkdtemp()
+    try:
+        store = open_store(vectors, workdir, quantization, rescore_factor)
+        store._top_k(queries[0], k)
+        latencies, recalls = [], []
+        for query, expected in zip(queries, exact):
+            start = time.perf_counter()
+            rows, _ = store._top_k(query, k)
+            latencies.append(time.perf_counter() - start)
+            recalls.append(len(expected.intersection(rows.tolist())) / k)
+        latencies = np.array(latencies) * 1000
+        memory = store.memory_bytes()
+
+        rng = np.random.default_rng(0)
+        noise = rng.standard_normal((writes, vectors.shape[1])).astype(np.float32)
+        added = vectors[rng.integers(0, len(vectors), writes)] + noise / np.sqrt(vectors.shape[1])
+        start = time.perf_counter()
+        store.upsert_embeddings(
+            [f"new-{i}" for i in range(writes)], added, [""] * writes, [None] * writes
+        )
+        store.delete([str(i) for i in rng.choice(len(vectors), writes, replace=False)])
+        write_ms = (time.perf_counter() - start) * 1000
+        memory_after_writes = store.memory_bytes()
+        start = time.perf_counter()
+        store.persist()
+        persist_s = time.perf_counter() - start
+        return {
+            "quantization": quantization,
+            "rescore_factor": rescore_factor if quantization != "float32" else None,
+            "chunks": len(vectors),
+            "dim": vectors.shape[1],
+            "k": k,
+            f"recall@{k}": round(float(np.mean(recalls)), 4),
+            "ram_mb": round(memory / 2**20, 2),
+            "ram_saved": round(1 - memory / float_bytes, 3),
+            "disk_mb": round(directory_bytes(workdir) / 2**20, 2),
+            "query_ms_p50": round(float(np.percentile(latencies, 50)), 3),
+            "query_ms_p95": round(float(np.percentile(latencies, 95)), 3),
+            "writes": writes,
+            "write_ms": round(write_ms, 1),
+            "ram_mb_after_writes": round(memory_after_writes / 2**20, 2),
+            "persist_s": round(persist_s, 3),
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--chunks", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--dim", type=int, default=768, help="nomic-embed-text uses 768")
+    parser.add_argument(
+        "--clusters", type=int, default=200, help="Topics the vectors gather around"
+    )
+    parser.add_argument(
+        "--noise", type=float, default=0.5, help="Distance of a query from its stored vector"
+    )
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, nargs="+", default=[4, 10])
+    parser.add_argument("--rescore-factors", type=int, nargs="+", default=[1, 4, 10])
+    parser.add_argument("--quantizations", nargs="+", default=["int8", "binary"])
+    parser.add_argument(
+        "--writes", type=int, default=1000, help="Chunks upserted and deleted after the searches"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = []
+    rng = np.random.default_rng(args.seed)
+    for n in args.chunks:
+        vectors = clustered_vectors(n, args.dim, args.clusters, rng)
+        queries = vectors[rng.integers(0, n, args.queries)]
+        noise = rng.standard_normal(queries.shape).astype(np.float32) / np.sqrt(args.dim)
+        queries = queries + args.noise * noise
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+        for k in args.k:
+            # Exact top-k, the reference recall is measured against
+            exact = [set(np.argpartition(-(vectors @ q), k - 1)[:k].tolist()) for q in queries]
+            settings = [("float32", 1)] + [
+                (quantization, factor)
+                for quantization in args.quantizations
+                for factor in args.rescore_factors
+            ]
+            for quantization, factor in settings:
+                result = bench(
+                    vectors, queries, exact, k, quantization, factor, vectors.nbytes, args.writes
+                )
+                print(json.dumps(result))
+                results.append(result)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
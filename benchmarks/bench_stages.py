@@ -0,0 +1,285 @@
+"""
+Benchmark every stage of the RAG pipeline against a local fake Ollama server.
+
+Synthetic PDFs of increasing size are parsed, split, embedded, upserted and
+queried through ``Rag``, so the numbers reflect this project's code and not
+the speed of a model. Model latency is simulated with the ``--embed-latency``,
+``--first-token-latency`` and ``--token-latency`` options.
+
+Usage:
+    python benchmarks/bench_stages.py --pages 10 100 500 --output results.json
+    python benchmarks/bench_stages.py --pages 100 --compare results.json
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "src"))
+import config
+from utils.fake_ollama import FakeOllamaServer
+
+VOCABULARY = (
+    "system data model report policy network customer process service value "
+    "energy market result analysis method design control quality security budget "
+    "contract delivery schedule risk supplier invoice payment training safety audit"
+).split()
+
+
+def synthetic_pages(pages: int, words_per_page: int, seed: int) -> list:
+    """Return page texts, each opening with a sentence naming a unique fact."""
+    rng = random.Random(seed)
+    texts = []
+    for page in range(pages):
+        words = [rng.choice(VOCABULARY) for _ in range(words_per_page)]
+        fact = f"Section {page}. The reference code of section {page} is CODE-{page:05d}."
+        texts.append(f"{fact} {' '.join(words)}")
+    return texts
+
+
+def make_pdf(pages: list) -> bytes:
+    """Write a minimal valid PDF with one line-wrapped text page per entry."""
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [{}] /Count {} >>".format(
+            " ".join(f"{4 + 2 * i} 0 R" for i in range(len(pages))), len(pages)
+        ),
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i, text in enumerate(pages):
+        words, lines, line = text.split(), [], []
+        for word in words:
+            line.append(word)
+            if len(line) == 12:
+                lines.append(" ".join(line))
+                line = []
+        if line:
+            lines.append(" ".join(line))
+        body = " ".join(f"({l}) Tj T*" for l in lines)
+        stream = f"BT /F1 10 Tf 12 TL 50 750 Td {body} ET"
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {5 + 2 * i} 0 R "
+            "/Resources << /Font << /F1 3 0 R >> >> >>"
+        )
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{obj}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n".encode()
+    out += f"startxref\n{xref}\n%%EOF\n".encode()
+    return out
+
+
+def summarize(latencies: list) -> dict:
+    values = np.array(latencies) * 1000
+    return {
+        "ms_p50": round(float(np.percentile(values, 50)), 3),
+        "ms_p95": round(float(np.percentile(values, 95)), 3),
+        "ms_mean": round(float(values.mean()), 3),
+    }
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def bench(pages: int, args, workdir: str) -> dict:
+    from rag_manger.ingestion import IngestionPipeline
+    from rag_manger.rag import Rag
+    from utils.utils import iter_pages
+
+    # A fresh embedding cache per run, so embeddings are really computed
+    config.EMBEDDING_CACHE_CONFIG["path"] = os.path.join(workdir, f"embeddings-{pages}.sqlite3")
+    texts = synthetic_pages(pages, args.words_per_page, args.seed)
+    pdf = make_pdf(texts)
+    name = f"synthetic-{pages}.pdf"
+
+    stages = {}
+    documents, seconds = timed(lambda: list(iter_pages(name, io.BytesIO(pdf))))
+    stages["parse"] = {"seconds": seconds, "items": len(documents)}
+
+    rag = Rag(
+        args.llm_model,
+        embeddings_model=args.embeddings_model,
+        collection_name=f"bench-{pages}",
+        persist_directory=os.path.join(workdir, f"store-{pages}"),
+        vector_store=args.backend,
+    )
+    # Every question is new to the semantic cache
+    rag.semantic_cache.similarity_threshold = 2.0
+
+    chunks, seconds = timed(rag.create_chuncks, documents)
+    stages["split"] = {"seconds": seconds, "items": len(chunks)}
+
+    size = rag.ingestion.batch_size
+    batches = [chunks[i : i + size] for i in range(0, len(chunks), size)]
+    vectors, seconds = timed(lambda: [rag.ingestion._embed_batch(batch) for batch in batches])
+    stages["embed"] = {"seconds": seconds, "items": len(chunks)}
+
+    scratch = Rag(
+        args.llm_model,
+        embeddings_model=args.embeddings_model,
+        collection_name=f"bench-{pages}-upsert",
+        persist_directory=os.path.join(workdir, f"store-{pages}-upsert"),
+        vector_store=args.backend,
+    ).load_vector_db()
+    _, seconds = timed(
+        lambda: [IngestionPipeline.upsert(scratch, batch, v) for batch, v in zip(batches, vectors)]
+    )
+    stages["upsert"] = {"seconds": seconds, "items": len(chunks)}
+    scratch.delete_collection()
+
+    # End to end ingestion with a cold embedding cache
+    rag.embedding_cache.clear()
+    _, seconds = timed(rag.create_vector_db, documents)
+    stages["create_vector_db"] = {"seconds": seconds, "items": len(chunks)}
+
+    rng = random.Random(args.seed)
+    questions = [
+        f"What is the reference code of section {rng.randrange(pages)}?"
+        for _ in range(args.queries)
+    ]
+    vector_db = rag.load_vector_db()
+    rag.get_chain(vector_db)
+    retrieve, hits = [], 0
+    for question in questions:
+        docs, seconds = timed(rag.retriever.invoke, question)
+        retrieve.append(seconds)
+        section = question.split("section ")[1].rstrip("?")
+        hits += any(f"CODE-{int(section):05d}" in doc.page_content for doc in docs)
+    stages["retrieve"] = {"seconds": sum(retrieve), "items": len(questions), **summarize(retrieve)}
+
+    run = []
+    for question in questions:
+        _, seconds = timed(rag.run, question, vector_db)
+        run.append(seconds)
+    stages["run"] = {"seconds": sum(run), "items": len(questions), **summarize(run)}
+
+    ttft, generate = [], []
+    for question in questions:
+        start = time.perf_counter()
+        for _ in rag.stream(question, vector_db):
+            pass
+        generate.append(time.perf_counter() - start)
+        ttft.append(rag.last_ttft)
+    stages["stream"] = {"seconds": sum(generate), "items": len(questions), **summarize(generate)}
+    stages["first_token"] = {"seconds": sum(ttft), "items": len(questions), **summarize(ttft)}
+
+    for stage in stages.values():
+        seconds = stage["seconds"]
+        stage["per_second"] = round(stage["items"] / seconds, 1) if seconds else None
+        stage["seconds"] = round(stage["seconds"], 4)
+    vector_db.delete_collection()
+    return {
+        "pages": pages,
+        "chunks": len(chunks),
+        "backend": args.backend,
+        "retrieval_hit_rate": round(hits / len(questions), 3),
+        "stages": stages,
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except OSError:
+        return ""
+
+
+def compare(results: list, baseline_path: str) -> None:
+    """Print the relative change of every stage's time against a previous run."""
+    with open(baseline_path) as f:
+        baseline = {run["pages"]: run for run in json.load(f)["runs"]}
+    for run in results:
+        previous = baseline.get(run["pages"])
+        if previous is None:
+            continue
+        for stage, values in run["stages"].items():
+            before = previous["stages"].get(stage, {}).get("seconds")
+            if before:
+                change = (values["seconds"] - before) / before * 100
+                print(
+                    f"pages={run['pages']:<6} {stage:<18} {before:>9.4f}s -> "
+                    f"{values['seconds']:>9.4f}s ({change:+.1f}%)"
+                )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--words-per-page", type=int, default=400)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument(
+        "--backend", choices=["chroma", "numpy"], default=config.VECTOR_STORE_CONFIG["backend"]
+    )
+    parser.add_argument("--llm-model", default="llama3.2:latest")
+    parser.add_argument("--embeddings-model", default="nomic-embed-text:latest")
+    parser.add_argument(
+        "--embed-latency", type=float, default=0.0, help="Seconds per embedding request"
+    )
+    parser.add_argument(
+        "--first-token-latency", type=float, default=0.0, help="Seconds before the first token"
+    )
+    parser.add_argument(
+        "--token-latency", type=float, default=0.0, help="Seconds between tokens"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--compare", help="Previous results file to compare against")
+    args = parser.parse_args()
+
+    server = FakeOllamaServer(
+        embed_latency=args.embed_latency,
+        chat_first_token_latency=args.first_token_latency,
+        chat_token_latency=args.token_latency,
+    )
+    with server, tempfile.TemporaryDirectory() as workdir:
+        # The Ollama clients read the host when the Rag instances are created
+        os.environ["OLLAMA_HOST"] = server.url
+        runs = []
+        for pages in args.pages:
+            run = bench(pages, args, workdir)
+            print(json.dumps(run))
+            runs.append(run)
+
+    results = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "config": {
+            key: value for key, value in vars(args).items() if key not in ("output", "compare")
+        },
+        "ingestion": config.INGESTION_CONFIG,
+        "retrieval": config.RETRIEVAL_CONFIG,
+        "runs": runs,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        compare(runs, args.compare)
+
+
+if __name__ == "__main__":
+    main()
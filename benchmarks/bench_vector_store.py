@@ -0,0 +1,115 @@
+"""
+Benchmark query latency and memory of the Chroma and numpy vector store backends.
+
+Random unit vectors stand in for embeddings, so no Ollama server is needed.
+
+Usage:
+    python benchmarks/bench_vector_store.py --sizes 1000 10000 100000 --dim 768
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import uuid
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "src"))
+from langchain_community.vectorstores import Chroma
+from rag_manger.numpy_store import NumpyVectorStore
+
+
+def rss_bytes() -> int:
+    """Current resident set size of this process (Linux), 0 if unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+
+def random_unit_vectors(n: int, dim: int, rng: np.random.Generator) -> np.ndarray:
+    vectors = rng.standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def fill(store, vectors: np.ndarray, batch_size: int = 5000) -> float:
+    """Upsert the vectors in batches and return the elapsed seconds."""
+    start = time.perf_counter()
+    for offset in range(0, len(vectors), batch_size):
+        batch = vectors[offset : offset + batch_size]
+        ids = [str(uuid.uuid4()) for _ in batch]
+        texts = [f"chunk {offset + i}" for i in range(len(batch))]
+        if isinstance(store, Chroma):
+            store._collection.upsert(ids=ids, embeddings=batch.tolist(), documents=texts)
+        else:
+            store.upsert_embeddings(ids, batch, texts, [None] * len(batch))
+    return time.perf_counter() - start
+
+
+def query_latencies(store, queries: np.ndarray, k: int) -> list:
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        store.similarity_search_by_vector(query.tolist(), k=k)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def bench(backend: str, n: int, dim: int, queries: int, k: int, seed: int) -> dict:
+    rng = np.random.default_rng(seed)
+    vectors = random_unit_vectors(n, dim, rng)
+    query_vectors = random_unit_vectors(queries, dim, rng)
+    gc.collect()
+    rss_before = rss_bytes()
+    if backend == "chroma":
+        store = Chroma(collection_name=f"bench-{uuid.uuid4().hex[:8]}")
+    else:
+        store = NumpyVectorStore(embedding_function=None)
+    insert_seconds = fill(store, vectors)
+    # Warm up caches and lazily built indexes before timing queries
+    query_latencies(store, query_vectors[:5], k)
+    latencies = np.array(query_latencies(store, query_vectors, k)) * 1000
+    result = {
+        "backend": backend,
+        "chunks": n,
+        "dim": dim,
+        "k": k,
+        "insert_seconds": round(insert_seconds, 3),
+        "query_ms_p50": round(float(np.percentile(latencies, 50)), 3),
+        "query_ms_p95": round(float(np.percentile(latencies, 95)), 3),
+        "query_ms_mean": round(float(latencies.mean()), 3),
+        "rss_delta_mb": round((rss_bytes() - rss_before) / 2**20, 1),
+    }
+    if backend == "chroma":
+        store.delete_collection()
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--dim", type=int, default=768, help="nomic-embed-text uses 768")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--backends", nargs="+", default=["numpy", "chroma"])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = []
+    for n in args.sizes:
+        for backend in args.backends:
+            result = bench(backend, n, args.dim, args.queries, args.k, args.seed)
+            print(json.dumps(result))
+            results.append(result)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
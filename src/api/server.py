@@ -0,0 +1,437 @@
+"""
+Headless HTTP API for ingesting documents into and querying RAG collections.
+
+Blocking RAG work (parsing, embedding, retrieval, generation) runs on a
+bounded thread pool, so the event loop keeps serving other requests while a
+slow generation is in progress.
+
+Usage:
+    python src/api/server.py
+    uvicorn api.server:app --app-dir src
+
+Run a single worker process. Ingestion jobs, the per-collection write locks,
+the loaded collections and the caches live in the memory of the process, so
+with several workers a job status request could reach a worker that does not
+know the job, and two workers could write to the same collection at once.
+Concurrency comes from the thread pool within the process.
+
+Every collection is a namespace of its own, in its own directory, managed by
+``rag_manger.collection_manager``: idle collections are unloaded from memory
+and uploads are refused once a disk quota is reached.
+
+Endpoints:
+    GET    /health
+    GET    /models
+    GET    /collections
+    DELETE /collections/{collection}
+    GET    /collections/{collection}/documents
+    POST   /collections/{collection}/documents           multipart files, or raw body
+                                                          with ?filename=; add
+                                                          ?background=true to get 202
+                                                          and ingestion jobs to poll
+    GET    /collections/{collection}/jobs
+    GET    /jobs/{job_id}
+    DELETE /collections/{collection}/documents/{doc_id}
+    GET    /collections/{collection}/documents/{doc_id}/pages/{page}   PNG of a PDF page,
+                                                          from 1, ?width= in pixels
+    POST   /collections/{collection}/query               {"question": ..., "model": ...,
+                                                          "sources": [...], "pages": [1, 10]}
+    POST   /collections/{collection}/query/stream        same body, server-sent events
+"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict
+from typing import Iterator, Optional, Tuple
+
+import anyio
+from starlette.applications import Starlette
+from starlette.concurrency import iterate_in_threadpool
+from starlette.requests import Request
+from starlette.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from config import API_CONFIG
+from rag_manger.collection_manager import (
+    COLLECTION_PATTERN,
+    QuotaExceededError,
+    collection_manager,
+)
+from rag_manger.jobs import job_manager
+from rag_manger.rag import Rag
+from rag_manger.retrieval import metadata_filter
+from utils.logging_utils import logger
+from utils.metrics import metrics, span
+from utils.ollama_client import catalog
+from utils.page_renderer import page_renderer
+from utils.utils import content_hash, iter_chunks, spill_to_file
+
+_limiter = anyio.CapacityLimiter(API_CONFIG["max_threads"])
+
+
+class APIError(Exception):
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+
+
+def validate(collection: str) -> str:
+    if not COLLECTION_PATTERN.match(collection):
+        raise APIError(400, f"Invalid collection name: {collection}")
+    return collection
+
+
+def get_rag(collection: str, llm_model: str = None) -> Rag:
+    """Return the RAG engine of a collection, loading it if it is not in memory."""
+    return collection_manager.get(
+        validate(collection),
+        llm_model or API_CONFIG["llm_model"],
+        API_CONFIG["embeddings_model"],
+    )
+
+
+@contextmanager
+def checkout_rag(collection: str, llm_model: str = None) -> Iterator[Rag]:
+    """Like ``get_rag``, but keep the collection loaded until the block exits."""
+    with collection_manager.checkout(
+        validate(collection),
+        llm_model or API_CONFIG["llm_model"],
+        API_CONFIG["embeddings_model"],
+    ) as rag:
+        yield rag
+
+
+def write_lock(collection: str) -> threading.Lock:
+    """Lock serializing ingestion and deletion within a collection, shared with background jobs."""
+    return job_manager.lock(collection)
+
+
+async def run_blocking(function, *args):
+    return await anyio.to_thread.run_sync(function, *args, limiter=_limiter)
+
+
+def client_id(request: Request) -> str:
+    """Identify the caller for fair generation queueing."""
+    if request.headers.get("x-client-id"):
+        return request.headers["x-client-id"]
+    return request.client.host if request.client else "anonymous"
+
+
+async def spill_body(request: Request, limit: int) -> str:
+    """
+    Write a raw request body to a temporary file, refusing it once it grows past ``limit`` bytes.
+
+    Returns:
+        str: The path of the file, which the caller removes.
+    """
+    if int(request.headers.get("content-length") or 0) > limit:
+        raise APIError(413, "File too large")
+    size = 0
+    f = tempfile.NamedTemporaryFile(prefix="upload-", delete=False)
+    try:
+        with f:
+            async for chunk in request.stream():
+                size += len(chunk)
+                if size > limit:
+                    raise APIError(413, "File too large")
+                f.write(chunk)
+    except BaseException:
+        os.remove(f.name)
+        raise
+    return f.name
+
+
+async def read_question(request: Request) -> Tuple[str, str, Optional[dict]]:
+    """Read the question, model and metadata filter of a query body."""
+    try:
+        body = await request.json()
+    except ValueError:
+        raise APIError(400, "Expected a JSON body")
+    question = body.get("question") if isinstance(body, dict) else None
+    if not question:
+        raise APIError(400, "Missing 'question'")
+    sources = body.get("sources") or []
+    pages = body.get("pages") or [None, None]
+    if not isinstance(sources, list) or not all(isinstance(s, str) for s in sources):
+        raise APIError(400, "'sources' must be a list of file names")
+    if (
+        not isinstance(pages, list)
+        or len(pages) != 2
+        or not all(p is None or isinstance(p, int) for p in pages)
+    ):
+        raise APIError(400, "'pages' must be [first, last], from 1, either may be null")
+    return question, body.get("model"), metadata_filter(sources, *pages)
+
+
+async def health(request: Request) -> Response:
+    return JSONResponse({"status": "ok"})
+
+
+async def models(request: Request) -> Response:
+    try:
+        return JSONResponse({"models": await run_blocking(catalog.models)})
+    except Exception as e:
+        raise APIError(502, f"Could not reach Ollama: {e}")
+
+
+async def list_collections(request: Request) -> Response:
+    infos = await run_blocking(collection_manager.list)
+    return JSONResponse({"collections": [asdict(info) for info in infos]})
+
+
+async def delete_collection(request: Request) -> Response:
+    collection = validate(request.path_params["collection"])
+
+    def delete() -> None:
+        job_manager.cancel(collection)
+        with write_lock(collection):
+            collection_manager.delete(collection)
+
+    await run_blocking(delete)
+    return JSONResponse({"deleted": collection})
+
+
+async def list_documents(request: Request) -> Response:
+    rag = await run_blocking(get_rag, request.path_params["collection"])
+    return JSONResponse({"documents": [asdict(record) for record in rag.list_documents()]})
+
+
+def ingest_file(collection: str, file_name: str, path: str) -> dict:
+    """Parse, split, embed and index one file, skipping it if already indexed."""
+    with checkout_rag(collection) as rag, open(path, "rb") as f:
+        digest = content_hash(f)
+        record = rag.add_document_stream(
+            file_name,
+            digest,
+            iter_chunks(file_name, f, API_CONFIG["embeddings_model"]),
+            source_file=f,
+            lock=write_lock(collection),
+        )
+    if record is None:
+        existing = rag.registry.find_by_hash(digest)
+        doc_id = existing.doc_id if existing is not None else None
+        return {"source": file_name, "status": "unchanged", "doc_id": doc_id}
+    return {"source": file_name, "status": "indexed", **asdict(record)}
+
+
+def submit_file(collection: str, file_name: str, path: str):
+    """Queue a background job ingesting one file, which then owns ``path``."""
+    with open(path, "rb") as f:
+        digest = content_hash(f)
+    return job_manager.submit(
+        collection,
+        file_name,
+        path,
+        digest,
+        API_CONFIG["llm_model"],
+        API_CONFIG["embeddings_model"],
+    )
+
+
+async def ingest(request: Request) -> Response:
+    rag = await run_blocking(get_rag, request.path_params["collection"])
+    # (file name, temporary file) pairs, removed on the way out unless a job took them
+    files, too_large = [], []
+    try:
+        if request.headers.get("content-type", "").startswith("multipart/form-data"):
+            async with request.form(max_part_size=API_CONFIG["max_upload_bytes"]) as form:
+                for upload in form.getlist("files") or form.getlist("file"):
+                    # File parts are spooled to disk; refuse big ones before copying them
+                    if upload.size is not None and upload.size > API_CONFIG["max_upload_bytes"]:
+                        too_large.append(upload.filename)
+                    else:
+                        with span("upload_read", source=upload.filename) as attributes:
+                            path = await run_blocking(spill_to_file, upload.file)
+                            attributes["bytes"] = os.path.getsize(path)
+                        files.append((upload.filename, path))
+        else:
+            file_name = request.query_params.get("filename")
+            if not file_name:
+                raise APIError(400, "Send multipart 'files', or a raw body with ?filename=")
+            with span("upload_read", source=file_name) as attributes:
+                path = await spill_body(request, API_CONFIG["max_upload_bytes"])
+                attributes["bytes"] = os.path.getsize(path)
+            files.append((file_name, path))
+        if not files and not too_large:
+            raise APIError(400, "No file uploaded")
+        results = [
+            {"source": file_name, "status": "error", "error": "File too large"}
+            for file_name in too_large
+        ]
+        try:
+            await run_blocking(
+                collection_manager.check_quota,
+                rag.collection_name,
+                sum(os.path.getsize(path) for _, path in files),
+            )
+        except QuotaExceededError as e:
+            raise APIError(507, str(e))
+
+        if request.query_params.get("background") in ("1", "true"):
+            jobs = []
+            while files:
+                file_name, path = files[0]
+                jobs.append(await run_blocking(submit_file, rag.collection_name, file_name, path))
+                files.pop(0)
+            return JSONResponse(
+                {"jobs": [job_status(job) for job in jobs], "errors": results},
+                status_code=202 if jobs else 413,
+            )
+
+        for file_name, path in files:
+            try:
+                results.append(
+                    await run_blocking(ingest_file, rag.collection_name, file_name, path)
+                )
+            except Exception as e:
+                logger.error(f"Failed to ingest {file_name}: {e}")
+                results.append({"source": file_name, "status": "error", "error": str(e)})
+        status = 200 if all(r["status"] != "error" for r in results) else 207
+        return JSONResponse({"results": results}, status_code=status)
+    finally:
+        for _, path in files:
+            os.remove(path)
+
+
+def job_status(job) -> dict:
+    return {**asdict(job), "finished": job.finished, "progress": job.progress}
+
+
+async def list_jobs(request: Request) -> Response:
+    collection = validate(request.path_params["collection"])
+    return JSONResponse({"jobs": [job_status(job) for job in job_manager.list(collection)]})
+
+
+async def get_job(request: Request) -> Response:
+    job = job_manager.get(request.path_params["job_id"])
+    if job is None:
+        raise APIError(404, f"Unknown job: {request.path_params['job_id']}")
+    return JSONResponse(job_status(job))
+
+
+async def page_image(request: Request) -> Response:
+    rag = await run_blocking(get_rag, request.path_params["collection"])
+    record = rag.registry.get(request.path_params["doc_id"])
+    path = rag.source_path(record.content_hash) if record is not None else None
+    if path is None:
+        raise APIError(404, f"No PDF for document: {request.path_params['doc_id']}")
+    try:
+        width = int(request.query_params.get("width", 0)) or None
+    except ValueError:
+        raise APIError(400, "'width' must be an integer")
+    image = await run_blocking(
+        page_renderer.render, path, record.content_hash, request.path_params["page"] - 1, width
+    )
+    if image is None:
+        raise APIError(404, f"No page {request.path_params['page']}")
+    return FileResponse(image, media_type="image/png")
+
+
+async def delete_document(request: Request) -> Response:
+    rag = await run_blocking(get_rag, request.path_params["collection"])
+    doc_id = request.path_params["doc_id"]
+    if rag.registry.get(doc_id) is None:
+        raise APIError(404, f"Unknown document: {doc_id}")
+
+    def delete() -> None:
+        with write_lock(rag.collection_name):
+            rag.delete_document(doc_id)
+
+    await run_blocking(delete)
+    return JSONResponse({"deleted": doc_id})
+
+
+async def query(request: Request) -> Response:
+    question, model, search_filter = await read_question(request)
+    rag = await run_blocking(get_rag, request.path_params["collection"], model)
+    if search_filter is None:
+        cached = await run_blocking(rag.cached_answer, question)
+        if cached is not None:
+            return JSONResponse({"answer": cached, "cached": True})
+
+    def answer() -> str:
+        with checkout_rag(request.path_params["collection"], model) as rag:
+            return rag.run(
+                question,
+                rag.load_vector_db(),
+                client_id(request),
+                search_filter,
+                check_cache=False,
+            )
+
+    return JSONResponse({"answer": await run_blocking(answer), "cached": False})
+
+
+async def query_stream(request: Request) -> Response:
+    question, model, search_filter = await read_question(request)
+    # Validates the collection before the response starts
+    await run_blocking(get_rag, request.path_params["collection"], model)
+
+    def generate() -> Iterator[str]:
+        # Held until the last token, so the collection is not unloaded mid-stream
+        with checkout_rag(request.path_params["collection"], model) as rag:
+            yield from rag.stream(question, rag.load_vector_db(), client_id(request), search_filter)
+
+    async def events():
+        # rag.last_ttft is shared by concurrent requests, so time this stream here
+        start, ttft = time.perf_counter(), None
+        # Every next() of the generator runs on the thread pool
+        tokens = generate()
+        try:
+            async for token in iterate_in_threadpool(tokens):
+                if ttft is None:
+                    ttft = time.perf_counter() - start
+                yield f"data: {json.dumps({'token': token})}\n\n"
+        finally:
+            # Releases the checkout at once if the client disconnects
+            tokens.close()
+        yield f"data: {json.dumps({'done': True, 'ttft': ttft})}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+async def prometheus(request: Request) -> Response:
+    return Response(metrics.prometheus_text(), media_type="text/plain; version=0.0.4")
+
+
+async def api_error(request: Request, exc: APIError) -> Response:
+    return JSONResponse({"error": exc.message}, status_code=exc.status_code)
+
+
+app = Starlette(
+    routes=[
+        Route("/health", health),
+        Route("/models", models),
+        Route("/metrics", prometheus),
+        Route("/collections", list_collections, methods=["GET"]),
+        Route("/collections/{collection}", delete_collection, methods=["DELETE"]),
+        Route("/jobs/{job_id}", get_job, methods=["GET"]),
+        Route("/collections/{collection}/jobs", list_jobs, methods=["GET"]),
+        Route("/collections/{collection}/documents", list_documents, methods=["GET"]),
+        Route("/collections/{collection}/documents", ingest, methods=["POST"]),
+        Route(
+            "/collections/{collection}/documents/{doc_id}", delete_document, methods=["DELETE"]
+        ),
+        Route(
+            "/collections/{collection}/documents/{doc_id}/pages/{page:int}",
+            page_image,
+            methods=["GET"],
+        ),
+        Route("/collections/{collection}/query", query, methods=["POST"]),
+        Route("/collections/{collection}/query/stream", query_stream, methods=["POST"]),
+    ],
+    exception_handlers={APIError: api_error},
+)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host=API_CONFIG["host"], port=API_CONFIG["port"])
@@ -4,3 +4,162 @@ PAGE_CONFIG = {
     "layout": "wide",
     "initial_sidebar_state": "collapsed",
 }
+
+EMBEDDING_CACHE_CONFIG = {
+    "path": "./.cache/embeddings.sqlite3",
+    "max_entries": 200_000,
+}
+
+RENDER_CONFIG = {
+    # PNG previews of PDF pages, keyed by file hash, page and width
+    "cache_dir": "./.cache/pages",
+    # Least recently viewed pages are deleted above this size, in bytes
+    "max_bytes": 512 * 2**20,
+    # Widths are rounded to this step, in pixels
+    "width_step": 50,
+    # Width the pages cited by an answer are pre-rendered at
+    "default_width": 700,
+    "max_width": 2000,
+    "max_workers": 2,
+}
+
+INGESTION_CONFIG = {
+    "batch_size": 32,
+    "max_workers": 4,
+}
+
+# Chunk sizes in tokens, per embedding model (without the ":tag")
+CHUNKING_CONFIG = {
+    "default": {"chunk_tokens": 512, "overlap_tokens": 64},
+    "nomic-embed-text": {"chunk_tokens": 512, "overlap_tokens": 64},
+    "mxbai-embed-large": {"chunk_tokens": 384, "overlap_tokens": 48},
+    "all-minilm": {"chunk_tokens": 224, "overlap_tokens": 32},
+}
+
+PARSING_CONFIG = {
+    # None lets the process pool use every available core
+    "max_workers": None,
+    # Background jobs parse PDFs this many pages per task, and keep at most
+    # tasks_ahead parsed tasks waiting for embedding, so memory stays bounded
+    "pages_per_task": 8,
+    "tasks_ahead": 4,
+}
+
+RETRIEVAL_CONFIG = {
+    "k": 4,
+    # Set to False to skip the LLM query expansion round-trip entirely
+    "expand_queries": True,
+    # Latency budget in seconds for expansion and variant searches
+    "expansion_timeout": 3.0,
+    # Fuse BM25 keyword search with vector search
+    "hybrid": True,
+    # Re-rank fetch_k candidates with maximal marginal relevance down to k, to
+    # drop near-duplicate chunks; mmr_lambda 1 ranks by relevance only, 0 by diversity only
+    "mmr": True,
+    "mmr_lambda": 0.7,
+    "fetch_k": 20,
+    # Two-stage retrieval: when the collection holds more documents than this,
+    # only the chunks of the max_documents documents closest to the question
+    # are searched; 0 always searches every chunk
+    "max_documents": 5,
+}
+
+SEMANTIC_CACHE_CONFIG = {
+    # Minimum cosine similarity between two questions to reuse an answer
+    "similarity_threshold": 0.92,
+    "max_entries": 1024,
+}
+
+VECTOR_STORE_CONFIG = {
+    # "chroma" or "numpy" (in-process float32 matrix, for small per-session collections)
+    "backend": "chroma",
+    # Memory-map the persisted matrix of the numpy backend instead of loading it
+    "mmap": False,
+    # Numpy backend only: search "int8" (4x smaller) or "binary" (32x smaller)
+    # copies of the vectors first, keeping only them in RAM, then rescore the
+    # best rescore_factor * k rows with the memory-mapped float32 matrix.
+    # benchmarks/bench_quantization.py measures memory and recall of each setting
+    "quantization": None,
+    "rescore_factor": 4,
+}
+
+# Token budget of the retrieved context and of the answer, per chat model
+# (without the ":tag"). The model's context window (num_ctx) is sized from them.
+GENERATION_CONFIG = {
+    "default": {"context_tokens": 1536, "answer_tokens": 512},
+    "llama3.2": {"context_tokens": 2048, "answer_tokens": 512},
+}
+
+METRICS_CONFIG = {
+    # Upper bounds, in seconds, of the stage duration histogram buckets
+    "buckets": [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0],
+    # Number of recent spans kept for percentiles and the JSON lines export
+    "window": 1024,
+    # Append every span to this file as a JSON line, None to disable
+    "jsonl_path": None,
+    # Serve the Prometheus text format at http://host:port/metrics, None to disable
+    "prometheus_host": "127.0.0.1",
+    "prometheus_port": 9464,
+}
+
+OLLAMA_CONFIG = {
+    # Server URL, None to use the OLLAMA_HOST environment variable or the default
+    "host": None,
+    # Seconds before a request is abandoned, None to wait indefinitely
+    "timeout": None,
+    # Connection pool shared by model listing, embeddings and chat
+    "max_connections": 16,
+    "max_keepalive_connections": 8,
+    "keepalive_expiry": 60.0,
+    # Seconds the list of installed models is cached for
+    "catalog_ttl": 30.0,
+    # Seconds Ollama keeps a model loaded after its last request
+    "keep_alive": 1800,
+}
+
+API_CONFIG = {
+    "host": "127.0.0.1",
+    "port": 8000,
+    # Models used when a request does not name one
+    "llm_model": "llama3.2:latest",
+    "embeddings_model": "nomic-embed-text:latest",
+    # Threads running blocking RAG work (parsing, embedding, generation)
+    "max_threads": 32,
+    # Largest accepted upload, in bytes
+    "max_upload_bytes": 200 * 2**20,
+}
+
+SCHEDULER_CONFIG = {
+    # Embedding requests arriving within max_wait seconds of each other are sent
+    # to Ollama as one request of up to embed_batch_size texts
+    "embed_batch_size": 64,
+    "embed_max_wait": 0.01,
+    # Embedding requests sent to Ollama at the same time, per model
+    "embed_max_in_flight": 2,
+    # Answers generated at the same time; further requests queue fairly per client
+    "max_concurrent_generations": 2,
+}
+
+COLLECTIONS_CONFIG = {
+    # One subdirectory per session or workspace, each with its own collection
+    "root": "./chroma_db",
+    # Collections kept loaded in memory; the least recently used ones beyond
+    # this are unloaded once unused for min_idle_seconds
+    "max_loaded": 8,
+    "min_idle_seconds": 60,
+    # Seconds without access after which a collection is unloaded from memory
+    "idle_seconds": 900,
+    # Disk quotas, in bytes, per collection and for all of them; None for no limit
+    "max_collection_bytes": 2 * 2**30,
+    "max_total_bytes": 20 * 2**30,
+    # Seconds without access after which a collection is deleted, None to keep it
+    "retention_seconds": 30 * 24 * 3600,
+}
+
+JOBS_CONFIG = {
+    # Background ingestion jobs embedding at once, across all collections; their
+    # files are parsed alongside on a process pool of PARSING_CONFIG["max_workers"]
+    "max_workers": 2,
+    # Finished jobs remembered for status queries
+    "history": 100,
+}
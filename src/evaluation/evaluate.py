@@ -0,0 +1,302 @@
+"""
+Evaluate retrieval quality and latency of the RAG pipeline on a QA dataset.
+
+Every context of the dataset is ingested through ``Rag`` as its own document,
+then every question is retrieved (and optionally answered) and scored against
+the context it was written from. By default the pipeline runs offline against
+the fake Ollama server, whose embeddings are a deterministic hashed
+bag-of-words; pass ``--ollama-host`` to evaluate real models.
+
+Datasets are either a SQuAD JSON file, or the ``context_data.csv`` /
+``qa_data.csv`` pair written by ``eval.ipynb``.
+
+Usage:
+    python src/evaluation/evaluate.py --dataset dev-v2.0.json --limit 200 --k 4 8
+    python src/evaluation/evaluate.py --contexts context_data.csv --qa qa_data.csv \\
+        --chunk-tokens 256 --no-expand --generate --output eval.json
+    python src/evaluation/evaluate.py --dataset dev-v2.0.json --mmr-lambda 0.5 --fetch-k 40
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+import config
+from langchain_core.documents import Document
+from utils.fake_ollama import FakeOllamaServer
+
+
+@dataclass
+class QAExample:
+    """A question, its reference answer and the id of the context that answers it."""
+
+    question: str
+    answer: str
+    context_id: str
+
+
+def load_squad(path: str) -> Tuple[Dict[str, str], List[QAExample]]:
+    """
+    Load a SQuAD JSON file.
+
+    Returns:
+        Tuple[Dict[str, str], List[QAExample]]: Contexts by id and the answerable questions.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        squad = json.load(f)
+    contexts: Dict[str, str] = {}
+    ids: Dict[str, str] = {}
+    examples = []
+    for article in squad["data"]:
+        for paragraph in article["paragraphs"]:
+            context = paragraph["context"]
+            if context not in ids:
+                ids[context] = str(len(ids))
+                contexts[ids[context]] = context
+            for qa in paragraph["qas"]:
+                if qa["answers"]:
+                    examples.append(
+                        QAExample(qa["question"], qa["answers"][0]["text"], ids[context])
+                    )
+    return contexts, examples
+
+
+def load_csv(contexts_path: str, qa_path: str) -> Tuple[Dict[str, str], List[QAExample]]:
+    """
+    Load the context and QA CSV files written by ``eval.ipynb``.
+
+    Returns:
+        Tuple[Dict[str, str], List[QAExample]]: Contexts by id and the questions.
+    """
+    with open(contexts_path, "r", encoding="utf-8", newline="") as f:
+        contexts = {row["context_id"]: row["context"] for row in csv.DictReader(f)}
+    with open(qa_path, "r", encoding="utf-8", newline="") as f:
+        examples = [
+            QAExample(row["question"], row["answer"], row["context_id"])
+            for row in csv.DictReader(f)
+        ]
+    return contexts, examples
+
+
+def limit_dataset(
+    contexts: Dict[str, str], examples: List[QAExample], limit: Optional[int]
+) -> Tuple[Dict[str, str], List[QAExample]]:
+    """Keep the first ``limit`` questions and only the contexts they refer to."""
+    if limit:
+        examples = examples[:limit]
+        used = {example.context_id for example in examples}
+        contexts = {
+            context_id: text for context_id, text in contexts.items() if context_id in used
+        }
+    return contexts, examples
+
+
+def ranked_context_ids(docs: List[Document]) -> List[str]:
+    """Map retrieved chunks to their context ids, best first, without repeats."""
+    ranked = []
+    for doc in docs:
+        context_id = doc.metadata.get("context_id")
+        if context_id is not None and context_id not in ranked:
+            ranked.append(context_id)
+    return ranked
+
+
+def reciprocal_rank(ranked: List[str], relevant: str) -> float:
+    return 1.0 / (ranked.index(relevant) + 1) if relevant in ranked else 0.0
+
+
+def percentiles(values: List[float]) -> dict:
+    values = np.array(values) * 1000
+    return {
+        "ms_p50": round(float(np.percentile(values, 50)), 3),
+        "ms_p95": round(float(np.percentile(values, 95)), 3),
+        "ms_mean": round(float(values.mean()), 3),
+    }
+
+
+def evaluate(contexts: Dict[str, str], examples: List[QAExample], args, workdir: str) -> dict:
+    from rag_manger.rag import Rag
+
+    k_values = sorted(args.k)
+    config.RETRIEVAL_CONFIG.update(
+        k=max(k_values),
+        expand_queries=args.expand,
+        hybrid=args.hybrid,
+        mmr=args.mmr,
+        mmr_lambda=args.mmr_lambda,
+        fetch_k=args.fetch_k,
+        max_documents=args.max_documents,
+    )
+    config.EMBEDDING_CACHE_CONFIG["path"] = os.path.join(workdir, "embeddings.sqlite3")
+    config.VECTOR_STORE_CONFIG.update(
+        quantization=args.quantization, rescore_factor=args.rescore_factor
+    )
+    if args.chunk_tokens:
+        name = args.embeddings_model.split(":")[0]
+        config.CHUNKING_CONFIG[name] = {
+            "chunk_tokens": args.chunk_tokens,
+            "overlap_tokens": args.overlap_tokens or args.chunk_tokens // 8,
+        }
+
+    rag = Rag(
+        args.llm_model,
+        embeddings_model=args.embeddings_model,
+        collection_name="evaluation",
+        persist_directory=workdir,
+        vector_store=args.backend,
+    )
+    # Identical questions must not be answered from the semantic cache
+    rag.semantic_cache.similarity_threshold = 2.0
+
+    documents = [
+        Document(
+            page_content=text,
+            metadata={"source": f"context-{context_id}", "context_id": context_id},
+        )
+        for context_id, text in contexts.items()
+    ]
+    start = time.perf_counter()
+    vector_db = rag.create_vector_db(documents)
+    ingest_seconds = time.perf_counter() - start
+    rag.get_chain(vector_db)
+
+    per_question = []
+    for example in examples:
+        start = time.perf_counter()
+        docs = rag.retriever.invoke(example.question)
+        retrieval_seconds = time.perf_counter() - start
+        ranked = ranked_context_ids(docs)
+        result = {
+            "question": example.question,
+            "context_id": example.context_id,
+            "retrieved": ranked,
+            "retrieval_ms": round(retrieval_seconds * 1000, 3),
+            "reciprocal_rank": reciprocal_rank(ranked[: max(k_values)], example.context_id),
+        }
+        for k in k_values:
+            result[f"recall@{k}"] = float(example.context_id in ranked_context_ids(docs[:k]))
+        if args.generate:
+            start = time.perf_counter()
+            answer = "".join(rag.stream(example.question, vector_db))
+            result["generation_ms"] = round((time.perf_counter() - start) * 1000, 3)
+            result["first_token_ms"] = round(rag.last_ttft * 1000, 3)
+            result["answer"] = answer
+            result["answer_match"] = float(example.answer.lower() in answer.lower())
+        per_question.append(result)
+
+    summary = {
+        "questions": len(examples),
+        "contexts": len(contexts),
+        "chunks": sum(len(record.chunk_ids) for record in rag.list_documents()),
+        "ingest_seconds": round(ingest_seconds, 3),
+        "mrr": round(float(np.mean([r["reciprocal_rank"] for r in per_question])), 4),
+        "retrieval": percentiles([r["retrieval_ms"] / 1000 for r in per_question]),
+    }
+    for k in k_values:
+        summary[f"recall@{k}"] = round(
+            float(np.mean([r[f"recall@{k}"] for r in per_question])), 4
+        )
+    if args.generate:
+        summary["generation"] = percentiles([r["generation_ms"] / 1000 for r in per_question])
+        summary["first_token"] = percentiles([r["first_token_ms"] / 1000 for r in per_question])
+        summary["answer_match"] = round(
+            float(np.mean([r["answer_match"] for r in per_question])), 4
+        )
+    vector_db.delete_collection()
+    return {"summary": summary, "per_question": per_question}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dataset", help="SQuAD JSON file")
+    parser.add_argument("--contexts", help="context_data.csv written by eval.ipynb")
+    parser.add_argument("--qa", help="qa_data.csv written by eval.ipynb")
+    parser.add_argument("--limit", type=int, help="Evaluate only the first N questions")
+    parser.add_argument("--k", type=int, nargs="+", default=[config.RETRIEVAL_CONFIG["k"]])
+    parser.add_argument("--chunk-tokens", type=int, help="Override the chunk size, in tokens")
+    parser.add_argument("--overlap-tokens", type=int, help="Override the chunk overlap, in tokens")
+    parser.add_argument(
+        "--no-expand", dest="expand", action="store_false", help="Disable query expansion"
+    )
+    parser.add_argument(
+        "--no-hybrid", dest="hybrid", action="store_false", help="Vector search only"
+    )
+    parser.add_argument(
+        "--no-mmr", dest="mmr", action="store_false", help="Disable MMR re-ranking"
+    )
+    parser.add_argument(
+        "--mmr-lambda", type=float, default=config.RETRIEVAL_CONFIG["mmr_lambda"]
+    )
+    parser.add_argument(
+        "--fetch-k",
+        type=int,
+        default=config.RETRIEVAL_CONFIG["fetch_k"],
+        help="Candidates re-ranked by MMR",
+    )
+    parser.add_argument(
+        "--max-documents",
+        type=int,
+        default=config.RETRIEVAL_CONFIG["max_documents"],
+        help="Documents pre-selected by two-stage retrieval, 0 to search every chunk",
+    )
+    parser.add_argument(
+        "--backend", choices=["chroma", "numpy"], default=config.VECTOR_STORE_CONFIG["backend"]
+    )
+    parser.add_argument(
+        "--quantization",
+        choices=["int8", "binary"],
+        default=config.VECTOR_STORE_CONFIG["quantization"],
+        help="Search quantized vectors first (numpy backend)",
+    )
+    parser.add_argument(
+        "--rescore-factor",
+        type=int,
+        default=config.VECTOR_STORE_CONFIG["rescore_factor"],
+        help="Quantized candidates rescored exactly, as a multiple of k",
+    )
+    parser.add_argument("--generate", action="store_true", help="Also generate and time answers")
+    parser.add_argument("--llm-model", default="llama3.2:latest")
+    parser.add_argument("--embeddings-model", default="nomic-embed-text:latest")
+    parser.add_argument("--ollama-host", help="Use a real Ollama server instead of the fake one")
+    parser.add_argument("--output", help="Write the summary and per-question results as JSON")
+    args = parser.parse_args()
+
+    if args.dataset:
+        contexts, examples = load_squad(args.dataset)
+    elif args.contexts and args.qa:
+        contexts, examples = load_csv(args.contexts, args.qa)
+    else:
+        parser.error("pass --dataset, or --contexts and --qa")
+    contexts, examples = limit_dataset(contexts, examples, args.limit)
+
+    server = None
+    if args.ollama_host:
+        os.environ["OLLAMA_HOST"] = args.ollama_host
+    else:
+        server = FakeOllamaServer().start()
+        os.environ["OLLAMA_HOST"] = server.url
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            results = evaluate(contexts, examples, args, workdir)
+    finally:
+        if server is not None:
+            server.stop()
+
+    results["config"] = {key: value for key, value in vars(args).items() if key != "output"}
+    print(json.dumps(results["summary"], indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,25 @@
 import os
 import sys
+import time
+import uuid
+from typing import Optional
 import streamlit as st
 import ollama
-from config import PAGE_CONFIG
+from config import METRICS_CONFIG, PAGE_CONFIG, RENDER_CONFIG
 from langchain_community.vectorstores import Chroma
 from langchain_core.runnables import RunnablePassthrough
 import chromadb.api
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from rag_manger.collection_manager import (
+    COLLECTION_PATTERN,
+    QuotaExceededError,
+    collection_manager,
+)
+from rag_manger.jobs import FAILED, job_manager
+from rag_manger.retrieval import metadata_filter
+from utils.metrics import metrics, span
+from utils.ollama_client import warm_up
+from utils.page_renderer import page_renderer
 
 sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
 from src.rag_manger.rag import Rag
@@ -16,9 +30,142 @@ from src.streamlit_manger.session_handler import SessionStateManager
 
 # from langchain.llms import Ollama
 
+EMBEDDINGS_MODEL = "nomic-embed-text:latest"
+
 # Streamlit page configuration
 st.set_page_config(**PAGE_CONFIG)
-chromadb.api.client.SharedSystemClient.clear_system_cache()
+
+
+@st.cache_resource(show_spinner=False)
+def clear_chroma_system_cache() -> None:
+    """
+    Drop Chroma clients left over from a previous run of the server, once per process.
+
+    Clearing the cache on every rerun would close the clients of the collections
+    shared across sessions and reruns.
+    """
+    chromadb.api.client.SharedSystemClient.clear_system_cache()
+
+
+clear_chroma_system_cache()
+
+
+def current_workspace() -> str:
+    """
+    Return the namespace whose collection this session reads and writes.
+
+    It is the ``workspace`` query parameter, so sharing the page URL shares the
+    workspace. A session without one gets a private workspace of its own,
+    kept across page reloads.
+    """
+    workspace = st.query_params.get("workspace")
+    if not workspace or not COLLECTION_PATTERN.match(workspace):
+        workspace = st.session_state.get("workspace") or f"session-{uuid.uuid4().hex[:12]}"
+        st.query_params["workspace"] = workspace
+    st.session_state["workspace"] = workspace
+    return workspace
+
+
+@st.cache_resource(show_spinner=False)
+def start_metrics_server():
+    """Serve the Prometheus metrics endpoint once per Streamlit server process."""
+    if METRICS_CONFIG["prometheus_port"] is None:
+        return None
+    try:
+        return metrics.serve(METRICS_CONFIG["prometheus_host"], METRICS_CONFIG["prometheus_port"])
+    except OSError as e:
+        logger.warning(f"Could not start the metrics endpoint: {e}")
+        return None
+
+
+def show_diagnostics():
+    """Show per-stage timings and let them be downloaded."""
+    with st.expander("Diagnostics"):
+        st.caption(" · ".join(f"{name}: {value}" for name, value in metrics.gauges().items()))
+        summary = metrics.summary()
+        if not summary:
+            st.caption("No timings recorded yet.")
+            return
+        st.dataframe(
+            [{"stage": stage, **values} for stage, values in summary.items()],
+            hide_index=True,
+            use_container_width=True,
+        )
+        jsonl_col, prometheus_col = st.columns(2)
+        jsonl_col.download_button(
+            "Spans (JSON lines)", metrics.export_jsonl(), file_name="spans.jsonl"
+        )
+        prometheus_col.download_button(
+            "Metrics (Prometheus)", metrics.prometheus_text(), file_name="metrics.prom"
+        )
+
+
+def show_preview(rag: Rag) -> None:
+    """Preview the PDFs of the workspace, rendering only the page on screen."""
+    pdfs = {
+        document.doc_id: (document, path)
+        for document in rag.list_documents()
+        if (path := rag.source_path(document.content_hash))
+    }
+    if not pdfs or not st.toggle("Preview pages", key="preview_toggle"):
+        return
+    doc_id = st.selectbox(
+        "Document",
+        list(pdfs),
+        format_func=lambda doc_id: pdfs[doc_id][0].source,
+        key="preview_document",
+    )
+    document, path = pdfs[doc_id]
+    page_col, zoom_col = st.columns(2)
+    page = page_col.number_input(
+        "Page", min_value=1, max_value=page_renderer.page_count(path), key="preview_page"
+    )
+    width = zoom_col.slider(
+        "Zoom", 100, 1000, RENDER_CONFIG["default_width"], RENDER_CONFIG["width_step"]
+    )
+    image = page_renderer.render(path, document.content_hash, page - 1, width)
+    if image is not None:
+        with st.container(height=410, border=True):
+            st.image(image, width=width)
+
+
+def show_filters(rag: Rag) -> Optional[dict]:
+    """Let the user restrict the search to some files and a page range."""
+    with st.expander("Search filters"):
+        sources = st.multiselect(
+            "Only in", sorted({document.source for document in rag.list_documents()})
+        )
+        first_col, last_col = st.columns(2)
+        first_page = first_col.number_input("From page", min_value=1, value=None)
+        last_page = last_col.number_input("To page", min_value=1, value=None)
+    return metadata_filter(sources, first_page, last_page)
+
+
+def show_jobs(workspace: str) -> None:
+    """
+    Show the progress of the workspace's ingestion jobs.
+
+    The panel polls the jobs every second while any is unfinished, without
+    rerunning the rest of the page, and reruns the page once they are all done.
+    """
+    active = any(not job.finished for job in job_manager.list(workspace))
+
+    def render() -> None:
+        jobs = job_manager.list(workspace)
+        for job in jobs:
+            if not job.finished:
+                pages = f" · page {job.pages_done}/{job.pages_total}" if job.pages_total else ""
+                st.progress(
+                    job.progress or 0.0,
+                    text=f"{job.source}: {job.status} · {job.chunks_done} chunks{pages}",
+                )
+            elif job.status == FAILED and time.time() - job.finished_at < 300:
+                st.error(f"Could not process {job.source}: {job.error}")
+        if active and all(job.finished for job in jobs):
+            # Refresh the document list
+            st.rerun()
+
+    st.fragment(render, run_every=1.0 if active else None)()
 
 
 def main():
@@ -27,11 +174,12 @@ def main():
     """
 
     st.subheader("📖 Ask your Document", divider="gray", anchor=False)
+    start_metrics_server()
     # Create layout
     col1, col2 = st.columns([1.5, 2])
     session = SessionStateManager()
     session.initialize_state()
-    models = get_ollama_models()[1:]
+    models = get_ollama_models()
     selected_model = None
     if models:
         session.set("available_models", models)
@@ -43,6 +191,9 @@ def main():
             selected_model = st.selectbox("Select a model", available_models)
             if selected_model:
                 session.set("selected_model", selected_model)
+                # Load the models while the user uploads a file or types a question
+                warm_up(selected_model)
+                warm_up(EMBEDDINGS_MODEL, embedding=True)
 
         else:
             st.error("No models found")
@@ -56,29 +207,73 @@ def main():
         )
         if session.get("selected_model"):
             selected_model = session.get("selected_model")
-            rag = Rag(selected_model, embeddings_model="nomic-embed-text:latest")
+            embeddings_model = EMBEDDINGS_MODEL
+            workspace = current_workspace()
+            st.caption(f"Workspace `{workspace}` · share this page's URL to share its documents")
+            rag = collection_manager.get(workspace, selected_model, embeddings_model)
             # Regular file upload with unique key
             if file_upload:
-                file_name = file_upload[0].name
-                if st.session_state["vector_db"] is None:
-                    with st.spinner("Processing uploaded document..."):
-                        if file_name.endswith(".pdf"):
-                            data = read_uploaded_pdf(file_upload[0])
-                        elif file_name.endswith(".docx"):
-                            data = read_uploaded_docx(file_upload[0])
-                        else:
-                            st.error("Unsupported file type")
-                        vector_db = rag.create_vector_db(data)
-                        session.set("vector_db", vector_db)
+                # Only files not seen in this session and not already indexed are parsed
+                ingested_uploads = session.get("ingested_uploads")
+                new_uploads = [
+                    f
+                    for f in file_upload
+                    if f.file_id not in ingested_uploads
+                    and rag.registry.find_by_hash(content_hash(f)) is None
+                ]
+                try:
+                    collection_manager.check_quota(workspace, sum(f.size for f in new_uploads))
+                except QuotaExceededError as e:
+                    st.error(f"{e}. Delete documents to make room.")
+                    # Not marked as ingested, so they are retried once there is room
+                    file_upload = new_uploads = []
+                # Parsing and embedding run on the job workers; the page stays responsive
+                for upload in new_uploads:
+                    with span("upload_read", source=upload.name, bytes=upload.size):
+                        job_manager.submit(
+                            workspace,
+                            upload.name,
+                            spill_to_file(upload),
+                            content_hash(upload),
+                            selected_model,
+                            embeddings_model,
+                        )
+                ingested_uploads.update(f.file_id for f in file_upload)
             else:
                 st.warning("Upload a PDF file to begin chat...")
+
+            show_jobs(workspace)
+            documents = rag.list_documents()
+            # Chunks of documents still being ingested can already be queried
+            queryable = documents or rag.is_ingesting
+            session.set("vector_db", rag.vector_db if queryable else None)
+            session.set("search_filter", None)
+            if documents:
+                with st.expander(f"Indexed documents ({len(documents)})"):
+                    for document in documents:
+                        name_col, delete_col = st.columns([4, 1])
+                        name_col.write(
+                            f"{document.source} · {len(document.chunk_ids)} chunks"
+                        )
+                        if delete_col.button("🗑", key=f"delete_{document.doc_id}"):
+                            # Waits for a job writing to this workspace to finish its batch
+                            with job_manager.lock(workspace):
+                                rag.delete_document(document.doc_id)
+                            st.rerun()
+                session.set("search_filter", show_filters(rag))
+                show_preview(rag)
                 # Delete collection button
             delete_collection = col1.button(
                 "⚠️ Delete collection", type="secondary", key="delete_button"
             )
             if delete_collection:
-                rag.delete_vector_db()
+                # Only this workspace's documents are deleted
+                job_manager.cancel(workspace)
+                with job_manager.lock(workspace):
+                    collection_manager.delete(workspace)
                 session.clear_all()
+                st.rerun()
+        show_diagnostics()
 
     # Chat interface
     with col2:
@@ -90,6 +285,8 @@ def main():
             avatar = "🤖" if message["role"] == "assistant" else "⌨"
             with message_container.chat_message(message["role"], avatar=avatar):
                 st.markdown(message["content"])
+                if message.get("cached"):
+                    st.caption("⚡ Answered from cache")
         if prompt := st.chat_input("Enter a prompt here...", key="chat_input"):
             try:
                 # Add user message to chat
@@ -97,17 +294,35 @@ def main():
                 with message_container.chat_message("user", avatar="⌨"):
                     st.markdown(prompt)
                 with message_container.chat_message("assistant", avatar="🤖"):
-                    with st.spinner(":green[processing...]"):
-                        if session.get("vector_db") is not None:
-                            vector_db = session.get("vector_db")
-                            response = rag.run(prompt, vector_db)
+                    if session.get("vector_db") is not None:
+                        search_filter = session.get("search_filter")
+                        # Answers of filtered searches are not cached
+                        response = rag.cached_answer(prompt) if search_filter is None else None
+                        cached = response is not None
+                        if cached:
                             st.markdown(response)
+                            st.caption("⚡ Answered from cache")
                         else:
-                            st.warning("Please upload a PDF file to continue.")
-                        if session.get("vector_db") is not None:
-                            session.get("messages").append(
-                                {"role": "assistant", "content": response}
-                            )
+                            # Sessions take turns when generations are queued
+                            client = get_script_run_ctx().session_id
+                            # Held so the workspace is not unloaded while the answer streams
+                            with collection_manager.checkout(
+                                workspace, selected_model, embeddings_model
+                            ) as rag:
+                                response = st.write_stream(
+                                    rag.stream(
+                                        prompt,
+                                        rag.load_vector_db(),
+                                        client,
+                                        search_filter,
+                                        check_cache=False,
+                                    )
+                                )
+                        session.get("messages").append(
+                            {"role": "assistant", "content": response, "cached": cached}
+                        )
+                    else:
+                        st.warning("Please upload a PDF file to continue.")
             except Exception as e:
                 logger.error(e)
                 st.error("An error occurred. Please try again.")
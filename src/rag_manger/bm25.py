@@ -0,0 +1,185 @@
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+from typing import Collection, Dict, List, Optional, Tuple
+
+from utils.logging_utils import logger
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[._\-/][a-z0-9]+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase terms.
+
+    Identifiers such as part numbers, clause ids and error codes
+    (``4.2.1``, ``ERR-504``, ``A/B-12``) are kept as single terms.
+    """
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """Inverted index scoring chunks with Okapi BM25, persisted as JSON."""
+
+    def __init__(self, path: str, k1: float = 1.5, b: float = 0.75):
+        """
+        Load the index from disk, or start an empty one.
+
+        Args:
+            path (str): Path of the JSON file backing the index.
+            k1 (float): Term frequency saturation parameter.
+            b (float): Document length normalization parameter.
+        """
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        # term -> {chunk id: term frequency}
+        self.postings: Dict[str, Dict[str, int]] = {}
+        # chunk id -> number of terms
+        self.lengths: Dict[str, int] = {}
+        self.total_length = 0
+        self._mtime = None
+        self._refresh()
+
+    def _refresh(self) -> None:
+        """Reload the index if another instance changed the file on disk."""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._mtime:
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        ids = data["ids"]
+        self.lengths = dict(zip(ids, data["lengths"]))
+        self.postings = {
+            term: {ids[flat[i]]: flat[i + 1] for i in range(0, len(flat), 2)}
+            for term, flat in data["postings"].items()
+        }
+        self.total_length = sum(self.lengths.values())
+        self._mtime = mtime
+        logger.info(f"Loaded BM25 index with {len(self.lengths)} chunks from {self.path}")
+
+    def save(self) -> None:
+        """Persist the index."""
+        with self._lock:
+            self._save()
+
+    def _save(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Chunk ids are stored once; postings refer to them by position as
+        # flat [position, term frequency, ...] lists
+        ids = list(self.lengths)
+        position = {chunk_id: i for i, chunk_id in enumerate(ids)}
+        postings = {
+            term: [value for chunk_id, tf in posting.items() for value in (position[chunk_id], tf)]
+            for term, posting in self.postings.items()
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"ids": ids, "lengths": [self.lengths[i] for i in ids], "postings": postings},
+                f,
+                separators=(",", ":"),
+            )
+        os.replace(tmp_path, self.path)
+        self._mtime = os.stat(self.path).st_mtime_ns
+
+    def add(self, ids: List[str], texts: List[str], save: bool = True) -> None:
+        """
+        Index chunks, replacing any chunk already indexed under the same id.
+
+        Args:
+            ids (List[str]): The chunk ids.
+            texts (List[str]): The chunk texts, in the same order.
+            save (bool): Persist the index right away. Pass False when adding
+                many batches and call ``save`` once at the end.
+        """
+        with self._lock:
+            self._refresh()
+            self._remove(ids)
+            for chunk_id, text in zip(ids, texts):
+                terms = Counter(tokenize(text))
+                for term, count in terms.items():
+                    self.postings.setdefault(term, {})[chunk_id] = count
+                length = sum(terms.values())
+                self.lengths[chunk_id] = length
+                self.total_length += length
+            if save:
+                self._save()
+
+    def remove(self, ids: List[str]) -> None:
+        """Remove chunks from the index."""
+        with self._lock:
+            self._refresh()
+            self._remove(ids)
+            self._save()
+
+    def _remove(self, ids: List[str]) -> None:
+        ids = [chunk_id for chunk_id in ids if chunk_id in self.lengths]
+        if not ids:
+            return
+        removed = set(ids)
+        for chunk_id in ids:
+            self.total_length -= self.lengths.pop(chunk_id)
+        for term in list(self.postings):
+            posting = self.postings[term]
+            for chunk_id in removed.intersection(posting):
+                del posting[chunk_id]
+            if not posting:
+                del self.postings[term]
+
+    def clear(self) -> None:
+        """Remove every chunk from the index."""
+        with self._lock:
+            self.postings, self.lengths, self.total_length = {}, {}, 0
+            self._save()
+
+    def search(
+        self, query: str, k: int = 4, ids: Optional[Collection[str]] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Find the chunks that best match a query.
+
+        Args:
+            query (str): The query text.
+            k (int): Number of chunks to return.
+            ids (Optional[Collection[str]]): Only score these chunks, a set for
+                fast lookups. All chunks if None.
+
+        Returns:
+            List[Tuple[str, float]]: (chunk id, BM25 score) pairs, best first.
+        """
+        terms = set(tokenize(query))
+        scores: Dict[str, float] = {}
+        # Scored under the lock, as a job thread may be adding chunks to the postings
+        with self._lock:
+            self._refresh()
+            n = len(self.lengths)
+            if n == 0:
+                return []
+            avg_length = self.total_length / n
+            for term in terms:
+                posting = self.postings.get(term)
+                if not posting:
+                    continue
+                idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+                for chunk_id, tf in posting.items():
+                    if ids is not None and chunk_id not in ids:
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * self.lengths[chunk_id] / avg_length)
+                    score = idf * tf * (self.k1 + 1) / (tf + norm)
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + score
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self.lengths)
@@ -0,0 +1,135 @@
+import re
+from typing import Callable, Iterable, List
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from config import CHUNKING_CONFIG
+from utils.metrics import span
+
+WORD_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+# Break at headings first, then paragraphs, lines, sentences and words
+SEPARATORS = [
+    r"\n(?=#{1,6} )",
+    r"\n(?=\d+(?:\.\d+)*\.?\s+[A-Z][^\n]{0,80}\n)",
+    r"\n(?=[A-Z][A-Z0-9 ,\-]{3,80}\n)",
+    r"\n\n",
+    r"\n",
+    r"(?<=[.!?])\s+",
+    r" ",
+    r"",
+]
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens of a text without the model's tokenizer.
+
+    WordPiece/BPE tokenizers emit about one token per short word or punctuation
+    mark and split long words every few characters, which this mirrors closely
+    enough to size chunks, with a slight overestimate rather than an underestimate.
+    """
+    return sum(1 + (len(word) - 1) // 6 for word in WORD_PATTERN.findall(text))
+
+
+def chunking_settings(embeddings_model: str) -> dict:
+    """
+    Return the chunk and overlap sizes, in tokens, for an embedding model.
+
+    Args:
+        embeddings_model (str): Name of the model, with or without a ``:tag``.
+    """
+    name = embeddings_model.split(":")[0]
+    return {**CHUNKING_CONFIG["default"], **CHUNKING_CONFIG.get(name, {})}
+
+
+class TokenChunker:
+    """Splits documents into chunks measured in tokens of the embedding model."""
+
+    def __init__(
+        self,
+        embeddings_model: str,
+        token_counter: Callable[[str], int] = estimate_tokens,
+    ):
+        """
+        Initialize the chunker for an embedding model.
+
+        Args:
+            embeddings_model (str): Name of the embedding model, used to look up
+                chunk sizes in CHUNKING_CONFIG.
+            token_counter (Callable[[str], int]): Counts the tokens of a text;
+                plug in the model's real tokenizer when it is available.
+        """
+        settings = chunking_settings(embeddings_model)
+        self.chunk_tokens = settings["chunk_tokens"]
+        self.overlap_tokens = settings["overlap_tokens"]
+        self.token_counter = token_counter
+        self.text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=self.chunk_tokens,
+            chunk_overlap=self.overlap_tokens,
+            length_function=token_counter,
+            separators=SEPARATORS,
+            is_separator_regex=True,
+        )
+        # Fragments shorter than this, typically a heading cut off from its
+        # section, are folded into the following chunk
+        self.min_tokens = self.chunk_tokens // 8
+
+    def split_documents(self, documents: Iterable[Document]) -> List[Document]:
+        """
+        Split documents into chunks, never across document (page) boundaries.
+
+        Every chunk keeps its document's metadata (source, page) and records
+        its character offsets within the page and its token count.
+
+        Args:
+            documents (Iterable[Document]): The documents to split, e.g. pages.
+
+        Returns:
+            List[Document]: The chunks.
+        """
+        chunks = []
+        for document in documents:
+            with span("split", source=document.metadata.get("source")) as attributes:
+                document_chunks = self._split_document(document)
+                attributes["chunks"] = len(document_chunks)
+            chunks.extend(document_chunks)
+        return chunks
+
+    def _split_document(self, document: Document) -> List[Document]:
+        text = document.page_content
+        pieces = []
+        previous_start, previous_end = -1, 0
+        for piece in self.text_splitter.split_text(text):
+            # A chunk starts after the previous one and, despite the overlap,
+            # ends past it, which pins down its offset even in repetitive text
+            cursor = max(previous_start + 1, previous_end - len(piece) + 1, 0)
+            start = text.find(piece, cursor)
+            if start < 0:
+                start = text.find(piece)
+            pieces.append((start, piece))
+            if start >= 0:
+                previous_start, previous_end = start, start + len(piece)
+
+        merged = []
+        for i, (start, piece) in enumerate(pieces):
+            if merged and merged[-1][2]:
+                # The previous fragment was too short to stand on its own
+                previous_start, _, _ = merged.pop()
+                if previous_start >= 0 and start >= previous_start:
+                    start, piece = previous_start, text[previous_start : start + len(piece)]
+            too_short = self.token_counter(piece) < self.min_tokens and i < len(pieces) - 1
+            merged.append((start, piece, too_short))
+
+        return [
+            Document(
+                page_content=piece,
+                metadata={
+                    **document.metadata,
+                    "start_index": start,
+                    "end_index": start + len(piece) if start >= 0 else -1,
+                    "tokens": self.token_counter(piece),
+                },
+            )
+            for start, piece, _ in merged
+        ]
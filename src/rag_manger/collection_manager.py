@@ -0,0 +1,297 @@
+import os
+import re
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional
+
+from config import COLLECTIONS_CONFIG
+from utils.logging_utils import logger
+from utils.metrics import metrics
+from rag_manger.rag import Rag
+
+# Chroma's collection naming rules, also used for the namespace directories
+COLLECTION_PATTERN = re.compile(r"^[a-zA-Z0-9][a-zA-Z0-9._-]{1,61}[a-zA-Z0-9]$")
+
+# Its mtime is the last access time of the namespace, to within ACCESS_MARKER_INTERVAL
+ACCESS_MARKER = ".last_access"
+# Seconds between writes of the marker, so busy namespaces are not touched on every query
+ACCESS_MARKER_INTERVAL = 60
+
+
+class QuotaExceededError(Exception):
+    """Raised when an ingestion would push a namespace or all of them over their disk quota."""
+
+
+@dataclass
+class CollectionInfo:
+    """Disk usage and activity of a namespace."""
+
+    name: str
+    size_bytes: int
+    last_access: float
+    loaded: bool
+
+
+@dataclass
+class _LoadedCollection:
+    # (llm model, embeddings model) -> engine
+    rags: Dict[tuple, Rag] = field(default_factory=dict)
+    last_access: float = field(default_factory=time.time)
+    # Long-running users, e.g. ingestion jobs; a held collection is never unloaded
+    holds: int = 0
+    # When the access marker was last written
+    marked_at: float = 0.0
+
+
+def directory_size(path: str) -> int:
+    """Return the total size, in bytes, of the files under a directory."""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                # Removed while walking, e.g. by a concurrent compaction
+                pass
+    return total
+
+
+class CollectionManager:
+    """
+    Keeps every namespace (a session or workspace) in its own collection and directory.
+
+    Namespaces cannot see or delete each other's documents. Recently used
+    collections stay loaded; idle ones are closed to free memory and reopened
+    from disk on their next access, and ingestion is refused once a namespace,
+    or all of them together, reach their disk quota.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        max_loaded: int = 8,
+        idle_seconds: float = 900,
+        min_idle_seconds: float = 60,
+        max_collection_bytes: Optional[int] = None,
+        max_total_bytes: Optional[int] = None,
+        retention_seconds: Optional[float] = None,
+    ):
+        """
+        Initialize the manager.
+
+        Args:
+            root (str): Directory holding one subdirectory per namespace.
+            max_loaded (int): Number of namespaces kept loaded in memory.
+            idle_seconds (float): Seconds without access after which a namespace is unloaded.
+            min_idle_seconds (float): Namespaces used more recently than this are
+                never unloaded, even above ``max_loaded``, as a request may be using them.
+            max_collection_bytes (Optional[int]): Disk quota of each namespace, none if None.
+            max_total_bytes (Optional[int]): Disk quota of all namespaces together, none if None.
+            retention_seconds (Optional[float]): Seconds without access after which a
+                namespace is deleted from disk, never if None.
+        """
+        self.root = root
+        self.max_loaded = max_loaded
+        self.idle_seconds = idle_seconds
+        self.min_idle_seconds = min_idle_seconds
+        self.max_collection_bytes = max_collection_bytes
+        self.max_total_bytes = max_total_bytes
+        self.retention_seconds = retention_seconds
+        self._loaded: Dict[str, _LoadedCollection] = {}
+        self._lock = threading.RLock()
+        os.makedirs(root, exist_ok=True)
+        metrics.gauge(
+            "collections_loaded", "Collections loaded in memory.", lambda: len(self._loaded)
+        )
+
+    def path(self, name: str) -> str:
+        """Return the directory of a namespace."""
+        if not COLLECTION_PATTERN.match(name):
+            raise ValueError(f"Invalid collection name: {name}")
+        return os.path.join(self.root, name)
+
+    def get(self, name: str, llm_model: str, embeddings_model: str) -> Rag:
+        """
+        Return the RAG engine of a namespace, loading it if it is not in memory.
+
+        Args:
+            name (str): The namespace, e.g. a session or workspace id.
+            llm_model (str): The chat model.
+            embeddings_model (str): The embedding model.
+
+        Returns:
+            Rag: The engine, with its vector store loaded.
+        """
+        path = self.path(name)
+        with self._lock:
+            collection = self._loaded.get(name)
+            if collection is None:
+                collection = self._loaded[name] = _LoadedCollection()
+            key = (llm_model, embeddings_model)
+            if key not in collection.rags:
+                os.makedirs(path, exist_ok=True)
+                rag = Rag(
+                    llm_model,
+                    embeddings_model=embeddings_model,
+                    collection_name=name,
+                    persist_directory=path,
+                )
+                rag.load_vector_db()
+                collection.rags[key] = rag
+                logger.info(f"Loaded collection {name} for {llm_model}")
+            self._touch(name, collection)
+            self._evict()
+            return collection.rags[key]
+
+    @contextmanager
+    def checkout(self, name: str, llm_model: str, embeddings_model: str) -> Iterator[Rag]:
+        """
+        Like ``get``, but keep the collection loaded until the block exits.
+
+        Used by work that outlives a request, such as background ingestion.
+        """
+        with self._lock:
+            rag = self.get(name, llm_model, embeddings_model)
+            self._loaded[name].holds += 1
+        try:
+            yield rag
+        finally:
+            with self._lock:
+                collection = self._loaded.get(name)
+                if collection is not None:
+                    collection.holds -= 1
+                    self._touch(name, collection)
+
+    def _touch(self, name: str, collection: _LoadedCollection) -> None:
+        collection.last_access = time.time()
+        if collection.last_access - collection.marked_at >= ACCESS_MARKER_INTERVAL:
+            self._mark(name, collection)
+
+    def _mark(self, name: str, collection: _LoadedCollection) -> None:
+        """Record the last access of a namespace on disk, where it outlives the process."""
+        collection.marked_at = collection.last_access
+        marker = os.path.join(self.path(name), ACCESS_MARKER)
+        try:
+            with open(marker, "a"):
+                pass
+            os.utime(marker, (collection.last_access, collection.last_access))
+        except OSError as e:
+            logger.warning(f"Could not record access to collection {name}: {e}")
+
+    def _unload(self, name: str) -> None:
+        collection = self._loaded.pop(name, None)
+        if collection is None:
+            return
+        if collection.last_access > collection.marked_at:
+            self._mark(name, collection)
+        for rag in collection.rags.values():
+            rag.close()
+        logger.info(f"Unloaded collection {name}")
+
+    def _evict(self) -> None:
+        now = time.time()
+        for name, collection in list(self._loaded.items()):
+            if now - collection.last_access > self.idle_seconds and not collection.holds:
+                self._unload(name)
+        by_age = sorted(
+            (item for item in self._loaded.items() if not item[1].holds),
+            key=lambda item: item[1].last_access,
+        )
+        for name, collection in by_age[: max(len(self._loaded) - self.max_loaded, 0)]:
+            if now - collection.last_access > self.min_idle_seconds:
+                self._unload(name)
+
+    def last_access(self, name: str) -> float:
+        """Return when a namespace was last used, as a Unix timestamp."""
+        with self._lock:
+            if name in self._loaded:
+                return self._loaded[name].last_access
+        marker = os.path.join(self.path(name), ACCESS_MARKER)
+        try:
+            return os.path.getmtime(marker)
+        except OSError:
+            return os.path.getmtime(self.path(name))
+
+    def size(self, name: str) -> int:
+        """Return the disk usage of a namespace, in bytes."""
+        return directory_size(self.path(name))
+
+    def list(self) -> List[CollectionInfo]:
+        """Return every namespace on disk, most recently used first."""
+        infos = []
+        for name in sorted(os.listdir(self.root)):
+            if not COLLECTION_PATTERN.match(name) or not os.path.isdir(self.path(name)):
+                continue
+            infos.append(
+                CollectionInfo(
+                    name=name,
+                    size_bytes=self.size(name),
+                    last_access=self.last_access(name),
+                    loaded=name in self._loaded,
+                )
+            )
+        return sorted(infos, key=lambda info: info.last_access, reverse=True)
+
+    def check_quota(self, name: str, incoming_bytes: int = 0) -> None:
+        """
+        Refuse an ingestion that would exceed a disk quota.
+
+        Namespaces past their retention are deleted first to make room.
+
+        Args:
+            name (str): The namespace receiving the documents.
+            incoming_bytes (int): Size of the uploaded files, as an estimate of
+                the space they will take once indexed.
+
+        Raises:
+            QuotaExceededError: If the namespace, or all namespaces together,
+                would exceed their quota.
+        """
+        self.purge_expired()
+        if self.max_collection_bytes is not None:
+            used = self.size(name)
+            if used + incoming_bytes > self.max_collection_bytes:
+                raise QuotaExceededError(
+                    f"Collection {name} uses {used / 2**20:.1f} MiB of its "
+                    f"{self.max_collection_bytes / 2**20:.0f} MiB quota"
+                )
+        if self.max_total_bytes is not None:
+            used = directory_size(self.root)
+            if used + incoming_bytes > self.max_total_bytes:
+                raise QuotaExceededError(
+                    f"All collections use {used / 2**20:.1f} MiB of the "
+                    f"{self.max_total_bytes / 2**20:.0f} MiB quota"
+                )
+
+    def delete(self, name: str) -> None:
+        """Unload a namespace and delete all of its files."""
+        path = self.path(name)
+        with self._lock:
+            self._unload(name)
+            shutil.rmtree(path, ignore_errors=True)
+        logger.info(f"Deleted collection {name}")
+
+    def purge_expired(self) -> List[str]:
+        """
+        Delete the namespaces unused for longer than the retention period.
+
+        Returns:
+            List[str]: The deleted namespaces.
+        """
+        if self.retention_seconds is None:
+            return []
+        now = time.time()
+        expired = [
+            info.name
+            for info in self.list()
+            if not info.loaded and now - info.last_access > self.retention_seconds
+        ]
+        for name in expired:
+            self.delete(name)
+        return expired
+
+
+collection_manager = CollectionManager(**COLLECTIONS_CONFIG)
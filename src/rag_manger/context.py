@@ -0,0 +1,117 @@
+from typing import Callable, Dict, List, Tuple
+
+from langchain_core.documents import Document
+from config import GENERATION_CONFIG
+from rag_manger.chunking import estimate_tokens
+from rag_manger.retrieval import chunk_key
+
+# Tokens taken by the prompt template and the question around the context
+PROMPT_OVERHEAD_TOKENS = 256
+
+
+def generation_settings(llm_model: str) -> dict:
+    """
+    Return the context budget and context window for a chat model.
+
+    Args:
+        llm_model (str): Name of the model, with or without a ``:tag``.
+
+    Returns:
+        dict: ``context_tokens`` (budget for retrieved chunks), ``answer_tokens``
+        and ``num_ctx``, the context window to request from Ollama.
+    """
+    name = llm_model.split(":")[0]
+    settings = {**GENERATION_CONFIG["default"], **GENERATION_CONFIG.get(name, {})}
+    settings["num_ctx"] = (
+        settings["context_tokens"] + settings["answer_tokens"] + PROMPT_OVERHEAD_TOKENS
+    )
+    return settings
+
+
+def _overlap_ratio(doc: Document, spans: Dict[Tuple, List[Tuple[int, int]]]) -> float:
+    """Fraction of a chunk's characters already covered by selected chunks of its page."""
+    start = doc.metadata.get("start_index", -1)
+    end = doc.metadata.get("end_index", -1)
+    if start < 0 or end <= start:
+        return 0.0
+    key = (doc.metadata.get("source"), doc.metadata.get("page"))
+    covered = sum(
+        max(0, min(end, other_end) - max(start, other_start))
+        for other_start, other_end in spans.get(key, [])
+    )
+    return covered / (end - start)
+
+
+def _truncate(text: str, max_tokens: int, token_counter: Callable[[str], int]) -> str:
+    """Cut text at a word boundary so it fits within ``max_tokens``."""
+    words = text.split(" ")
+    low, high = 0, len(words)
+    # Binary search on the number of words kept
+    while low < high:
+        middle = (low + high + 1) // 2
+        if token_counter(" ".join(words[:middle])) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return " ".join(words[:low])
+
+
+def pack_context(
+    docs: List[Document],
+    budget_tokens: int,
+    token_counter: Callable[[str], int] = estimate_tokens,
+    max_overlap: float = 0.5,
+    min_fragment_tokens: int = 64,
+) -> str:
+    """
+    Assemble retrieved chunks into the context of the generation prompt.
+
+    Chunks are taken in relevance order (the order of ``docs``). Duplicates and
+    chunks mostly covered by an already selected chunk of the same page are
+    dropped. Chunks are added until the token budget is reached, the last one
+    being truncated if enough budget is left for it to be useful.
+
+    Args:
+        docs (List[Document]): The retrieved chunks, most relevant first.
+        budget_tokens (int): Maximum number of tokens of the packed context.
+        token_counter (Callable[[str], int]): Counts the tokens of a text.
+        max_overlap (float): Drop a chunk when more than this fraction of it
+            overlaps chunks already selected.
+        min_fragment_tokens (int): Smallest truncated chunk worth including.
+
+    Returns:
+        str: The context, one block per chunk labelled with its source and page.
+    """
+    seen = set()
+    spans: Dict[Tuple, List[Tuple[int, int]]] = {}
+    blocks = []
+    used = 0
+    for doc in docs:
+        key = chunk_key(doc)
+        if key in seen or _overlap_ratio(doc, spans) > max_overlap:
+            continue
+        seen.add(key)
+
+        label = doc.metadata.get("source", "document")
+        if doc.metadata.get("page") is not None:
+            label += f", page {doc.metadata['page'] + 1}"
+        # The label and the separator from the previous block count toward the budget
+        header = ("\n\n" if blocks else "") + f"[{label}]\n"
+        header_tokens = token_counter(header)
+        text = doc.page_content
+        tokens = token_counter(text)
+        remaining = budget_tokens - used - header_tokens
+        if tokens > remaining:
+            if remaining < min_fragment_tokens:
+                break
+            text = _truncate(text, remaining, token_counter)
+            tokens = token_counter(text)
+
+        blocks.append(header + text)
+        used += header_tokens + tokens
+        start = doc.metadata.get("start_index", -1)
+        if start >= 0:
+            spans.setdefault((doc.metadata.get("source"), doc.metadata.get("page")), []).append(
+                (start, start + len(text))
+            )
+    return "".join(blocks)
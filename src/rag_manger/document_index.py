@@ -0,0 +1,142 @@
+import os
+import threading
+from typing import List, Tuple
+
+import numpy as np
+from utils.logging_utils import logger
+
+
+def unit_rows(vectors) -> np.ndarray:
+    """Return embeddings as float32 rows of unit length, so their sum points like their centroid."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+
+class DocumentIndex:
+    """
+    One embedding per document, the normalized mean of its chunk embeddings.
+
+    It is the first stage of hierarchical retrieval: a question is compared
+    with every document's centroid to pick the documents worth searching,
+    which takes one small matrix-vector product however many chunks the
+    collection holds. Persisted as a ``.npz`` file next to the collection.
+    """
+
+    def __init__(self, path: str):
+        """
+        Load the index from disk, or start an empty one.
+
+        Args:
+            path (str): Path of the ``.npz`` file backing the index.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._ids: List[str] = []
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+        self._mtime = None
+        self._refresh()
+
+    def _refresh(self) -> None:
+        """Reload the index if another instance changed the file on disk."""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._mtime:
+            return
+        with np.load(self.path) as data:
+            self._ids = data["ids"].tolist()
+            self._matrix = data["centroids"]
+        self._mtime = mtime
+        logger.info(f"Loaded {len(self._ids)} document embeddings from {self.path}")
+
+    def _save(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # np.savez appends .npz to names without it
+        tmp_path = f"{self.path}.tmp.npz"
+        np.savez(tmp_path, ids=np.array(self._ids, dtype=str), centroids=self._matrix)
+        os.replace(tmp_path, self.path)
+        self._mtime = os.stat(self.path).st_mtime_ns
+
+    def add(self, doc_id: str, vector: np.ndarray) -> None:
+        """
+        Index a document, replacing its previous embedding if any.
+
+        Args:
+            doc_id (str): The document id.
+            vector (np.ndarray): The sum or mean of its chunk embeddings; it is normalized here.
+        """
+        vector = np.asarray(vector, dtype=np.float32)
+        vector = vector / (np.linalg.norm(vector) or 1.0)
+        # New lists and matrices are bound together, never changed in place, so a
+        # concurrent search always sees ids and rows that match
+        with self._lock:
+            self._refresh()
+            if doc_id in self._ids:
+                matrix = self._matrix.copy()
+                matrix[self._ids.index(doc_id)] = vector
+                self._matrix = matrix
+            elif self._matrix.shape[0] and self._matrix.shape[1] == vector.shape[0]:
+                self._ids, self._matrix = (
+                    self._ids + [doc_id],
+                    np.vstack([self._matrix, vector[None]]),
+                )
+            else:
+                # The first document, or a new embedding model
+                self._ids, self._matrix = [doc_id], vector[None].copy()
+            self._save()
+
+    def remove(self, doc_id: str) -> None:
+        """Remove a document from the index."""
+        with self._lock:
+            self._refresh()
+            if doc_id not in self._ids:
+                return
+            row = self._ids.index(doc_id)
+            self._ids, self._matrix = (
+                self._ids[:row] + self._ids[row + 1 :],
+                np.delete(self._matrix, row, axis=0),
+            )
+            self._save()
+
+    def clear(self) -> None:
+        """Remove every document from the index."""
+        with self._lock:
+            self._ids, self._matrix = [], np.zeros((0, 0), dtype=np.float32)
+            self._save()
+
+    def search(self, vector: np.ndarray, top_n: int) -> List[Tuple[str, float]]:
+        """
+        Find the documents closest to a query.
+
+        Args:
+            vector (np.ndarray): The query embedding.
+            top_n (int): Number of documents to return.
+
+        Returns:
+            List[Tuple[str, float]]: (document id, cosine similarity) pairs, best first.
+        """
+        with self._lock:
+            self._refresh()
+            ids, matrix = self._ids, self._matrix
+        vector = np.asarray(vector, dtype=np.float32)
+        if not ids or matrix.shape[1] != vector.shape[0]:
+            return []
+        scores = matrix @ (vector / (np.linalg.norm(vector) or 1.0))
+        top_n = min(top_n, len(ids))
+        top = np.argpartition(-scores, top_n - 1)[:top_n]
+        top = top[np.argsort(-scores[top])]
+        return [(ids[i], float(scores[i])) for i in top]
+
+    def __contains__(self, doc_id: str) -> bool:
+        with self._lock:
+            self._refresh()
+            return doc_id in self._ids
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._ids)
@@ -0,0 +1,211 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+from utils.logging_utils import logger
+
+
+class EmbeddingCache:
+    """Persistent, size-capped LRU cache of embeddings keyed by (model, text hash)."""
+
+    def __init__(self, path: str, max_entries: int = 200_000):
+        """
+        Open (or create) the on-disk embedding cache.
+
+        Args:
+            path (str): Path of the SQLite file backing the cache.
+            max_entries (int): Maximum number of embeddings kept before LRU eviction.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            )"""
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_last_access ON embeddings (last_access)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        """Return the content hash used as cache key for a chunk of text."""
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Look up the embeddings of several texts.
+
+        Args:
+            model (str): Name of the embedding model.
+            texts (List[str]): Texts to look up.
+
+        Returns:
+            List[Optional[List[float]]]: One vector per text, None on a miss.
+        """
+        hashes = [self.text_hash(text) for text in texts]
+        found = {}
+        with self._lock:
+            # SQLite limits the number of bound parameters per statement
+            for start in range(0, len(hashes), 500):
+                batch = hashes[start : start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings "
+                    f"WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *batch],
+                ).fetchall()
+                found.update({h: array("f", blob).tolist() for h, blob in rows})
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE model = ? AND text_hash = ?",
+                    [(now, model, h) for h in found],
+                )
+                self._conn.commit()
+            hits = sum(1 for h in hashes if h in found)
+            self.hits += hits
+            self.misses += len(hashes) - hits
+        return [found.get(h) for h in hashes]
+
+    def put_many(self, model: str, texts: List[str], vectors: List[List[float]]) -> None:
+        """
+        Store embeddings for several texts, evicting least recently used entries if needed.
+
+        Args:
+            model (str): Name of the embedding model.
+            texts (List[str]): Texts that were embedded.
+            vectors (List[List[float]]): Their embeddings, in the same order.
+        """
+        now = time.time()
+        rows = [
+            (model, self.text_hash(text), array("f", vector).tobytes(), now)
+            for text, vector in zip(texts, vectors)
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_access) "
+                "VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """Drop the least recently used entries above ``max_entries``."""
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE rowid IN "
+                "(SELECT rowid FROM embeddings ORDER BY last_access LIMIT ?)",
+                (overflow,),
+            )
+            logger.info(f"Evicted {overflow} entries from embedding cache")
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and the current number of cached embeddings."""
+        with self._lock:
+            (size,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": size,
+            "max_entries": self.max_entries,
+        }
+
+    def clear(self) -> None:
+        """Remove every cached embedding and reset the counters."""
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+            self.hits = 0
+            self.misses = 0
+
+
+_shared_caches: Dict[str, EmbeddingCache] = {}
+_shared_caches_lock = threading.Lock()
+
+
+def shared_embedding_cache(path: str, max_entries: int = 200_000) -> EmbeddingCache:
+    """
+    Return the process-wide cache backed by ``path``, opening it on first use.
+
+    Every Rag instance shares one connection and one set of hit/miss counters
+    instead of opening the SQLite file once per collection.
+
+    Args:
+        path (str): Path of the SQLite file backing the cache.
+        max_entries (int): Maximum number of embeddings kept, used when the
+            cache is first opened.
+    """
+    path = os.path.abspath(path)
+    with _shared_caches_lock:
+        if path not in _shared_caches:
+            _shared_caches[path] = EmbeddingCache(path, max_entries)
+        return _shared_caches[path]
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that serves document embeddings from an EmbeddingCache."""
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache, model_name: str):
+        """
+        Wrap an embeddings model with a cache.
+
+        Args:
+            embeddings (Embeddings): The underlying embeddings model.
+            cache (EmbeddingCache): The cache to read from and write to.
+            model_name (str): Name of the model, used as part of the cache key.
+        """
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model_name = model_name
+        # The same question is embedded by the semantic cache and by retrieval
+        self._recent_queries: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._query_lock = threading.Lock()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents, only calling the underlying model for cache misses."""
+        vectors = self.cache.get_many(self.model_name, texts)
+        # Embed each distinct missing text once, even if it repeats within the batch
+        missing = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+        if missing:
+            new_vectors = self.embeddings.embed_documents(missing)
+            self.cache.put_many(self.model_name, missing, new_vectors)
+            computed = dict(zip(missing, new_vectors))
+            vectors = [v if v is not None else computed[t] for t, v in zip(texts, vectors)]
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a query with the underlying model, reusing recent query embeddings."""
+        with self._query_lock:
+            if text in self._recent_queries:
+                self._recent_queries.move_to_end(text)
+                return self._recent_queries[text]
+        vector = self.embeddings.embed_query(text)
+        with self._query_lock:
+            self._recent_queries[text] = vector
+            if len(self._recent_queries) > 256:
+                self._recent_queries.popitem(last=False)
+        return vector
@@ -0,0 +1,115 @@
+import uuid
+from collections.abc import Sized
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+from itertools import islice
+from typing import Callable, ContextManager, Iterable, List, Optional
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_community.vectorstores import Chroma
+from langchain_core.vectorstores import VectorStore
+from utils.logging_utils import logger
+from utils.metrics import span
+
+
+class IngestionPipeline:
+    """Embeds document chunks in concurrent batches and upserts them as they complete."""
+
+    def __init__(self, embeddings: Embeddings, batch_size: int = 32, max_workers: int = 4):
+        """
+        Initialize the ingestion pipeline.
+
+        Args:
+            embeddings (Embeddings): The embeddings model used to embed chunks.
+            batch_size (int): Number of chunks sent to the embeddings model per request.
+            max_workers (int): Maximum number of embedding requests in flight.
+        """
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+
+    def _embed_batch(self, batch: List[Document]) -> List[List[float]]:
+        with span("embed_batch", chunks=len(batch)):
+            return self.embeddings.embed_documents([doc.page_content for doc in batch])
+
+    def run(
+        self,
+        vector_db: VectorStore,
+        chunks: Iterable[Document],
+        on_progress: Optional[Callable[[int, Optional[int]], None]] = None,
+        on_batch: Optional[Callable[[List[Document], List[List[float]]], None]] = None,
+        writing: Optional[Callable[[], ContextManager]] = None,
+    ) -> int:
+        """
+        Embed and upsert chunks into a vector database.
+
+        Chunks are pulled from ``chunks`` lazily and at most ``2 * max_workers``
+        batches are in flight, so a generator of chunks is never fully
+        materialized in memory.
+
+        Args:
+            vector_db (VectorStore): The vector database to upsert into, either
+                Chroma or a store implementing ``upsert_embeddings``.
+            chunks (Iterable[Document]): The document chunks to ingest, a list or
+                a lazy iterator.
+            on_progress (Optional[Callable[[int, Optional[int]], None]]): Called with
+                (chunks done, total chunks) after every upserted batch. The total
+                is None when ``chunks`` has no length.
+            on_batch (Optional[Callable[[List[Document], List[List[float]]], None]]):
+                Called with every batch and its embeddings once it is upserted.
+            writing (Optional[Callable[[], ContextManager]]): Returns a context held
+                around every upsert and its ``on_batch`` call, e.g. a collection
+                lock, so other writers only wait for one batch rather than the file.
+
+        Returns:
+            int: The number of chunks ingested.
+        """
+        total = len(chunks) if isinstance(chunks, Sized) else None
+        iterator = iter(chunks)
+        done = 0
+        logger.info(
+            f"Ingesting {total if total is not None else 'a stream of'} chunks "
+            f"in batches of {self.batch_size} with {self.max_workers} workers"
+        )
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = {}
+
+            def fill() -> None:
+                while len(pending) < 2 * self.max_workers:
+                    batch = list(islice(iterator, self.batch_size))
+                    if not batch:
+                        return
+                    pending[executor.submit(self._embed_batch, batch)] = batch
+
+            fill()
+            # Upserts happen on this thread, overlapping with embeddings still in flight
+            while pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    batch, vectors = pending.pop(future), future.result()
+                    with writing() if writing is not None else nullcontext():
+                        self.upsert(vector_db, batch, vectors)
+                        if on_batch is not None:
+                            on_batch(batch, vectors)
+                    done += len(batch)
+                    if on_progress is not None:
+                        on_progress(done, total)
+                fill()
+        logger.info(f"Ingested {done} chunks")
+        return done
+
+    @staticmethod
+    def upsert(vector_db: VectorStore, batch: List[Document], vectors: List[List[float]]) -> None:
+        """Upsert a batch of chunks with precomputed embeddings."""
+        ids = [doc.id or str(uuid.uuid4()) for doc in batch]
+        documents = [doc.page_content for doc in batch]
+        # Chroma rejects empty metadata dicts, but accepts None
+        metadatas = [doc.metadata or None for doc in batch]
+        with span("upsert", chunks=len(batch)):
+            if isinstance(vector_db, Chroma):
+                vector_db._collection.upsert(
+                    ids=ids, embeddings=vectors, documents=documents, metadatas=metadatas
+                )
+            else:
+                vector_db.upsert_embeddings(ids, vectors, documents, metadatas)
@@ -0,0 +1,297 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Iterable, Iterator, List, Optional
+
+from config import JOBS_CONFIG, PARSING_CONFIG
+from utils.logging_utils import logger
+from utils.metrics import metrics
+from utils.utils import parse_file
+from rag_manger.collection_manager import collection_manager
+
+QUEUED, RUNNING, DONE, SKIPPED, FAILED, CANCELLED = (
+    "queued",
+    "running",
+    "done",
+    "skipped",
+    "failed",
+    "cancelled",
+)
+
+
+class JobCancelled(Exception):
+    """Raised inside a running job once it has been cancelled."""
+
+
+@dataclass
+class IngestionJob:
+    """A file being added to a collection in the background, and its progress."""
+
+    job_id: str
+    collection: str
+    source: str
+    content_hash: str
+    size_bytes: int
+    llm_model: str
+    embeddings_model: str
+    status: str = QUEUED
+    chunks_done: int = 0
+    pages_done: int = 0
+    pages_total: Optional[int] = None
+    doc_id: Optional[str] = None
+    error: Optional[str] = None
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    cancel_requested: bool = False
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, SKIPPED, FAILED, CANCELLED)
+
+    @property
+    def progress(self) -> Optional[float]:
+        """Fraction of the file ingested, None while it cannot be estimated."""
+        if self.finished:
+            return 1.0
+        if self.pages_total:
+            # Embedding pulls a few batches ahead, so a job is not done at its last page
+            return min(self.pages_done / self.pages_total, 0.99)
+        return None
+
+
+class JobManager:
+    """
+    Runs ingestion jobs on a worker pool, so uploads do not block the session that made them.
+
+    Jobs live in the server process, not in a session: a session that
+    reconnects finds the jobs of its collection with ``list``. Files are
+    parsed on a process pool a few pages per task, starting as soon as they
+    are submitted, and the job workers embed each range of pages as it is
+    parsed. Chunks are searchable as soon as their batch is upserted,
+    before the job completes. Jobs of the same collection embed concurrently
+    and take the collection lock only to write a batch or register a document.
+    """
+
+    def __init__(self, max_workers: int = 2, history: int = 100):
+        """
+        Initialize the manager.
+
+        Args:
+            max_workers (int): Number of jobs embedding at once, across all collections.
+            history (int): Number of finished jobs remembered for status queries.
+        """
+        self.history = history
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        # Started on the first submission, so importing this module spawns no process
+        self._parser: Optional[ProcessPoolExecutor] = None
+        # job id -> its page ranges being parsed, in page order; kept off the
+        # job so it stays serializable
+        self._parsing: Dict[str, Deque[Future]] = {}
+        self._jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        metrics.gauge(
+            "ingestion_jobs_active",
+            "Ingestion jobs queued or running.",
+            lambda: len([job for job in self.list() if not job.finished]),
+        )
+
+    def lock(self, collection: str) -> threading.Lock:
+        """Lock serializing ingestion and deletion within a collection."""
+        with self._lock:
+            return self._locks.setdefault(collection, threading.Lock())
+
+    def _parse(self, source: str, path: str, embeddings_model: str, first_page: int = 0) -> Future:
+        with self._lock:
+            if self._parser is None:
+                self._parser = ProcessPoolExecutor(
+                    max_workers=PARSING_CONFIG["max_workers"] or os.cpu_count()
+                )
+            return self._parser.submit(
+                parse_file,
+                source,
+                path,
+                embeddings_model,
+                first_page,
+                PARSING_CONFIG["pages_per_task"],
+            )
+
+    def submit(
+        self,
+        collection: str,
+        source: str,
+        path: str,
+        content_hash: str,
+        llm_model: str,
+        embeddings_model: str,
+    ) -> IngestionJob:
+        """
+        Queue a file for ingestion into a collection.
+
+        Args:
+            collection (str): The collection (namespace) to add the file to.
+            source (str): The file name.
+            path (str): The raw file, e.g. spilled by ``spill_to_file``. The job
+                owns it and removes it once finished.
+            content_hash (str): Hash of the file.
+            llm_model (str): Chat model of the engine doing the ingestion, so the
+                engine serving the session's questions sees the new chunks at once.
+            embeddings_model (str): The embedding model.
+
+        Returns:
+            IngestionJob: The new job, or the unfinished job already ingesting
+            the same file into the collection.
+        """
+        with self._lock:
+            for job in self._jobs.values():
+                if (
+                    job.collection == collection
+                    and job.content_hash == content_hash
+                    and not job.finished
+                ):
+                    os.remove(path)
+                    return job
+            job = IngestionJob(
+                job_id=uuid.uuid4().hex[:12],
+                collection=collection,
+                source=source,
+                content_hash=content_hash,
+                size_bytes=os.path.getsize(path),
+                llm_model=llm_model,
+                embeddings_model=embeddings_model,
+            )
+            self._jobs[job.job_id] = job
+            self._trim()
+        try:
+            self._parsing[job.job_id] = deque([self._parse(source, path, embeddings_model)])
+            self._executor.submit(self._run, job, path)
+        except Exception as e:
+            # e.g. the worker processes could not be started
+            logger.error(f"Could not start ingestion job {job.job_id} for {source}: {e}")
+            self._parsing.pop(job.job_id, None)
+            os.remove(path)
+            job.error, job.finished_at = str(e), time.time()
+            job.status = FAILED
+            return job
+        logger.info(f"Queued ingestion job {job.job_id} for {source} into {collection}")
+        return job
+
+    def _trim(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[: max(len(finished) - self.history, 0)]:
+            del self._jobs[job_id]
+
+    def _parsed_chunks(self, job: IngestionJob, path: str) -> Iterator:
+        """Yield the chunks of a file in page order, as its page ranges are parsed."""
+        pending = self._parsing[job.job_id]
+        next_page = PARSING_CONFIG["pages_per_task"]
+        try:
+            while pending:
+                chunks, spans, job.pages_total = pending[0].result()
+                pending.popleft()
+                for recorded in spans:
+                    metrics.record(**recorded)
+                # The page count is known once the first range is parsed
+                while (
+                    job.pages_total is not None
+                    and next_page < job.pages_total
+                    and len(pending) < PARSING_CONFIG["tasks_ahead"]
+                ):
+                    pending.append(self._parse(job.source, path, job.embeddings_model, next_page))
+                    next_page += PARSING_CONFIG["pages_per_task"]
+                yield from chunks
+        finally:
+            # Stopped early: the job failed or was cancelled
+            for future in pending:
+                future.cancel()
+
+    def _track(self, job: IngestionJob, chunks: Iterable) -> Iterator:
+        # Pages are counted as their chunks are handed to embedding, which pulls
+        # a few batches ahead of the upserts
+        for chunk in chunks:
+            if job.cancel_requested:
+                raise JobCancelled()
+            job.pages_done = max(job.pages_done, chunk.metadata.get("page", 0) + 1)
+            yield chunk
+
+    def _run(self, job: IngestionJob, path: str) -> None:
+        status = CANCELLED
+        try:
+            if job.cancel_requested:
+                return
+            job.status, job.started_at = RUNNING, time.time()
+            with collection_manager.checkout(
+                job.collection, job.llm_model, job.embeddings_model
+            ) as rag, open(path, "rb") as f:
+
+                def on_progress(done: int, total: Optional[int]) -> None:
+                    job.chunks_done = done
+
+                record = rag.add_document_stream(
+                    job.source,
+                    job.content_hash,
+                    self._track(job, self._parsed_chunks(job, path)),
+                    on_progress=on_progress,
+                    source_file=f,
+                    lock=self.lock(job.collection),
+                )
+            if record is None:
+                status = SKIPPED
+            else:
+                status, job.doc_id = DONE, record.doc_id
+        except (JobCancelled, CancelledError):
+            pass
+        except Exception as e:
+            # A cancelled job fails once its collection is deleted under it
+            if not job.cancel_requested:
+                logger.error(f"Ingestion job {job.job_id} for {job.source} failed: {e}")
+                status, job.error = FAILED, str(e)
+        finally:
+            self._parsing.pop(job.job_id, None)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            # Set last, so a finished job always has its end time
+            job.finished_at = time.time()
+            job.status = status
+        elapsed = job.finished_at - (job.started_at or job.submitted_at)
+        logger.info(f"Ingestion job {job.job_id} {job.status} in {elapsed:.2f}s")
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        """Return a job by id, None if unknown or forgotten."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self, collection: Optional[str] = None) -> List[IngestionJob]:
+        """Return the known jobs, oldest first, optionally only those of one collection."""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [job for job in jobs if collection is None or job.collection == collection]
+
+    def cancel(self, collection: str) -> List[IngestionJob]:
+        """
+        Cancel the unfinished jobs of a collection.
+
+        A queued job never starts and its parsing is dropped if not begun; a
+        running one stops at its next chunk, and the chunks it already upserted
+        are deleted again.
+
+        Returns:
+            List[IngestionJob]: The jobs asked to stop.
+        """
+        jobs = [job for job in self.list(collection) if not job.finished]
+        for job in jobs:
+            job.cancel_requested = True
+            # Copied, as the job's thread adds and removes ranges
+            for future in list(self._parsing.get(job.job_id, ())):
+                future.cancel()
+        return jobs
+
+
+job_manager = JobManager(**JOBS_CONFIG)
@@ -0,0 +1,639 @@
+import json
+import os
+import shutil
+import threading
+import uuid
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from utils.logging_utils import logger
+
+QUANTIZATIONS = ("int8", "binary")
+# Rows of int8 codes converted to float32 at a time when scoring, a few MB
+SCORING_BLOCK_ROWS = 1024
+
+
+def quantize(vectors: np.ndarray, quantization: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Compress unit vectors for the first pass of a search.
+
+    ``int8`` keeps every component as a byte, scaled by the largest component
+    of its row, in a quarter of the space of float32. ``binary`` keeps only
+    the sign of every component, packed 8 to a byte, in a 32nd of the space.
+
+    Args:
+        vectors (np.ndarray): The L2-normalized vectors, shape (n, dim).
+        quantization (str): "int8" or "binary".
+
+    Returns:
+        Tuple[np.ndarray, Optional[np.ndarray]]: The codes, one row per vector,
+        and the scale of every int8 row (None for binary codes).
+    """
+    if quantization == "int8":
+        scales = np.abs(vectors).max(axis=1) / 127
+        scales[scales == 0] = 1.0
+        return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+    if quantization == "binary":
+        return np.packbits(vectors > 0, axis=1), None
+    raise ValueError(f"Unknown quantization {quantization!r}, expected one of {QUANTIZATIONS}")
+
+
+def empty_codes(rows: int, dim: int, quantization: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Allocate the codes and scales of ``rows`` vectors of ``dim`` components."""
+    if quantization == "int8":
+        return np.zeros((rows, dim), dtype=np.int8), np.ones(rows, dtype=np.float32)
+    return np.zeros((rows, (dim + 7) // 8), dtype=np.uint8), None
+
+
+def _popcount(bits: np.ndarray) -> np.ndarray:
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(bits)
+    # NumPy < 2.0
+    return np.unpackbits(bits[..., None], axis=-1).sum(axis=-1, dtype=np.uint8)
+
+
+def approximate_scores(
+    codes: np.ndarray, scales: Optional[np.ndarray], query: np.ndarray, quantization: str
+) -> np.ndarray:
+    """
+    Score quantized rows against a unit query vector, higher is closer.
+
+    int8 scores approximate the cosine similarity; binary scores are minus
+    the Hamming distance between the sign bits, which only ranks rows.
+    """
+    if quantization == "binary":
+        distances = _popcount(codes ^ np.packbits(query > 0)).sum(axis=1, dtype=np.int32)
+        return -distances.astype(np.float32)
+    scores = np.empty(len(codes), dtype=np.float32)
+    for start in range(0, len(codes), SCORING_BLOCK_ROWS):
+        block = codes[start : start + SCORING_BLOCK_ROWS]
+        np.dot(block.astype(np.float32), query, out=scores[start : start + len(block)])
+    return scores * scales
+
+
+def _best(scores: np.ndarray, k: int) -> np.ndarray:
+    """Return the positions of the k highest scores, highest first."""
+    k = min(k, scores.shape[0])
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+def matches_filter(metadata: dict, where: Optional[dict]) -> bool:
+    """
+    Evaluate a Chroma-style metadata filter against a chunk's metadata.
+
+    Supports plain equality, ``$eq``, ``$ne``, ``$in``, ``$nin``, ``$gt``,
+    ``$gte``, ``$lt``, ``$lte``, ``$and`` and ``$or``.
+    """
+    if not where:
+        return True
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, c) for c in condition):
+                return False
+            continue
+        if key == "$or":
+            if not any(matches_filter(metadata, c) for c in condition):
+                return False
+            continue
+        value = metadata.get(key)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for op, operand in condition.items():
+            if op == "$eq" and value != operand:
+                return False
+            if op == "$ne" and value == operand:
+                return False
+            if op == "$in" and value not in operand:
+                return False
+            if op == "$nin" and value in operand:
+                return False
+            if op in ("$gt", "$gte", "$lt", "$lte"):
+                if value is None:
+                    return False
+                if op == "$gt" and not value > operand:
+                    return False
+                if op == "$gte" and not value >= operand:
+                    return False
+                if op == "$lt" and not value < operand:
+                    return False
+                if op == "$lte" and not value <= operand:
+                    return False
+    return True
+
+
+def _filtered_doc_ids(where: dict) -> Optional[List[str]]:
+    """Return the documents a filter clause on ``doc_id`` alone matches, None for other clauses."""
+    if list(where) != ["doc_id"]:
+        return None
+    condition = where["doc_id"]
+    if not isinstance(condition, dict):
+        return [condition]
+    if list(condition) == ["$eq"]:
+        return [condition["$eq"]]
+    if list(condition) == ["$in"]:
+        return list(condition["$in"])
+    return None
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    In-process vector store backed by contiguous float32 matrices.
+
+    Rows are L2-normalized, so cosine similarity is a single matrix-vector
+    product and the top-k is selected with ``argpartition``. The matrix can be
+    persisted to ``persist_directory`` and memory-mapped back on load.
+
+    The persisted rows are never written in place. Vectors upserted since the
+    last ``persist`` are appended to a buffer in RAM. Deleted or replaced rows
+    are only marked as deleted. ``persist`` drops them while writing the next
+    file, block by block, so a memory-mapped matrix is never read into RAM in
+    full.
+
+    With ``quantization``, searches first score int8 or binary copies of the
+    rows, which are always held in RAM, and then rescore the best
+    ``rescore_factor * k`` of them exactly from the float32 rows. Those are
+    memory-mapped once persisted, so only the shortlisted rows are read from
+    disk.
+    """
+
+    def __init__(
+        self,
+        embedding_function: Embeddings,
+        collection_name: str = "myRAG",
+        persist_directory: Optional[str] = None,
+        mmap: bool = False,
+        quantization: Optional[str] = None,
+        rescore_factor: int = 4,
+    ):
+        """
+        Open (or create) a collection.
+
+        Args:
+            embedding_function (Embeddings): Model used to embed texts and queries.
+            collection_name (str): Name of the collection.
+            persist_directory (Optional[str]): Directory to persist to, in memory only if None.
+            mmap (bool): Memory-map the persisted matrix instead of reading it into RAM.
+                Always on with ``quantization``.
+            quantization (Optional[str]): "int8" or "binary" to search quantized
+                copies of the vectors first, None to search the float32 matrix only.
+            rescore_factor (int): With ``quantization``, the number of shortlisted
+                rows rescored exactly, as a multiple of k.
+        """
+        if quantization is not None and quantization not in QUANTIZATIONS:
+            raise ValueError(
+                f"Unknown quantization {quantization!r}, expected one of {QUANTIZATIONS}"
+            )
+        self.embedding_function = embedding_function
+        self.collection_name = collection_name
+        self.persist_directory = persist_directory
+        self.quantization = quantization
+        self.rescore_factor = rescore_factor
+        self.mmap = mmap or quantization is not None
+        self._lock = threading.RLock()
+        # Rows 0 .. len(_base) - 1 as persisted, memory-mapped with mmap; read only
+        self._base = np.zeros((0, 0), dtype=np.float32)
+        # Rows appended since, the first _size - len(_base) rows of a growing buffer
+        self._tail = np.zeros((0, 0), dtype=np.float32)
+        # Rows deleted or replaced since the last persist, dropped by the next one
+        self._deleted = np.zeros(0, dtype=bool)
+        # Quantized rows, and the scale of every int8 row, aligned with the rows
+        self._codes: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+        # Rows in use, including deleted ones, and rows not deleted
+        self._size = 0
+        self._live = 0
+        self._ids: List[str] = []
+        self._texts: List[str] = []
+        self._metadatas: List[dict] = []
+        # chunk id -> its row, for rows not deleted
+        self._rows: Dict[str, int] = {}
+        # doc id -> rows of its chunks, built on the first filtered search
+        self._doc_rows: Optional[Dict[str, List[int]]] = None
+        self._load()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding_function
+
+    @property
+    def _path(self) -> Optional[str]:
+        if self.persist_directory is None:
+            return None
+        return os.path.join(self.persist_directory, f"{self.collection_name}_numpy")
+
+    @property
+    def _dim(self) -> int:
+        return self._base.shape[1] or self._tail.shape[1]
+
+    def _load(self) -> None:
+        path = self._path
+        if path is None or not os.path.exists(os.path.join(path, "meta.json")):
+            return
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self._base = np.load(
+            os.path.join(path, "vectors.npy"), mmap_mode="r" if self.mmap else None
+        )
+        self._tail = np.zeros((0, self._base.shape[1]), dtype=np.float32)
+        self._ids, self._texts, self._metadatas = meta["ids"], meta["texts"], meta["metadatas"]
+        self._size = self._live = len(self._ids)
+        self._deleted = np.zeros(self._size, dtype=bool)
+        self._rows = {chunk_id: row for row, chunk_id in enumerate(self._ids)}
+        self._doc_rows = None
+        if self.quantization is not None:
+            self._load_codes(path)
+        logger.info(f"Loaded {self._size} vectors from {path} (mmap={self.mmap})")
+
+    def _code_paths(self, path: str) -> Tuple[str, str]:
+        return (
+            os.path.join(path, f"codes-{self.quantization}.npy"),
+            os.path.join(path, f"scales-{self.quantization}.npy"),
+        )
+
+    def _load_codes(self, path: str) -> None:
+        codes_path, scales_path = self._code_paths(path)
+        if os.path.exists(codes_path):
+            codes = np.load(codes_path)
+            scales = np.load(scales_path) if self.quantization == "int8" else None
+            if len(codes) == self._size:
+                self._codes, self._scales = codes, scales
+                return
+        # Persisted without quantization, or with another one
+        self._codes, self._scales = empty_codes(self._size, self._dim, self.quantization)
+        for start in range(0, self._size, 8 * SCORING_BLOCK_ROWS):
+            end = start + 8 * SCORING_BLOCK_ROWS
+            codes, scales = quantize(np.asarray(self._base[start:end]), self.quantization)
+            self._codes[start:end] = codes
+            if scales is not None:
+                self._scales[start:end] = scales
+        logger.info(f"Quantized {self._size} vectors to {self.quantization}")
+
+    def _vectors(self, rows: np.ndarray) -> np.ndarray:
+        """Gather float32 rows, from the persisted matrix or the buffer of new rows."""
+        rows = np.asarray(rows, dtype=np.int64)
+        base_rows = len(self._base)
+        in_base = rows < base_rows
+        vectors = np.empty((len(rows), self._dim), dtype=np.float32)
+        vectors[in_base] = self._base[rows[in_base]]
+        vectors[~in_base] = self._tail[rows[~in_base] - base_rows]
+        return vectors
+
+    def _live_rows(self) -> np.ndarray:
+        return np.flatnonzero(~self._deleted[: self._size])
+
+    def _keep(self, rows: np.ndarray) -> None:
+        """Renumber the rows kept by a compaction, in order, from 0."""
+        self._ids = [self._ids[r] for r in rows]
+        self._texts = [self._texts[r] for r in rows]
+        self._metadatas = [self._metadatas[r] for r in rows]
+        self._rows = {chunk_id: row for row, chunk_id in enumerate(self._ids)}
+        self._size = self._live = len(rows)
+        self._deleted = np.zeros(self._size, dtype=bool)
+        self._doc_rows = None
+        if self._codes is not None:
+            self._codes = self._codes[rows]
+            if self._scales is not None:
+                self._scales = self._scales[rows]
+
+    def persist(self) -> None:
+        """Write the collection to ``persist_directory``, dropping deleted rows."""
+        path = self._path
+        if path is None:
+            return
+        with self._lock:
+            os.makedirs(path, exist_ok=True)
+            rows = self._live_rows()
+            vectors_path = os.path.join(path, "vectors.npy")
+            tmp_path = os.path.join(path, "vectors.tmp.npy")
+            # Copied block by block, so the persisted rows are never all in RAM at once
+            vectors = np.lib.format.open_memmap(
+                tmp_path, mode="w+", dtype=np.float32, shape=(len(rows), self._dim)
+            )
+            for start in range(0, len(rows), 8 * SCORING_BLOCK_ROWS):
+                block = rows[start : start + 8 * SCORING_BLOCK_ROWS]
+                vectors[start : start + len(block)] = self._vectors(block)
+            vectors.flush()
+            del vectors
+            with open(os.path.join(path, "meta.json.tmp"), "w", encoding="utf-8") as f:
+                json.dump(
+                    {
+                        "ids": [self._ids[r] for r in rows],
+                        "texts": [self._texts[r] for r in rows],
+                        "metadatas": [self._metadatas[r] for r in rows],
+                    },
+                    f,
+                )
+            if self._codes is not None:
+                codes_path, scales_path = self._code_paths(path)
+                np.save(codes_path, self._codes[rows])
+                if self._scales is not None:
+                    np.save(scales_path, self._scales[rows])
+            dim = self._dim
+            self._keep(rows)
+            # A memory-mapped matrix must be released before its file is replaced
+            self._base = np.zeros((0, dim), dtype=np.float32)
+            os.replace(tmp_path, vectors_path)
+            os.replace(os.path.join(path, "meta.json.tmp"), os.path.join(path, "meta.json"))
+            self._base = np.load(vectors_path, mmap_mode="r" if self.mmap else None)
+            self._tail = np.zeros((0, dim), dtype=np.float32)
+        logger.info(f"Persisted {self._size} vectors to {path}")
+
+    def _compact(self) -> None:
+        """Drop deleted rows in RAM, for collections that are never persisted."""
+        rows = self._live_rows()
+        tail = self._vectors(rows)
+        self._keep(rows)
+        self._base = np.zeros((0, tail.shape[1]), dtype=np.float32)
+        self._tail = tail
+
+    def _reserve(self, rows: int, dim: int) -> None:
+        """Grow the buffer of new rows geometrically so appends are amortized O(1)."""
+        if self._dim != dim:
+            if self._live:
+                raise ValueError(f"Expected {self._dim}-dimensional embeddings, got {dim}")
+            # Empty, or only deleted rows: e.g. the first upsert of a new collection
+            self._clear(dim)
+        base_rows = len(self._base)
+        used = self._size - base_rows
+        capacity = self._tail.shape[0]
+        if used + rows <= capacity and self._tail.shape[1] == dim:
+            return
+        new_capacity = max(used + rows, 2 * capacity, 64)
+        tail = np.zeros((new_capacity, dim), dtype=np.float32)
+        if used:
+            tail[:used] = self._tail[:used]
+        self._tail = tail
+        deleted = np.zeros(base_rows + new_capacity, dtype=bool)
+        deleted[: self._size] = self._deleted[: self._size]
+        self._deleted = deleted
+        if self.quantization is not None:
+            codes, scales = empty_codes(base_rows + new_capacity, dim, self.quantization)
+            if self._size:
+                codes[: self._size] = self._codes[: self._size]
+                if scales is not None:
+                    scales[: self._size] = self._scales[: self._size]
+            self._codes, self._scales = codes, scales
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def upsert_embeddings(
+        self,
+        ids: List[str],
+        embeddings: List[List[float]],
+        documents: List[str],
+        metadatas: List[Optional[dict]],
+    ) -> None:
+        """Insert or replace chunks with precomputed embeddings."""
+        vectors = self._normalize(np.asarray(embeddings, dtype=np.float32))
+        if self.quantization is not None:
+            codes, scales = quantize(vectors, self.quantization)
+        with self._lock:
+            self._doc_rows = None
+            self._reserve(len(ids), vectors.shape[1])
+            start = self._size
+            for chunk_id, text, metadata in zip(ids, documents, metadatas):
+                # A replaced chunk is appended again, its old row only marked deleted
+                self._drop(chunk_id)
+                self._rows[chunk_id] = self._size
+                self._size += 1
+                self._live += 1
+                self._ids.append(chunk_id)
+                self._texts.append(text)
+                self._metadatas.append(metadata or {})
+            base_rows = len(self._base)
+            self._tail[start - base_rows : self._size - base_rows] = vectors
+            if self._codes is not None:
+                self._codes[start : self._size] = codes
+                if self._scales is not None:
+                    self._scales[start : self._size] = scales
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        texts = list(texts)
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        metadatas = metadatas or [{} for _ in texts]
+        self.upsert_embeddings(
+            ids, self.embedding_function.embed_documents(texts), texts, metadatas
+        )
+        return ids
+
+    def _drop(self, chunk_id: str) -> None:
+        row = self._rows.pop(chunk_id, None)
+        if row is None:
+            return
+        self._deleted[row] = True
+        # The text and metadata are not needed any more, the id is kept for alignment
+        self._texts[row], self._metadatas[row] = "", {}
+        self._live -= 1
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        """Delete chunks by id, marking their rows deleted until the next ``persist``."""
+        with self._lock:
+            self._doc_rows = None
+            for chunk_id in ids or []:
+                self._drop(chunk_id)
+            if self._path is None and self._size - self._live > max(self._live, 64):
+                self._compact()
+        return True
+
+    def _clear(self, dim: int = 0) -> None:
+        self._base = np.zeros((0, dim), dtype=np.float32)
+        self._tail = np.zeros((0, dim), dtype=np.float32)
+        self._deleted = np.zeros(0, dtype=bool)
+        self._codes, self._scales = None, None
+        self._size = self._live = 0
+        self._ids, self._texts, self._metadatas, self._rows = [], [], [], {}
+        self._doc_rows = None
+
+    def delete_collection(self) -> None:
+        """Remove every chunk, in memory and on disk."""
+        with self._lock:
+            self._clear()
+            if self._path is not None and os.path.exists(self._path):
+                shutil.rmtree(self._path)
+
+    def get(
+        self,
+        ids: Optional[List[str]] = None,
+        where: Optional[dict] = None,
+        include: Optional[List[str]] = None,
+    ) -> dict:
+        """Fetch chunks by id and/or metadata filter, in the result format of Chroma's ``get``."""
+        with self._lock:
+            if ids:
+                rows = [self._rows[i] for i in ids if i in self._rows]
+                rows = [r for r in rows if matches_filter(self._metadatas[r], where)]
+            elif where:
+                rows = self._filter_rows(where).tolist()
+            else:
+                rows = self._live_rows().tolist()
+            result = {
+                "ids": [self._ids[r] for r in rows],
+                "documents": [self._texts[r] for r in rows],
+                "metadatas": [self._metadatas[r] for r in rows],
+            }
+            if include and "embeddings" in include:
+                result["embeddings"] = self._vectors(rows)
+        return result
+
+    def count(self) -> int:
+        """Return the number of chunks in the collection."""
+        return self._live
+
+    def memory_bytes(self) -> int:
+        """
+        Return the RAM taken by the vectors.
+
+        That is the quantized rows, the rows added since the last persist, the
+        deleted-row mask, and the persisted matrix if it is not memory-mapped.
+        """
+        with self._lock:
+            total = self._tail.nbytes + self._deleted.nbytes
+            if not isinstance(self._base, np.memmap):
+                total += self._base.nbytes
+            if self._codes is not None:
+                total += self._codes.nbytes
+            if self._scales is not None:
+                total += self._scales.nbytes
+            return total
+
+    def _filter_rows(self, where: dict) -> np.ndarray:
+        """
+        Return the rows whose metadata matches a filter.
+
+        A clause on ``doc_id``, alone or within a top-level ``$and``, is looked
+        up in a per-document index of rows, so only the chunks of the selected
+        documents have the rest of the filter evaluated on them.
+        """
+        clauses = where["$and"] if list(where) == ["$and"] else [where]
+        rows, rest = None, []
+        for clause in clauses:
+            doc_ids = _filtered_doc_ids(clause)
+            if doc_ids is None or rows is not None:
+                rest.append(clause)
+                continue
+            if self._doc_rows is None:
+                self._doc_rows = {}
+                for row in self._live_rows().tolist():
+                    doc_id = self._metadatas[row].get("doc_id")
+                    self._doc_rows.setdefault(doc_id, []).append(row)
+            rows = [row for doc_id in doc_ids for row in self._doc_rows.get(doc_id, [])]
+        if rows is None:
+            rows = self._live_rows().tolist()
+        return np.fromiter(
+            (r for r in rows if all(matches_filter(self._metadatas[r], c) for c in rest)),
+            dtype=np.int64,
+        )
+
+    def _scores(self, query: np.ndarray) -> np.ndarray:
+        """Score every row exactly, deleted rows scoring -inf."""
+        base_rows = len(self._base)
+        scores = np.empty(self._size, dtype=np.float32)
+        if base_rows:
+            scores[:base_rows] = self._base @ query
+        scores[base_rows:] = self._tail[: self._size - base_rows] @ query
+        scores[self._deleted[: self._size]] = -np.inf
+        return scores
+
+    def _top_k(
+        self, query: np.ndarray, k: int, filter: Optional[dict] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the rows and cosine scores of the k best matches, best first."""
+        with self._lock:
+            query = self._normalize(query.astype(np.float32))
+            candidates = self._filter_rows(filter) if filter else None
+            count = len(candidates) if candidates is not None else self._live
+            if count == 0:
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+            # Never more than the live rows, so no deleted row is returned
+            k = min(k, count)
+            shortlist = k * self.rescore_factor
+            if self._codes is None or shortlist >= count:
+                if candidates is None:
+                    scores = self._scores(query)
+                else:
+                    scores = self._vectors(candidates) @ query
+                top = _best(scores, k)
+                rows = candidates[top] if candidates is not None else top
+                return rows, scores[top]
+
+            codes = self._codes[: self._size]
+            scales = self._scales[: self._size] if self._scales is not None else None
+            if candidates is not None:
+                codes = codes[candidates]
+                scales = scales[candidates] if scales is not None else None
+            approximate = approximate_scores(codes, scales, query, self.quantization)
+            if candidates is None:
+                approximate[self._deleted[: self._size]] = -np.inf
+            top = _best(approximate, shortlist)
+            # Sorted, so the memory-mapped rows are read in file order
+            rows = np.sort(candidates[top] if candidates is not None else top)
+            scores = self._vectors(rows) @ query
+            best = _best(scores, k)
+            return rows[best], scores[best]
+
+    def similarity_search_by_vector_with_scores(
+        self, embedding: List[float], k: int = 4, filter: Optional[dict] = None
+    ) -> List[Tuple[Document, float]]:
+        # One critical section, as a persist in between would renumber the rows
+        with self._lock:
+            rows, scores = self._top_k(np.asarray(embedding), k, filter)
+            return [
+                (
+                    Document(
+                        id=self._ids[r],
+                        page_content=self._texts[r],
+                        metadata=self._metadatas[r],
+                    ),
+                    float(score),
+                )
+                for r, score in zip(rows, scores)
+            ]
+
+    def similarity_search_by_vector(
+        self, embedding: List[float], k: int = 4, filter: Optional[dict] = None, **kwargs: Any
+    ) -> List[Document]:
+        return [
+            doc for doc, _ in self.similarity_search_by_vector_with_scores(embedding, k, filter)
+        ]
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        embedding = self.embedding_function.embed_query(query)
+        return self.similarity_search_by_vector_with_scores(embedding, k, filter)
+
+    def similarity_search(
+        self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs: Any
+    ) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        # Scores are already cosine similarities
+        return lambda score: score
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> "NumpyVectorStore":
+        store = cls(embedding_function=embedding, **kwargs)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
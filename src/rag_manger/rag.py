@@ -1,19 +1,76 @@
 
+import hashlib
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from operator import itemgetter
+from typing import BinaryIO, Callable, ContextManager, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
 from langchain_ollama.chat_models import ChatOllama
 from langchain_community.vectorstores import Chroma
 from langchain_ollama import OllamaEmbeddings
 from langchain_community.vectorstores import Chroma
 from langchain_ollama.chat_models import ChatOllama
-from langchain.retrievers.multi_query import MultiQueryRetriever
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import PromptTemplate, ChatPromptTemplate
-from langchain_core.runnables import RunnablePassthrough
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain_core.runnables import RunnableLambda
 from utils.logging_utils import logger
+from utils.metrics import metrics, span
+from utils.ollama_client import share_client
+from utils.page_renderer import page_renderer
+from config import (
+    EMBEDDING_CACHE_CONFIG,
+    INGESTION_CONFIG,
+    OLLAMA_CONFIG,
+    RETRIEVAL_CONFIG,
+    SEMANTIC_CACHE_CONFIG,
+    VECTOR_STORE_CONFIG,
+)
+from rag_manger.bm25 import BM25Index
+from rag_manger.chunking import TokenChunker
+from rag_manger.context import generation_settings, pack_context
+from rag_manger.document_index import DocumentIndex, unit_rows
+from rag_manger.embedding_cache import CachedEmbeddings, shared_embedding_cache
+from rag_manger.ingestion import IngestionPipeline
+from rag_manger.numpy_store import NumpyVectorStore
+from rag_manger.registry import DocumentRecord, DocumentRegistry
+from rag_manger.retrieval import FanOutRetriever
+from rag_manger.scheduler import scheduler
+from rag_manger.semantic_cache import SemanticCache
 import streamlit as st
 
+QUERY_PROMPT = PromptTemplate(
+    input_variables=["question"],
+    template="""You are an AI language model assistant. Your task is to generate 2
+    different versions of the given user question to retrieve relevant documents from
+    a vector database. By generating multiple perspectives on the user question, your
+    goal is to help the user overcome some of the limitations of the distance-based
+    similarity search. Provide these alternative questions separated by newlines.
+    Original question: {question}""",
+)
+
+# RAG prompt template
+RAG_PROMPT = ChatPromptTemplate.from_template(
+    """Answer the question based ONLY on the following context:
+    {context}
+    Question: {question}
+    """
+)
+
+
 class Rag:
-    def __init__(self, llm_model: str, embeddings_model: str):
+    def __init__(
+        self,
+        llm_model: str,
+        embeddings_model: str,
+        collection_name: str = "myRAG",
+        persist_directory: str = "./chroma_db",
+        vector_store: str = VECTOR_STORE_CONFIG["backend"],
+    ):
         """
         Initialize the RAG manager with a vector database and selected language model.
         
@@ -21,78 +78,566 @@ class Rag:
             vector_db (Chroma): The vector database containing document embeddings.
             selected_model (str): The name of the selected language model.
             embeddings_model (str): The name of the embeddings model.
+            collection_name (str): Name of the vector store collection.
+            persist_directory (str): Path to save the vector store.
+            vector_store (str): Vector store backend, "chroma" or "numpy".
         """
-        self.llm = ChatOllama(model=llm_model)
-        self.embeddings_model = OllamaEmbeddings(model=embeddings_model)
+        self.collection_name = collection_name
+        self.persist_directory = persist_directory
+        self.vector_store = vector_store
+        self.generation_settings = generation_settings(llm_model)
+        self.llm = share_client(
+            ChatOllama(
+                model=llm_model,
+                num_ctx=self.generation_settings["num_ctx"],
+                keep_alive=OLLAMA_CONFIG["keep_alive"],
+            )
+        )
+        self.embedding_cache = shared_embedding_cache(**EMBEDDING_CACHE_CONFIG)
+        # Cache misses of every Rag instance using this model are embedded in shared batches
+        self.embeddings_model = CachedEmbeddings(
+            scheduler.batched_embeddings(
+                embeddings_model,
+                share_client(
+                    OllamaEmbeddings(
+                        model=embeddings_model, keep_alive=OLLAMA_CONFIG["keep_alive"]
+                    )
+                ),
+            ),
+            self.embedding_cache,
+            embeddings_model,
+        )
+        self.chunker = TokenChunker(embeddings_model)
+        self.ingestion = IngestionPipeline(self.embeddings_model, **INGESTION_CONFIG)
+        self.registry = DocumentRegistry(
+            os.path.join(persist_directory, f"{collection_name}_registry.json")
+        )
+        self.bm25 = BM25Index(os.path.join(persist_directory, f"{collection_name}_bm25.json"))
+        self.document_index = DocumentIndex(
+            os.path.join(persist_directory, f"{collection_name}_documents.npz")
+        )
+        self.sources_directory = os.path.join(persist_directory, f"{collection_name}_files")
+        self.semantic_cache = SemanticCache(**SEMANTIC_CACHE_CONFIG)
         self.vector_db = None
+        self._chain = None
+        self._chain_db = None
+        self.last_ttft = None
+        # Ingestions in progress; their chunks are searchable before they complete
+        self._ingesting = 0
+        self._ingesting_lock = threading.Lock()
         logger.info("RAG manager initialized")
     
     def create_chuncks(self, data) -> list:
-        text_splitter = RecursiveCharacterTextSplitter(chunk_size=7500, chunk_overlap=100)
-        chunks = text_splitter.split_documents(data)
+        chunks = self.chunker.split_documents(data)
         logger.info("Document split into chunks")
         return chunks
     
-    def create_vector_db(self, data) -> Chroma:
+    def create_vector_db(self, data, on_progress=None) -> Chroma:
         """
         Create a vector database from an uploaded PDF file.
 
         Args:
             data (str): The content of the PDF file.
+            on_progress (Optional[Callable[[int, int], None]]): Called with
+                (chunks done, total chunks) as embedding batches are upserted.
 
         Returns:
             Chroma: A vector store containing the processed document chunks.
         """
         logger.info("Creating vector DB from file upload")
         chunks = self.create_chuncks(data)
-        self.vector_db = Chroma.from_documents(
-            documents=chunks,
-            embedding=self.embeddings_model,
-            collection_name="myRAG",
-            persist_directory="./chroma_db"
-        )
-        logger.info("Vector DB created")
+        return self.create_vector_db_from_chunks(chunks, on_progress=on_progress)
+
+    def create_vector_db_from_chunks(self, chunks, on_progress=None) -> Chroma:
+        """
+        Create a vector database from document chunks that are already split.
+
+        Args:
+            chunks (list): The document chunks to embed.
+            on_progress (Optional[Callable[[int, int], None]]): Called with
+                (chunks done, total chunks) as embedding batches are upserted.
+
+        Returns:
+            Chroma: A vector store containing the document chunks.
+        """
+        self.add_documents(chunks, on_progress=on_progress)
+        logger.info(f"Vector DB created, embedding cache stats: {self.embedding_cache.stats()}")
         return self.vector_db
-    
-    def run(self, question: str, vector_db:Chroma) -> str:
-
-        QUERY_PROMPT = PromptTemplate(
-            input_variables=["question"],
-            template="""You are an AI language model assistant. Your task is to generate 2
-            different versions of the given user question to retrieve relevant documents from
-            a vector database. By generating multiple perspectives on the user question, your
-            goal is to help the user overcome some of the limitations of the distance-based
-            similarity search. Provide these alternative questions separated by newlines.
-            Original question: {question}""",
-        )
-        self.retriever = MultiQueryRetriever.from_llm(
-            vector_db.as_retriever(), 
-            self.llm,
-            prompt=QUERY_PROMPT
-        )
 
-        logger.info(f"Processing question: {question} using model: {self.llm}")
+    def load_vector_db(self) -> Chroma:
+        """
+        Open the persisted collection, creating it if it does not exist yet.
+
+        Returns:
+            Chroma: The vector store of this collection.
+        """
+        if self.vector_db is None:
+            if self.vector_store == "numpy":
+                self.vector_db = NumpyVectorStore(
+                    embedding_function=self.embeddings_model,
+                    collection_name=self.collection_name,
+                    persist_directory=self.persist_directory,
+                    mmap=VECTOR_STORE_CONFIG["mmap"],
+                    quantization=VECTOR_STORE_CONFIG["quantization"],
+                    rescore_factor=VECTOR_STORE_CONFIG["rescore_factor"],
+                )
+            else:
+                self.vector_db = Chroma(
+                    collection_name=self.collection_name,
+                    embedding_function=self.embeddings_model,
+                    persist_directory=self.persist_directory
+                )
+        return self.vector_db
+
+    def _persist(self) -> None:
+        # Chroma writes through on every upsert; the numpy store persists on demand
+        if isinstance(self.vector_db, NumpyVectorStore):
+            self.vector_db.persist()
+
+    def add_documents(
+        self,
+        chunks: list,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+    ) -> List[DocumentRecord]:
+        """
+        Append the chunks of new documents to the collection.
+
+        Chunks are grouped into documents by their ``source`` metadata. Documents
+        whose content is already indexed are skipped, and a document whose
+        source is indexed with different content replaces the old version.
+
+        Args:
+            chunks (list): The document chunks to add.
+            on_progress (Optional[Callable[[int, int], None]]): Called with
+                (chunks done, total chunks) as embedding batches are upserted.
+
+        Returns:
+            List[DocumentRecord]: The documents that were added.
+        """
+        vector_db = self.load_vector_db()
+        documents = {}
+        for chunk in chunks:
+            documents.setdefault(chunk.metadata.get("source", ""), []).append(chunk)
+
+        to_ingest, records, seen = [], [], set()
+        for source, doc_chunks in documents.items():
+            content_hash = doc_chunks[0].metadata.get("content_hash") or hashlib.sha256(
+                "".join(chunk.page_content for chunk in doc_chunks).encode("utf-8")
+            ).hexdigest()
+            if content_hash in seen:
+                logger.info(f"Skipping {source}, already indexed")
+                continue
+            seen.add(content_hash)
+            doc_id = self._prepare_document(source, content_hash)
+            if doc_id is None:
+                continue
+            chunk_ids = [f"{doc_id}-{i}" for i in range(len(doc_chunks))]
+            for chunk, chunk_id in zip(doc_chunks, chunk_ids):
+                chunk.id = chunk_id
+                chunk.metadata.update(
+                    doc_id=doc_id, content_hash=content_hash, chunk_id=chunk_id
+                )
+            to_ingest.extend(doc_chunks)
+            records.append(DocumentRecord(doc_id, source, content_hash, chunk_ids))
+
+        sums: Dict[str, np.ndarray] = {}
+        if to_ingest:
+            with self._indexing():
+                self.ingestion.run(
+                    vector_db,
+                    to_ingest,
+                    on_progress=on_progress,
+                    on_batch=lambda batch, vectors: self._sum_embeddings(sums, batch, vectors),
+                )
+            self.bm25.add(
+                [chunk.id for chunk in to_ingest], [chunk.page_content for chunk in to_ingest]
+            )
+            self._persist()
+        # Register only once the chunks are stored, so a failed ingestion is retried
+        for record in records:
+            if record.doc_id in sums:
+                self.document_index.add(record.doc_id, sums[record.doc_id])
+            self.registry.add(record)
+            self._remove_previous_versions(record)
+        if records:
+            self.semantic_cache.invalidate(self.collection_name)
+        logger.info(f"Added {len(records)} documents ({len(to_ingest)} chunks)")
+        return records
+
+    @staticmethod
+    def _sum_embeddings(sums: Dict[str, np.ndarray], batch: list, vectors: list) -> None:
+        """Add the normalized embeddings of a batch of chunks to the sums of their documents."""
+        for chunk, vector in zip(batch, unit_rows(vectors)):
+            doc_id = chunk.metadata["doc_id"]
+            sums[doc_id] = sums[doc_id] + vector if doc_id in sums else vector
+
+    @contextmanager
+    def _indexing(self):
+        with self._ingesting_lock:
+            self._ingesting += 1
+        try:
+            yield
+        finally:
+            with self._ingesting_lock:
+                self._ingesting -= 1
+
+    @property
+    def is_ingesting(self) -> bool:
+        """Whether documents are being added, in which case answers are not cached."""
+        return self._ingesting > 0
+
+    def _prepare_document(self, source: str, content_hash: str) -> Optional[str]:
+        """
+        Check whether a document needs indexing.
+
+        Returns:
+            Optional[str]: The id to index the document under, or None if its
+            content is already indexed.
+        """
+        if self.registry.find_by_hash(content_hash) is not None:
+            logger.info(f"Skipping {source}, already indexed")
+            return None
+        return content_hash[:16]
+
+    def _remove_previous_versions(self, record: DocumentRecord) -> None:
+        """
+        Delete the other documents indexed from the same source as ``record``.
+
+        Called once the new version is registered, so a failed or cancelled
+        ingestion leaves the previous version in place.
+        """
+        for previous in self.registry.list():
+            if previous.source == record.source and previous.doc_id != record.doc_id:
+                logger.info(f"Replacing previous version of {record.source}")
+                self.delete_document(previous.doc_id)
+
+    def add_document_stream(
+        self,
+        source: str,
+        content_hash: str,
+        chunks: Iterable,
+        on_progress: Optional[Callable[[int, Optional[int]], None]] = None,
+        source_file: Optional[BinaryIO] = None,
+        lock: Optional[ContextManager] = None,
+    ) -> Optional[DocumentRecord]:
+        """
+        Append a single document to the collection from a lazy stream of chunks.
+
+        Chunks are embedded and upserted in batches while the rest of the
+        document is still being parsed, so memory stays bounded by the batch
+        size rather than the document size. Embedding runs outside ``lock``,
+        so several documents of a collection can be ingested at once.
+
+        Args:
+            source (str): The name of the document.
+            content_hash (str): Hash of the raw file, used to skip unchanged documents.
+            chunks (Iterable): The document chunks, typically a generator.
+            on_progress (Optional[Callable[[int, Optional[int]], None]]): Called with
+                (chunks done, None) as embedding batches are upserted.
+            source_file (Optional[BinaryIO]): The raw file. PDFs are kept with the
+                collection, so their pages can be previewed.
+            lock (Optional[ContextManager]): Held around every write to the
+                collection, e.g. a lock shared with deletions.
+
+        Returns:
+            Optional[DocumentRecord]: The document added, None if already indexed.
+        """
+        lock = lock if lock is not None else nullcontext()
+        vector_db = self.load_vector_db()
+
+        @contextmanager
+        def writing():
+            with lock:
+                # The collection may have been deleted while a batch was embedded
+                if self.vector_db is not vector_db:
+                    raise RuntimeError(f"Collection {self.collection_name} was closed")
+                yield
+
+        with writing():
+            doc_id = self._prepare_document(source, content_hash)
+            if doc_id is not None and source_file is not None:
+                self._save_source(source, content_hash, source_file)
+        if doc_id is None:
+            return None
+        chunk_ids = []
+        sums: Dict[str, np.ndarray] = {}
+
+        def with_ids():
+            for i, chunk in enumerate(chunks):
+                chunk.id = f"{doc_id}-{i}"
+                chunk.metadata.update(
+                    source=source, doc_id=doc_id, content_hash=content_hash, chunk_id=chunk.id
+                )
+                chunk_ids.append(chunk.id)
+                yield chunk
+
+        def on_batch(batch: list, vectors: list) -> None:
+            self.bm25.add(
+                [chunk.id for chunk in batch], [chunk.page_content for chunk in batch], save=False
+            )
+            self._sum_embeddings(sums, batch, vectors)
+
+        with self._indexing():
+            try:
+                self.ingestion.run(
+                    vector_db,
+                    with_ids(),
+                    on_progress=on_progress,
+                    on_batch=on_batch,
+                    writing=writing,
+                )
+            except BaseException:
+                # Chunks already searchable must not outlive a failed or cancelled document
+                with lock:
+                    if chunk_ids and self.vector_db is vector_db:
+                        vector_db.delete(ids=chunk_ids)
+                        self.bm25.remove(chunk_ids)
+                        self._persist()
+                self._remove_source(content_hash)
+                raise
+        with writing():
+            self.bm25.save()
+            self._persist()
+            if doc_id in sums:
+                self.document_index.add(doc_id, sums[doc_id])
+            record = DocumentRecord(doc_id, source, content_hash, chunk_ids)
+            self.registry.add(record)
+            self._remove_previous_versions(record)
+        self.semantic_cache.invalidate(self.collection_name)
+        logger.info(f"Added document {source} ({len(chunk_ids)} chunks)")
+        return record
+
+    def delete_document(self, doc_id: str) -> None:
+        """
+        Remove a single document and its chunks from the collection.
 
-        # RAG prompt template
-        template = """Answer the question based ONLY on the following context:
-        {context}
-        Question: {question}
+        Args:
+            doc_id (str): The id of the document to remove.
         """
+        record = self.registry.get(doc_id)
+        if record is None:
+            logger.warning(f"Attempted to delete document {doc_id}, but none was found")
+            return
+        self.load_vector_db().delete(ids=record.chunk_ids)
+        self.bm25.remove(record.chunk_ids)
+        self._persist()
+        self.registry.remove(doc_id)
+        self.document_index.remove(doc_id)
+        self._remove_source(record.content_hash)
+        self.semantic_cache.invalidate(self.collection_name)
+        logger.info(f"Deleted document {record.source} ({len(record.chunk_ids)} chunks)")
+
+    def source_path(self, content_hash: Optional[str]) -> Optional[str]:
+        """Return the kept PDF of a document, None if there is none."""
+        if not content_hash:
+            return None
+        path = os.path.join(self.sources_directory, f"{content_hash}.pdf")
+        return path if os.path.exists(path) else None
+
+    def _save_source(self, source: str, content_hash: str, source_file: BinaryIO) -> None:
+        if not source.lower().endswith(".pdf"):
+            return
+        os.makedirs(self.sources_directory, exist_ok=True)
+        source_file.seek(0)
+        with open(os.path.join(self.sources_directory, f"{content_hash}.pdf"), "wb") as f:
+            shutil.copyfileobj(source_file, f, 1 << 20)
+
+    def _remove_source(self, content_hash: str) -> None:
+        path = self.source_path(content_hash)
+        if path is not None:
+            os.remove(path)
+
+    def list_documents(self) -> List[DocumentRecord]:
+        """Return the documents indexed in the collection."""
+        return self.registry.list()
+
+    def _index_documents(self, vector_db: Chroma) -> None:
+        """Embed the documents indexed before the document index existed."""
+        for record in self.registry.list():
+            if record.doc_id in self.document_index or not record.chunk_ids:
+                continue
+            stored = vector_db.get(ids=record.chunk_ids, include=["embeddings"])
+            if len(stored["ids"]):
+                self.document_index.add(record.doc_id, unit_rows(stored["embeddings"]).sum(axis=0))
+                logger.info(f"Added {record.source} to the document index")
 
-        prompt = ChatPromptTemplate.from_template(template)
+    def _build_chain(self, vector_db: Chroma):
+        self._index_documents(vector_db)
+        self.retriever = FanOutRetriever(
+            vector_db=vector_db,
+            llm=self.llm,
+            prompt=QUERY_PROMPT,
+            lexical_index=self.bm25,
+            document_index=self.document_index,
+            **RETRIEVAL_CONFIG,
+        )
 
-        # Create chain
+        # Create chain; its input is {"question": ..., "filter": ...}
         chain = (
-            {"context": self.retriever, "question": RunnablePassthrough()}
-            | prompt
+            {
+                "context": RunnableLambda(self.retrieve) | RunnableLambda(self.pack_context),
+                "question": itemgetter("question"),
+            }
+            | RAG_PROMPT
             | self.llm
             | StrOutputParser()
         )
+        return chain
+
+    def retrieve(self, inputs: dict) -> list:
+        """Retrieve the chunks of a question, within the chunks matching its metadata filter."""
+        return self.retriever.invoke(
+            inputs["question"], filter=inputs.get("filter"), two_stage=not self.is_ingesting
+        )
+
+    def pack_context(self, docs: list) -> str:
+        """
+        Dedupe, order and trim retrieved chunks into the prompt context.
+
+        Args:
+            docs (list): The retrieved chunks, most relevant first.
+
+        Returns:
+            str: The context, within the token budget of the model.
+        """
+        with span("prompt_build", chunks=len(docs)):
+            context = pack_context(docs, self.generation_settings["context_tokens"])
+        # The cited pages are likely to be previewed next
+        page_renderer.prefetch(
+            (path, doc.metadata["content_hash"], doc.metadata["page"])
+            for doc in docs
+            if "page" in doc.metadata
+            and (path := self.source_path(doc.metadata.get("content_hash")))
+        )
+        logger.info(f"Packed {len(docs)} retrieved chunks into {len(context)} characters of context")
+        return context
+
+    def get_chain(self, vector_db: Chroma):
+        """
+        Return the compiled RAG chain for a vector database, building it only once.
+
+        Args:
+            vector_db (Chroma): The vector database containing document embeddings.
+        """
+        if self._chain is None or self._chain_db is not vector_db:
+            self._chain = self._build_chain(vector_db)
+            self._chain_db = vector_db
+            logger.info("RAG chain compiled")
+        return self._chain
+
+    def cached_answer(self, question: str) -> Optional[str]:
+        """
+        Return the cached answer of a similar question asked against the same collection.
+
+        Args:
+            question (str): The user's question.
+
+        Returns:
+            Optional[str]: The cached answer, or None if no similar question was answered.
+        """
+        if self.is_ingesting:
+            # A cached answer would ignore the chunks indexed since
+            return None
+        vector = self.embeddings_model.embed_query(question)
+        entry = self.semantic_cache.lookup(self.collection_name, self.registry.version, vector)
+        return entry.answer if entry is not None else None
+
+    def _remember(self, question: str, answer: str) -> None:
+        if self.is_ingesting:
+            # Answered from a partial index, and invalidated once ingestion completes
+            return
+        vector = self.embeddings_model.embed_query(question)
+        self.semantic_cache.add(
+            self.collection_name, self.registry.version, question, vector, answer
+        )
 
-        response = chain.invoke(question)
+    def run(
+        self,
+        question: str,
+        vector_db: Chroma,
+        client: str = "default",
+        filter: Optional[dict] = None,
+        check_cache: bool = True,
+    ) -> str:
+        # Answers are cached per collection, not per filter
+        cached = self.cached_answer(question) if check_cache and filter is None else None
+        if cached is not None:
+            return cached
+        logger.info(f"Processing question: {question} using model: {self.llm}")
+        chain = self.get_chain(vector_db)
+        with scheduler.generation_slot(client), span("generation"):
+            response = chain.invoke({"question": question, "filter": filter})
+        if filter is None:
+            self._remember(question, response)
         logger.info("Question processed and response generated")
         return response
-    
+
+    def stream(
+        self,
+        question: str,
+        vector_db: Chroma,
+        client: str = "default",
+        filter: Optional[dict] = None,
+        check_cache: bool = True,
+    ) -> Iterator[str]:
+        """
+        Answer a question, yielding the response token by token.
+
+        Time-to-first-token is stored in ``self.last_ttft`` (seconds). A cached
+        answer of a similar question is yielded in one piece, unless the search
+        is filtered. Generations are capped across all Rag instances and queued
+        fairly per client.
+
+        Args:
+            question (str): The user's question.
+            vector_db (Chroma): The vector database containing document embeddings.
+            client (str): Who is asking, e.g. a session id, for fair queueing.
+            filter (Optional[dict]): Metadata filter of the chunks searched, see
+                ``retrieval.metadata_filter``.
+            check_cache (bool): Look up a cached answer first; False when the
+                caller already did so with ``cached_answer``.
+
+        Yields:
+            str: The next chunk of the generated response.
+        """
+        start = time.perf_counter()
+        self.last_ttft = None
+        cached = self.cached_answer(question) if check_cache and filter is None else None
+        if cached is not None:
+            self.last_ttft = time.perf_counter() - start
+            yield cached
+            return
+        logger.info(f"Streaming question: {question} using model: {self.llm}")
+        chain = self.get_chain(vector_db)
+        tokens = []
+        with scheduler.generation_slot(client):
+            for token in chain.stream({"question": question, "filter": filter}):
+                if self.last_ttft is None:
+                    self.last_ttft = time.perf_counter() - start
+                    metrics.record("first_token", self.last_ttft)
+                    logger.info(f"Time to first token: {self.last_ttft:.2f}s")
+                tokens.append(token)
+                yield token
+        elapsed = time.perf_counter() - start
+        metrics.record("generation", elapsed, tokens=len(tokens))
+        if filter is None:
+            self._remember(question, "".join(tokens))
+        logger.info(f"Question processed and response streamed in {elapsed:.2f}s")
+
+    def close(self) -> None:
+        """
+        Release the vector store client and retrieval threads of the collection.
+
+        The collection stays on disk and is reopened by ``load_vector_db``.
+        """
+        if isinstance(self.vector_db, Chroma):
+            self.vector_db._client.close()
+        if self._chain is not None:
+            self.retriever._executor.shutdown(wait=False)
+        self.vector_db = None
+        self._chain = None
+        self._chain_db = None
+
     def delete_vector_db(self) -> None:
         """
         Delete the vector database and clear related session state.
@@ -103,6 +648,14 @@ class Rag:
         logger.info("Deleting vector DB")
         if self.vector_db is not None:
             self.vector_db.delete_collection()
+            self.registry.clear()
+            self.bm25.clear()
+            self.document_index.clear()
+            shutil.rmtree(self.sources_directory, ignore_errors=True)
+            self.semantic_cache.invalidate(self.collection_name)
+            self.vector_db = None
+            self._chain = None
+            self._chain_db = None
             st.session_state.pop("pdf_pages", None)
             st.session_state.pop("file_upload", None)
             st.session_state.pop("vector_db", None)
@@ -0,0 +1,122 @@
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+
+from utils.logging_utils import logger
+
+
+@dataclass
+class DocumentRecord:
+    """A document indexed in a collection and the ids of its chunks."""
+
+    doc_id: str
+    source: str
+    content_hash: str
+    chunk_ids: List[str] = field(default_factory=list)
+    added_at: float = field(default_factory=time.time)
+
+
+class DocumentRegistry:
+    """Keeps track of which documents are indexed in a collection, persisted as JSON."""
+
+    def __init__(self, path: str):
+        """
+        Load the registry from disk, or start an empty one.
+
+        Args:
+            path (str): Path of the JSON file backing the registry.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._records: Dict[str, DocumentRecord] = {}
+        self._mtime = None
+        self._refresh()
+
+    def _refresh(self) -> None:
+        """
+        Reload the registry if another instance changed the file on disk.
+
+        Callers hold ``_lock``, so readers never see a half-replaced set of records.
+        """
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._mtime:
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            self._records = {
+                doc_id: DocumentRecord(**record)
+                for doc_id, record in json.load(f).items()
+            }
+        self._mtime = mtime
+        logger.info(f"Loaded {len(self._records)} documents from registry {self.path}")
+
+    def _save(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({doc_id: asdict(r) for doc_id, r in self._records.items()}, f)
+        # Atomic replace so a crash never leaves a half-written registry
+        os.replace(tmp_path, self.path)
+        self._mtime = os.stat(self.path).st_mtime_ns
+
+    @property
+    def version(self) -> Optional[int]:
+        """Changes whenever the set of indexed documents changes."""
+        with self._lock:
+            self._refresh()
+            return self._mtime
+
+    def get(self, doc_id: str) -> Optional[DocumentRecord]:
+        """Return the record of a document, if indexed."""
+        with self._lock:
+            self._refresh()
+            return self._records.get(doc_id)
+
+    def find_by_hash(self, content_hash: str) -> Optional[DocumentRecord]:
+        """Return the record of the document with this content hash, if indexed."""
+        with self._lock:
+            self._refresh()
+            for record in self._records.values():
+                if record.content_hash == content_hash:
+                    return record
+        return None
+
+    def list(self) -> List[DocumentRecord]:
+        """Return all indexed documents, oldest first."""
+        with self._lock:
+            self._refresh()
+            records = list(self._records.values())
+        return sorted(records, key=lambda r: r.added_at)
+
+    def add(self, record: DocumentRecord) -> None:
+        """Register a document and persist the registry."""
+        with self._lock:
+            self._refresh()
+            self._records[record.doc_id] = record
+            self._save()
+
+    def remove(self, doc_id: str) -> Optional[DocumentRecord]:
+        """Unregister a document and persist the registry."""
+        with self._lock:
+            self._refresh()
+            record = self._records.pop(doc_id, None)
+            self._save()
+        return record
+
+    def clear(self) -> None:
+        """Unregister every document."""
+        with self._lock:
+            self._records = {}
+            self._save()
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._records)
@@ -0,0 +1,328 @@
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, wait
+from typing import Any, Dict, List, Optional, Set
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.language_models import BaseLanguageModel
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import BasePromptTemplate
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.vectorstores import VectorStore
+from pydantic import PrivateAttr
+from rag_manger.bm25 import BM25Index
+from rag_manger.document_index import DocumentIndex
+from utils.logging_utils import logger
+from utils.metrics import span
+
+
+def chunk_key(doc: Document) -> str:
+    """Return a stable identifier for a chunk, used to dedupe search results."""
+    if doc.id:
+        return doc.id
+    if doc.metadata.get("chunk_id"):
+        return doc.metadata["chunk_id"]
+    return hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest()
+
+
+def reciprocal_rank_fusion(
+    rankings: List[List[Document]], k: int = 60, top_n: int = None
+) -> List[Document]:
+    """
+    Merge several ranked lists of chunks with reciprocal rank fusion.
+
+    Every chunk scores ``sum(1 / (k + rank))`` over the lists it appears in, so
+    chunks found by several searches rise to the top and duplicates collapse.
+
+    Args:
+        rankings (List[List[Document]]): Ranked search results, best first.
+        k (int): Damping constant of the fusion formula.
+        top_n (int): Number of chunks to return, all of them if None.
+
+    Returns:
+        List[Document]: The deduplicated chunks, best first.
+    """
+    scores: Dict[str, float] = {}
+    docs: Dict[str, Document] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking):
+            key = chunk_key(doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank + 1)
+            docs.setdefault(key, doc)
+    ordered = sorted(scores, key=scores.get, reverse=True)
+    return [docs[key] for key in ordered[:top_n]]
+
+
+def maximal_marginal_relevance(
+    query: np.ndarray, candidates: np.ndarray, k: int, lambda_mult: float = 0.5
+) -> List[int]:
+    """
+    Greedily select chunks that are relevant to the query but not to each other.
+
+    Every step picks the candidate maximizing
+    ``lambda_mult * sim(query, c) - (1 - lambda_mult) * max(sim(c, selected))``.
+    All similarities come from two matrix products computed up front, and each
+    step is a vectorized update, so hundreds of candidates take about a millisecond.
+
+    Args:
+        query (np.ndarray): The query embedding, shape (dim,).
+        candidates (np.ndarray): The candidate embeddings, shape (n, dim).
+        k (int): Number of candidates to select.
+        lambda_mult (float): 1 ranks by relevance only, 0 by diversity only.
+
+    Returns:
+        List[int]: Indices of the selected candidates, in selection order.
+    """
+    candidates = np.asarray(candidates, dtype=np.float32)
+    if len(candidates) == 0 or k <= 0:
+        return []
+    norms = np.linalg.norm(candidates, axis=1, keepdims=True)
+    candidates = candidates / np.where(norms == 0, 1.0, norms)
+    query = np.asarray(query, dtype=np.float32)
+    query = query / (np.linalg.norm(query) or 1.0)
+
+    relevance = candidates @ query
+    similarity = candidates @ candidates.T
+    selected = [int(np.argmax(relevance))]
+    # Highest similarity of every candidate to any selected one
+    redundancy = similarity[selected[0]].copy()
+    available = np.ones(len(candidates), dtype=bool)
+    available[selected[0]] = False
+    for _ in range(min(k, len(candidates)) - 1):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(redundancy, similarity[best], out=redundancy)
+    return selected
+
+
+def metadata_filter(
+    sources: Optional[List[str]] = None,
+    first_page: Optional[int] = None,
+    last_page: Optional[int] = None,
+) -> Optional[dict]:
+    """
+    Build the Chroma ``where`` filter restricting a search to some files and pages.
+
+    Args:
+        sources (Optional[List[str]]): File names to search, all files if empty.
+        first_page (Optional[int]): First page to search, from 1.
+        last_page (Optional[int]): Last page to search, included.
+
+    Returns:
+        Optional[dict]: The filter, None if nothing is restricted. Chunks
+        without page numbers (DOCX and TXT files) do not match a page range.
+    """
+    clauses = []
+    if sources:
+        clauses.append({"source": {"$in": list(sources)}})
+    # Page metadata counts from 0
+    if first_page is not None:
+        clauses.append({"page": {"$gte": first_page - 1}})
+    if last_page is not None:
+        clauses.append({"page": {"$lte": last_page - 1}})
+    return combine_filters(*clauses)
+
+
+def combine_filters(*filters: Optional[dict]) -> Optional[dict]:
+    """Combine metadata filters with ``$and``, which Chroma requires to have two clauses or more."""
+    filters = [f for f in filters if f]
+    if not filters:
+        return None
+    return filters[0] if len(filters) == 1 else {"$and": filters}
+
+
+def documents_by_ids(vector_db: VectorStore, ids: List[str]) -> List[Document]:
+    """Fetch chunks from a vector store by id, keeping the order of ``ids``."""
+    if not ids:
+        return []
+    result = vector_db.get(ids=ids)
+    found = {
+        chunk_id: Document(id=chunk_id, page_content=text, metadata=metadata or {})
+        for chunk_id, text, metadata in zip(
+            result["ids"], result["documents"], result["metadatas"]
+        )
+    }
+    return [found[chunk_id] for chunk_id in ids if chunk_id in found]
+
+
+class FanOutRetriever(BaseRetriever):
+    """
+    Multi-query retriever that overlaps query expansion with retrieval.
+
+    The original question is searched immediately, in parallel with the LLM call
+    that generates alternative questions. The alternatives are then searched
+    concurrently and all results are merged with reciprocal rank fusion. If the
+    expansion does not finish within ``expansion_timeout`` seconds, only the
+    original question's results are used.
+
+    With ``hybrid`` enabled and a lexical index given, every search also queries
+    the BM25 index and fuses its ranking with the vector ranking.
+
+    With ``mmr`` enabled, ``fetch_k`` candidates are retrieved instead of ``k``
+    and re-ranked with maximal marginal relevance over their stored embeddings,
+    so near-duplicate chunks do not fill the context.
+
+    Retrieval is hierarchical once the collection holds more than
+    ``max_documents`` documents: the question is first compared with one
+    embedding per document from ``document_index``, and only the chunks of the
+    ``max_documents`` closest documents are searched. The restriction, like
+    any metadata filter passed to ``invoke``, is applied inside the vector
+    store query rather than to its results.
+    """
+
+    vector_db: VectorStore
+    llm: BaseLanguageModel
+    prompt: BasePromptTemplate
+    k: int = 4
+    expand_queries: bool = True
+    expansion_timeout: float = 3.0
+    rrf_k: int = 60
+    max_workers: int = 4
+    hybrid: bool = True
+    lexical_index: Optional[BM25Index] = None
+    mmr: bool = True
+    mmr_lambda: float = 0.7
+    fetch_k: int = 20
+    document_index: Optional[DocumentIndex] = None
+    max_documents: int = 5
+
+    _executor: ThreadPoolExecutor = PrivateAttr(default=None)
+
+    def model_post_init(self, __context: Any) -> None:
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+
+    @property
+    def candidates(self) -> int:
+        """Number of chunks every search returns, before re-ranking."""
+        return max(self.fetch_k, self.k) if self.mmr else self.k
+
+    def select_documents(self, query: str) -> Optional[List[str]]:
+        """First stage: the ids of the documents closest to the question, None to search all."""
+        if (
+            self.document_index is None
+            or not self.max_documents
+            or len(self.document_index) <= self.max_documents
+        ):
+            return None
+        with span("select_documents", documents=len(self.document_index)):
+            hits = self.document_index.search(
+                self.vector_db.embeddings.embed_query(query), self.max_documents
+            )
+        logger.info(f"Searching the chunks of documents {[doc_id for doc_id, _ in hits]}")
+        return [doc_id for doc_id, _ in hits] or None
+
+    def search(
+        self, query: str, filter: Optional[dict] = None, allowed: Optional[Set[str]] = None
+    ) -> List[Document]:
+        """
+        Run a single search, vector-only or hybrid.
+
+        Args:
+            query (str): The query text.
+            filter (Optional[dict]): Metadata filter of the chunks searched.
+            allowed (Optional[Set[str]]): Ids of the chunks matching ``filter``,
+                which the lexical search is restricted to.
+        """
+        with span("vector_search"):
+            dense = self.vector_db.similarity_search(query, k=self.candidates, filter=filter)
+        if not self.hybrid or self.lexical_index is None:
+            return dense
+        with span("lexical_search"):
+            hits = self.lexical_index.search(query, k=self.candidates, ids=allowed)
+            lexical = documents_by_ids(self.vector_db, [chunk_id for chunk_id, _ in hits])
+        return reciprocal_rank_fusion([dense, lexical], k=self.rrf_k, top_n=self.candidates)
+
+    def rerank(self, query: str, docs: List[Document]) -> List[Document]:
+        """Select ``k`` of the candidate chunks with maximal marginal relevance."""
+        if len(docs) <= self.k:
+            return docs
+        with span("mmr", candidates=len(docs)):
+            stored = self.vector_db.get(
+                ids=[chunk_key(doc) for doc in docs],
+                include=["embeddings", "documents", "metadatas"],
+            )
+            vectors = dict(zip(stored["ids"], stored["embeddings"]))
+            if len(vectors) < len(docs):
+                # Chunks indexed without ids cannot be matched to their embeddings
+                return docs[: self.k]
+            order = maximal_marginal_relevance(
+                np.asarray(self.vector_db.embeddings.embed_query(query)),
+                np.stack([vectors[chunk_key(doc)] for doc in docs]),
+                self.k,
+                self.mmr_lambda,
+            )
+        return [docs[i] for i in order]
+
+    def generate_queries(self, question: str) -> List[str]:
+        """Ask the LLM for alternative versions of the question."""
+        with span("query_expansion"):
+            output = (self.prompt | self.llm | StrOutputParser()).invoke({"question": question})
+        return [line.strip() for line in output.split("\n") if line.strip()]
+
+    def _get_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: CallbackManagerForRetrieverRun,
+        filter: Optional[dict] = None,
+        two_stage: bool = True,
+    ) -> List[Document]:
+        """
+        Retrieve the chunks of a question.
+
+        Args:
+            query (str): The question.
+            filter (Optional[dict]): Metadata filter of the chunks searched, see
+                ``metadata_filter``. Documents are not pre-selected when given,
+                since the closest documents may all be filtered out.
+            two_stage (bool): Pre-select documents. Pass False while documents
+                are being ingested, as they join the document index only once complete.
+        """
+        with span("retrieve"):
+            if filter is None and two_stage:
+                doc_ids = self.select_documents(query)
+                if doc_ids is not None:
+                    filter = {"doc_id": {"$in": doc_ids}}
+            docs = self._retrieve(query, filter)
+            return self.rerank(query, docs) if self.mmr else docs
+
+    def _retrieve(self, query: str, filter: Optional[dict] = None) -> List[Document]:
+        start = time.perf_counter()
+        allowed = None
+        if filter and self.hybrid and self.lexical_index is not None:
+            allowed = set(self.vector_db.get(where=filter, include=[])["ids"])
+        original = self._executor.submit(self.search, query, filter, allowed)
+        if not self.expand_queries:
+            return original.result()
+
+        expansion = self._executor.submit(self.generate_queries, query)
+        try:
+            variants = expansion.result(timeout=self.expansion_timeout)
+        except TimeoutError:
+            logger.warning(
+                f"Query expansion exceeded {self.expansion_timeout}s, "
+                "using original query results only"
+            )
+            return original.result()
+        except Exception as e:
+            logger.error(f"Query expansion failed, using original query results only: {e}")
+            return original.result()
+        logger.info(f"Generated queries: {variants}")
+
+        searches = [original] + [
+            self._executor.submit(self.search, v, filter, allowed) for v in variants
+        ]
+        # Variant searches share whatever is left of the latency budget
+        remaining = max(self.expansion_timeout - (time.perf_counter() - start), 0.0)
+        done, not_done = wait(searches[1:], timeout=remaining)
+        if not_done:
+            logger.warning(f"Dropping {len(not_done)} variant searches over budget")
+        rankings = [original.result()] + [
+            f.result() for f in searches[1:] if f in done and f.exception() is None
+        ]
+        return reciprocal_rank_fusion(rankings, k=self.rrf_k, top_n=self.candidates)
@@ -0,0 +1,237 @@
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List
+
+from langchain_core.embeddings import Embeddings
+from config import SCHEDULER_CONFIG
+from utils.logging_utils import logger
+from utils.metrics import metrics
+
+
+@dataclass
+class _EmbeddingRequest:
+    texts: List[str]
+    future: Future = field(default_factory=Future)
+    submitted_at: float = field(default_factory=time.perf_counter)
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces embedding requests from concurrent callers into larger batches.
+
+    Requests are queued and a dispatcher thread merges those arriving within
+    ``max_wait`` seconds, or while all ``max_in_flight`` slots are busy, into a
+    single call of the underlying model.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        batch_size: int = 64,
+        max_wait: float = 0.01,
+        max_in_flight: int = 2,
+    ):
+        """
+        Initialize the batcher.
+
+        Args:
+            embeddings (Embeddings): The underlying embeddings model.
+            batch_size (int): Number of texts above which no more requests are merged.
+            max_wait (float): Seconds to wait for more requests before dispatching a batch.
+            max_in_flight (int): Maximum number of calls to the model at the same time.
+        """
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self._queue: "queue.Queue[_EmbeddingRequest]" = queue.Queue()
+        self._slots = threading.Semaphore(max_in_flight)
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight)
+        threading.Thread(target=self._dispatch, daemon=True).start()
+
+    def submit(self, texts: List[str]) -> Future:
+        """Queue texts for embedding; the future resolves to their vectors."""
+        request = _EmbeddingRequest(list(texts))
+        self._queue.put(request)
+        return request.future
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def _dispatch(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            # Requests keep accumulating while every slot is busy
+            self._slots.acquire()
+            size = len(batch[0].texts)
+            deadline = time.perf_counter() + self.max_wait
+            while size < self.batch_size:
+                try:
+                    request = self._queue.get(timeout=max(deadline - time.perf_counter(), 0))
+                except queue.Empty:
+                    break
+                batch.append(request)
+                size += len(request.texts)
+            self._executor.submit(self._embed, batch)
+
+    def _embed(self, batch: List[_EmbeddingRequest]) -> None:
+        try:
+            started = time.perf_counter()
+            for request in batch:
+                metrics.record("embed_queue_wait", started - request.submitted_at)
+            texts = [text for request in batch for text in request.texts]
+            with metrics.span("embed_call", texts=len(texts), requests=len(batch)):
+                vectors = self.embeddings.embed_documents(texts)
+            offset = 0
+            for request in batch:
+                request.future.set_result(vectors[offset : offset + len(request.texts)])
+                offset += len(request.texts)
+        except Exception as e:
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_exception(e)
+        finally:
+            self._slots.release()
+
+
+class BatchedEmbeddings(Embeddings):
+    """Embeddings model whose calls go through an EmbeddingBatcher."""
+
+    def __init__(self, batcher: EmbeddingBatcher):
+        self.batcher = batcher
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return self.batcher.submit(texts).result()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+class FairLimiter:
+    """
+    Caps the number of concurrent generations, serving waiting clients round-robin.
+
+    A client with many queued requests cannot starve the others: once a slot
+    frees up it goes to the next client in turn, not to the oldest request.
+    """
+
+    def __init__(self, max_concurrent: int):
+        """
+        Initialize the limiter.
+
+        Args:
+            max_concurrent (int): Maximum number of generations running at once.
+        """
+        self.max_concurrent = max_concurrent
+        self.active = 0
+        self._condition = threading.Condition()
+        # client -> its waiting tickets, in turn order
+        self._waiting: "OrderedDict[str, deque]" = OrderedDict()
+
+    @property
+    def queue_depth(self) -> int:
+        with self._condition:
+            return sum(len(tickets) for tickets in self._waiting.values())
+
+    def _is_next(self, ticket: object) -> bool:
+        tickets = next(iter(self._waiting.values()))
+        return tickets[0] is ticket
+
+    @contextmanager
+    def slot(self, client: str = "default") -> Iterator[None]:
+        """
+        Hold a generation slot for the duration of the block.
+
+        Args:
+            client (str): Identifies who is asking, e.g. a session id, for fairness.
+        """
+        ticket = object()
+        queued_at = time.perf_counter()
+        with self._condition:
+            self._waiting.setdefault(client, deque()).append(ticket)
+            while not (self.active < self.max_concurrent and self._is_next(ticket)):
+                self._condition.wait()
+            tickets = self._waiting[client]
+            tickets.popleft()
+            if tickets:
+                # The client's next request waits for everyone else's turn
+                self._waiting.move_to_end(client)
+            else:
+                del self._waiting[client]
+            self.active += 1
+            # Another slot may be free for the next client in turn
+            self._condition.notify_all()
+        wait = time.perf_counter() - queued_at
+        metrics.record("generation_queue_wait", wait, client=client)
+        if wait > 1:
+            logger.info(f"Generation for {client} waited {wait:.2f}s for a slot")
+        try:
+            yield
+        finally:
+            with self._condition:
+                self.active -= 1
+                self._condition.notify_all()
+
+
+class Scheduler:
+    """Shares embedding batchers and the generation limiter across every Rag instance."""
+
+    def __init__(
+        self,
+        embed_batch_size: int,
+        embed_max_wait: float,
+        embed_max_in_flight: int,
+        max_concurrent_generations: int,
+    ):
+        self.embed_batch_size = embed_batch_size
+        self.embed_max_wait = embed_max_wait
+        self.embed_max_in_flight = embed_max_in_flight
+        self.generations = FairLimiter(max_concurrent_generations)
+        self._batchers: Dict[str, EmbeddingBatcher] = {}
+        self._lock = threading.Lock()
+        metrics.gauge(
+            "embedding_queue_depth",
+            "Embedding requests waiting to be batched.",
+            lambda: sum(b.queue_depth for b in list(self._batchers.values())),
+        )
+        metrics.gauge(
+            "generation_queue_depth",
+            "Generations waiting for a slot.",
+            lambda: self.generations.queue_depth,
+        )
+        metrics.gauge(
+            "generations_active", "Generations running.", lambda: self.generations.active
+        )
+
+    def batched_embeddings(self, model_name: str, embeddings: Embeddings) -> BatchedEmbeddings:
+        """
+        Return an embeddings model whose calls are batched with every other caller of the model.
+
+        Args:
+            model_name (str): Name of the embedding model; callers of the same
+                model share one batcher.
+            embeddings (Embeddings): The underlying model, used for the first caller.
+        """
+        with self._lock:
+            if model_name not in self._batchers:
+                self._batchers[model_name] = EmbeddingBatcher(
+                    embeddings,
+                    batch_size=self.embed_batch_size,
+                    max_wait=self.embed_max_wait,
+                    max_in_flight=self.embed_max_in_flight,
+                )
+            return BatchedEmbeddings(self._batchers[model_name])
+
+    def generation_slot(self, client: str = "default"):
+        """Wait for, then hold, one of the generation slots. See ``FairLimiter.slot``."""
+        return self.generations.slot(client)
+
+
+scheduler = Scheduler(**SCHEDULER_CONFIG)
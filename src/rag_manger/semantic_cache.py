@@ -0,0 +1,112 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, List, Optional
+
+import numpy as np
+from utils.logging_utils import logger
+
+
+@dataclass
+class CachedAnswer:
+    """A previously answered question of a collection."""
+
+    collection: str
+    version: Any
+    question: str
+    answer: str
+    vector: np.ndarray
+
+
+class SemanticCache:
+    """Bounded LRU cache of answers, looked up by question embedding similarity."""
+
+    def __init__(self, similarity_threshold: float = 0.92, max_entries: int = 1024):
+        """
+        Initialize the semantic cache.
+
+        Args:
+            similarity_threshold (float): Minimum cosine similarity between two
+                questions for the cached answer to be reused.
+            max_entries (int): Maximum number of answers kept before LRU eviction.
+        """
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[int, CachedAnswer]" = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, collection: str, version: Any, vector: List[float]) -> Optional[CachedAnswer]:
+        """
+        Find the cached answer of the most similar question of a collection.
+
+        Args:
+            collection (str): Name of the collection the question is asked against.
+            version (Any): Current version of the collection; entries cached for
+                another version are stale and ignored.
+            vector (List[float]): Embedding of the question.
+
+        Returns:
+            Optional[CachedAnswer]: The cached answer, or None below the threshold.
+        """
+        query = self._normalize(vector)
+        with self._lock:
+            candidates = [
+                (entry_id, entry)
+                for entry_id, entry in self._entries.items()
+                if entry.collection == collection and entry.version == version
+            ]
+            if candidates:
+                matrix = np.stack([entry.vector for _, entry in candidates])
+                similarities = matrix @ query
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.similarity_threshold:
+                    entry_id, entry = candidates[best]
+                    self._entries.move_to_end(entry_id)
+                    self.hits += 1
+                    logger.info(
+                        f"Semantic cache hit ({similarities[best]:.3f}) "
+                        f"with question: {entry.question}"
+                    )
+                    return entry
+            self.misses += 1
+        return None
+
+    def add(
+        self, collection: str, version: Any, question: str, vector: List[float], answer: str
+    ) -> None:
+        """Cache the answer of a question, evicting the least recently used entry if full."""
+        entry = CachedAnswer(collection, version, question, answer, self._normalize(vector))
+        with self._lock:
+            self._entries[self._next_id] = entry
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, collection: str) -> None:
+        """Drop every cached answer of a collection."""
+        with self._lock:
+            stale = [i for i, entry in self._entries.items() if entry.collection == collection]
+            for entry_id in stale:
+                del self._entries[entry_id]
+        if stale:
+            logger.info(f"Invalidated {len(stale)} cached answers of {collection}")
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and the current number of cached answers."""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+        }
@@ -19,6 +19,8 @@ class SessionStateManager:
             st.session_state["use_sample"] = False
         if "pdf_pages" not in st.session_state:
             st.session_state["pdf_pages"] = None
+        if "ingested_uploads" not in st.session_state:
+            st.session_state["ingested_uploads"] = set()
 
     def get(self, key: str, default: Any = None) -> Any:
         """Get a value from session state."""
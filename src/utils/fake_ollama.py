@@ -0,0 +1,254 @@
+"""
+Local stand-in for the Ollama HTTP API, for benchmarks and evaluation runs.
+
+Embeddings are deterministic feature-hashed bag-of-words vectors, so texts
+sharing words are close in cosine space and results are reproducible across
+runs. Chat and generate return a canned answer, streamed token by token when
+requested, with configurable latencies.
+
+Usage:
+    with FakeOllamaServer(chat_first_token_latency=0.2) as server:
+        os.environ["OLLAMA_HOST"] = server.url
+        ...
+"""
+
+import hashlib
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+import numpy as np
+
+WORD_PATTERN = re.compile(r"\w+")
+
+DEFAULT_ANSWER = (
+    "Based on the provided context, the document describes the requested "
+    "information in the relevant section."
+)
+
+
+def fake_embedding(text: str, dim: int = 768) -> List[float]:
+    """
+    Embed a text deterministically by hashing its words into ``dim`` buckets.
+
+    Args:
+        text (str): The text to embed.
+        dim (int): Dimension of the vector.
+
+    Returns:
+        List[float]: The L2-normalized embedding.
+    """
+    vector = np.zeros(dim, dtype=np.float32)
+    for word in WORD_PATTERN.findall(text.lower()):
+        digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+        bucket = int.from_bytes(digest[:4], "little") % dim
+        vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+    norm = np.linalg.norm(vector)
+    if norm == 0:
+        vector[0] = 1.0
+        norm = 1.0
+    return (vector / norm).tolist()
+
+
+class FakeOllamaServer:
+    """Threaded HTTP server answering the Ollama endpoints used by this project."""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        dim: int = 768,
+        models: Optional[List[str]] = None,
+        answer: str = DEFAULT_ANSWER,
+        embed_latency: float = 0.0,
+        embed_latency_per_text: float = 0.0,
+        chat_first_token_latency: float = 0.0,
+        chat_token_latency: float = 0.0,
+    ):
+        """
+        Configure the server; it starts listening on ``start`` or on entering a ``with`` block.
+
+        Args:
+            host (str): Interface to bind.
+            port (int): Port to bind, 0 for any free port.
+            dim (int): Dimension of the embeddings.
+            models (Optional[List[str]]): Model names reported by ``/api/tags``.
+            answer (str): Canned response of the chat and generate endpoints.
+            embed_latency (float): Seconds added to every embedding request.
+            embed_latency_per_text (float): Seconds added per text embedded.
+            chat_first_token_latency (float): Seconds before the first generated token.
+            chat_token_latency (float): Seconds between generated tokens.
+        """
+        self.dim = dim
+        self.models = models or ["llama3.2:latest", "nomic-embed-text:latest"]
+        self.answer = answer
+        self.embed_latency = embed_latency
+        self.embed_latency_per_text = embed_latency_per_text
+        self.chat_first_token_latency = chat_first_token_latency
+        self.chat_token_latency = chat_token_latency
+        self.requests = {}
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeOllamaServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "FakeOllamaServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _count(self, path: str) -> None:
+        with self._lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+
+    def _tokens(self) -> List[str]:
+        # Keep the whitespace with each token so the chunks join back to the answer
+        return re.findall(r"\S+\s*", self.answer)
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately; without this, Nagle's
+            # algorithm and delayed ACKs add ~40 ms to every response
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, payload: dict, status: int = 200) -> None:
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _read_json(self) -> dict:
+                length = int(self.headers.get("Content-Length") or 0)
+                return json.loads(self.rfile.read(length) or b"{}")
+
+            def do_HEAD(self):
+                self.send_response(200)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def do_GET(self):
+                server._count(self.path)
+                if self.path in ("/", ""):
+                    body = b"Ollama is running"
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                elif self.path == "/api/tags":
+                    self._send_json(
+                        {
+                            "models": [
+                                {"name": name, "model": name, "size": 0, "digest": ""}
+                                for name in server.models
+                            ]
+                        }
+                    )
+                elif self.path == "/api/ps":
+                    self._send_json({"models": []})
+                else:
+                    self._send_json({"error": f"unknown path {self.path}"}, 404)
+
+            def do_POST(self):
+                server._count(self.path)
+                request = self._read_json()
+                if self.path == "/api/embed":
+                    texts = request.get("input", "")
+                    texts = [texts] if isinstance(texts, str) else list(texts)
+                    time.sleep(server.embed_latency + server.embed_latency_per_text * len(texts))
+                    self._send_json(
+                        {
+                            "model": request.get("model", ""),
+                            "embeddings": [fake_embedding(t, server.dim) for t in texts],
+                        }
+                    )
+                elif self.path == "/api/embeddings":
+                    time.sleep(server.embed_latency + server.embed_latency_per_text)
+                    self._send_json(
+                        {"embedding": fake_embedding(request.get("prompt", ""), server.dim)}
+                    )
+                elif self.path in ("/api/chat", "/api/generate"):
+                    self._generate(request, chat=self.path == "/api/chat")
+                elif self.path in ("/api/pull", "/api/show"):
+                    self._send_json({"status": "success"})
+                else:
+                    self._send_json({"error": f"unknown path {self.path}"}, 404)
+
+            def _generate(self, request: dict, chat: bool) -> None:
+                model = request.get("model", "")
+                tokens = server._tokens()
+                started = time.perf_counter()
+
+                def message(content: str, done: bool) -> dict:
+                    payload = {
+                        "model": model,
+                        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                        "done": done,
+                    }
+                    if chat:
+                        payload["message"] = {"role": "assistant", "content": content}
+                    else:
+                        payload["response"] = content
+                    if done:
+                        elapsed = int((time.perf_counter() - started) * 1e9)
+                        payload.update(
+                            done_reason="stop",
+                            total_duration=elapsed,
+                            eval_count=len(tokens),
+                            eval_duration=elapsed,
+                            prompt_eval_count=0,
+                        )
+                    return payload
+
+                time.sleep(server.chat_first_token_latency)
+                if not request.get("stream", True):
+                    time.sleep(server.chat_token_latency * max(len(tokens) - 1, 0))
+                    self._send_json(message(server.answer, True))
+                    return
+
+                # Newline-delimited JSON, one message per token, sent chunked
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+
+                def write(payload: dict) -> None:
+                    line = json.dumps(payload).encode("utf-8") + b"\n"
+                    self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+                    self.wfile.flush()
+
+                for i, token in enumerate(tokens):
+                    if i:
+                        time.sleep(server.chat_token_latency)
+                    write(message(token, False))
+                write(message("", True))
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+
+        return Handler
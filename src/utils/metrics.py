@@ -0,0 +1,222 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+from config import METRICS_CONFIG
+from utils.logging_utils import logger
+
+
+class Histogram:
+    """Cumulative histogram of durations with fixed bucket bounds, as in Prometheus."""
+
+    def __init__(self, buckets: List[float], window: int):
+        self.buckets = sorted(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        # Recent raw values, for exact percentiles in the diagnostics panel
+        self.recent = deque(maxlen=window)
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        self.recent.append(value)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+    def summary(self) -> dict:
+        recent = np.array(self.recent) * 1000 if self.recent else np.zeros(1)
+        return {
+            "count": self.count,
+            "total_s": round(self.sum, 3),
+            "mean_ms": round(self.sum / self.count * 1000, 2) if self.count else 0.0,
+            "p50_ms": round(float(np.percentile(recent, 50)), 2),
+            "p95_ms": round(float(np.percentile(recent, 95)), 2),
+            "max_ms": round(float(recent.max()), 2),
+        }
+
+
+class MetricsRegistry:
+    """Records timed spans of pipeline stages and aggregates them per stage."""
+
+    def __init__(
+        self,
+        buckets: List[float],
+        window: int = 1024,
+        jsonl_path: Optional[str] = None,
+    ):
+        """
+        Initialize the registry.
+
+        Args:
+            buckets (List[float]): Upper bounds, in seconds, of the histogram buckets.
+            window (int): Number of recent spans kept, per stage and overall.
+            jsonl_path (Optional[str]): File every span is appended to as a JSON
+                line, none if None.
+        """
+        self.bucket_bounds = buckets
+        self.window = window
+        self.jsonl_path = jsonl_path
+        self.histograms: Dict[str, Histogram] = {}
+        # name -> (help text, function returning the current value)
+        self._gauges: Dict[str, tuple] = {}
+        self.spans = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        if jsonl_path and os.path.dirname(jsonl_path):
+            os.makedirs(os.path.dirname(jsonl_path), exist_ok=True)
+
+    def record(self, stage: str, seconds: float, **attributes) -> None:
+        """
+        Record the duration of one occurrence of a stage.
+
+        Args:
+            stage (str): Name of the stage, e.g. ``embed_batch``.
+            seconds (float): How long it took.
+            **attributes: Extra fields kept with the span, e.g. the batch size.
+        """
+        span = {"stage": stage, "seconds": seconds, "ts": time.time(), **attributes}
+        captured = getattr(self._local, "captured", None)
+        if captured is not None:
+            captured.append(span)
+            return
+        with self._lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram(self.bucket_bounds, self.window)
+            histogram.observe(seconds)
+            self.spans.append(span)
+            if self.jsonl_path:
+                with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(span) + "\n")
+
+    @contextmanager
+    def span(self, stage: str, **attributes) -> Iterator[dict]:
+        """
+        Time the enclosed block as one occurrence of a stage.
+
+        The yielded dict can be updated with attributes known only inside the block.
+        """
+        start = time.perf_counter()
+        try:
+            yield attributes
+        finally:
+            self.record(stage, time.perf_counter() - start, **attributes)
+
+    @contextmanager
+    def capture(self) -> Iterator[List[dict]]:
+        """
+        Collect the spans recorded by this thread inside the block instead of recording them.
+
+        Used in worker processes, whose spans are sent back to the parent and
+        recorded there.
+        """
+        self._local.captured = captured = []
+        try:
+            yield captured
+        finally:
+            self._local.captured = None
+
+    def gauge(self, name: str, help: str, read: Callable[[], float]) -> None:
+        """
+        Register a value sampled whenever metrics are read, such as a queue depth.
+
+        Args:
+            name (str): Metric name, without the ``askyourdoc_`` prefix.
+            help (str): Description of the metric.
+            read (Callable[[], float]): Returns the current value.
+        """
+        with self._lock:
+            self._gauges[name] = (help, read)
+
+    def gauges(self) -> Dict[str, float]:
+        """Return the current value of every registered gauge."""
+        with self._lock:
+            gauges = dict(self._gauges)
+        return {name: read() for name, (_, read) in sorted(gauges.items())}
+
+    def summary(self) -> Dict[str, dict]:
+        """Return count, total, mean and recent percentiles of every stage."""
+        with self._lock:
+            return {stage: h.summary() for stage, h in sorted(self.histograms.items())}
+
+    def export_jsonl(self) -> str:
+        """Return the recent spans as JSON lines."""
+        with self._lock:
+            return "".join(json.dumps(span) + "\n" for span in self.spans)
+
+    def prometheus_text(self) -> str:
+        """Render the stage histograms in the Prometheus text exposition format."""
+        name = "askyourdoc_stage_duration_seconds"
+        lines = [
+            f"# HELP {name} Duration of RAG pipeline stages.",
+            f"# TYPE {name} histogram",
+        ]
+        with self._lock:
+            for stage, histogram in sorted(self.histograms.items()):
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {count}')
+                lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {histogram.sum}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {histogram.count}')
+            gauges = dict(self._gauges)
+        for gauge, (help, read) in sorted(gauges.items()):
+            lines.append(f"# HELP askyourdoc_{gauge} {help}")
+            lines.append(f"# TYPE askyourdoc_{gauge} gauge")
+            lines.append(f"askyourdoc_{gauge} {read()}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        """Forget every recorded span."""
+        with self._lock:
+            self.histograms = {}
+            self.spans.clear()
+
+    def serve(self, host: str, port: int) -> ThreadingHTTPServer:
+        """
+        Serve ``prometheus_text`` at ``/metrics`` from a background thread.
+
+        Args:
+            host (str): Interface to bind.
+            port (int): Port to bind.
+
+        Returns:
+            ThreadingHTTPServer: The running server.
+        """
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        logger.info(f"Serving Prometheus metrics on http://{host}:{port}/metrics")
+        return server
+
+
+metrics = MetricsRegistry(
+    buckets=METRICS_CONFIG["buckets"],
+    window=METRICS_CONFIG["window"],
+    jsonl_path=METRICS_CONFIG["jsonl_path"],
+)
+span = metrics.span
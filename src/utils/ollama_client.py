@@ -0,0 +1,148 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+import ollama
+from config import OLLAMA_CONFIG
+from utils.logging_utils import logger
+from utils.metrics import span
+
+_client: Optional[ollama.Client] = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> ollama.Client:
+    """
+    Return the Ollama client shared by the whole process.
+
+    Its HTTP connections are pooled and kept alive, so model listing,
+    embeddings and chat requests reuse open connections instead of paying a
+    TCP handshake per request.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = ollama.Client(
+                host=OLLAMA_CONFIG["host"],
+                timeout=OLLAMA_CONFIG["timeout"],
+                limits=httpx.Limits(
+                    max_connections=OLLAMA_CONFIG["max_connections"],
+                    max_keepalive_connections=OLLAMA_CONFIG["max_keepalive_connections"],
+                    keepalive_expiry=OLLAMA_CONFIG["keepalive_expiry"],
+                ),
+            )
+        return _client
+
+
+def share_client(model):
+    """
+    Make a LangChain Ollama chat or embeddings model use the shared client.
+
+    Args:
+        model: A ``ChatOllama`` or ``OllamaEmbeddings`` instance.
+
+    Returns:
+        The same model, for chaining.
+    """
+    model._client = get_client()
+    return model
+
+
+class ModelCatalog:
+    """Names of the models installed in Ollama, cached for a few seconds."""
+
+    def __init__(self, ttl: float):
+        """
+        Initialize the catalog.
+
+        Args:
+            ttl (float): Seconds a fetched list of models stays fresh.
+        """
+        self.ttl = ttl
+        self._models: Optional[List[str]] = None
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+
+    def models(self, refresh: bool = False) -> List[str]:
+        """
+        Return the installed models, fetching them only when the cache is stale.
+
+        Args:
+            refresh (bool): Fetch the list even if the cached one is fresh.
+
+        Returns:
+            List[str]: Model names, e.g. ``llama3.2:latest``.
+        """
+        with self._lock:
+            fresh = time.monotonic() - self._fetched_at < self.ttl
+            if self._models is not None and fresh and not refresh:
+                return self._models
+            try:
+                response = get_client().list()
+            except Exception as e:
+                if self._models is None:
+                    raise
+                # Keep serving the last known list while Ollama is unreachable
+                logger.warning(f"Could not refresh the model list, using the cached one: {e}")
+                return self._models
+            self._models = [model.model for model in response.models]
+            self._fetched_at = time.monotonic()
+            return self._models
+
+
+catalog = ModelCatalog(OLLAMA_CONFIG["catalog_ttl"])
+
+_warm_up_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="warm-up")
+# (model, embedding) -> (time warmed up, future)
+_warmed: Dict[Tuple[str, bool], Tuple[float, Future]] = {}
+_warmed_lock = threading.Lock()
+
+
+def _load(model: str, embedding: bool, keep_alive) -> None:
+    with span("warm_up", model=model):
+        if embedding:
+            get_client().embed(model=model, input="warm-up", keep_alive=keep_alive)
+        else:
+            # An empty prompt loads the model without generating anything
+            get_client().generate(model=model, prompt="", keep_alive=keep_alive)
+    logger.info(f"Model {model} loaded (keep_alive={keep_alive})")
+
+
+def _log_failure(future: Future) -> None:
+    if future.exception() is not None:
+        logger.warning(f"Model warm-up failed: {future.exception()}")
+
+
+def warm_up(model: str, embedding: bool = False, keep_alive=None) -> Future:
+    """
+    Preload a model in the background, so the first real request does not pay for loading it.
+
+    A model is loaded again only once its keep-alive may have expired, so
+    calling this on every Streamlit rerun is cheap.
+
+    Args:
+        model (str): Name of the model.
+        embedding (bool): Whether it is an embedding model rather than a chat model.
+        keep_alive: Seconds (or an Ollama duration string) to keep the model
+            loaded, ``OLLAMA_CONFIG["keep_alive"]`` if None.
+
+    Returns:
+        Future: Completes once the model is loaded.
+    """
+    keep_alive = OLLAMA_CONFIG["keep_alive"] if keep_alive is None else keep_alive
+    key = (model, embedding)
+    with _warmed_lock:
+        previous = _warmed.get(key)
+        if previous is not None:
+            warmed_at, future = previous
+            expired = isinstance(keep_alive, (int, float)) and (
+                time.monotonic() - warmed_at > keep_alive
+            )
+            if not expired and not (future.done() and future.exception() is not None):
+                return future
+        future = _warm_up_executor.submit(_load, model, embedding, keep_alive)
+        future.add_done_callback(_log_failure)
+        _warmed[key] = (time.monotonic(), future)
+        return future
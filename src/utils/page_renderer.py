@@ -0,0 +1,176 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Iterable, List, Optional, Tuple
+
+import pypdfium2 as pdfium
+from config import RENDER_CONFIG
+from utils.logging_utils import logger
+from utils.metrics import span
+
+# PDFium is not thread-safe: every call into it holds this lock
+_pdfium_lock = threading.Lock()
+
+
+class PageRenderer:
+    """
+    Renders PDF pages to PNG only when they are shown, caching them on disk.
+
+    Renders are keyed by (file hash, page, width), so the same page at the
+    same zoom is rasterized once across sessions and restarts. The cache is an
+    LRU bounded in bytes, with the modification time of a file as its last use.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        max_bytes: int,
+        width_step: int = 50,
+        default_width: int = 700,
+        max_width: int = 2000,
+        max_workers: int = 2,
+    ):
+        """
+        Initialize the renderer.
+
+        Args:
+            cache_dir (str): Directory of the rendered pages.
+            max_bytes (int): Size of the cache above which the least recently
+                used pages are deleted.
+            width_step (int): Requested widths are rounded to a multiple of this,
+                so a zoom slider does not fill the cache with near duplicates.
+            default_width (int): Width, in pixels, cited pages are pre-rendered at.
+            max_width (int): Largest width rendered, in pixels.
+            max_workers (int): Threads pre-rendering pages in the background.
+        """
+        os.makedirs(cache_dir, exist_ok=True)
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.width_step = width_step
+        self.default_width = default_width
+        self.max_width = max_width
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="render")
+        # file name -> size, least recently used first
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        files = [
+            entry for entry in os.scandir(cache_dir) if entry.name.endswith(".png")
+        ]
+        for entry in sorted(files, key=lambda entry: entry.stat().st_mtime):
+            self._entries[entry.name] = entry.stat().st_size
+        self._size = sum(self._entries.values())
+
+    def _width(self, width: Optional[int]) -> int:
+        width = min(width or self.default_width, self.max_width)
+        return max(self.width_step, round(width / self.width_step) * self.width_step)
+
+    @staticmethod
+    def page_count(pdf_path: str) -> int:
+        """Return the number of pages of a PDF."""
+        with _pdfium_lock:
+            pdf = pdfium.PdfDocument(pdf_path)
+            try:
+                return len(pdf)
+            finally:
+                pdf.close()
+
+    def render(
+        self, pdf_path: str, file_hash: str, page: int, width: Optional[int] = None
+    ) -> Optional[str]:
+        """
+        Return the path of a PNG of one page, rendering it only if it is not cached.
+
+        Args:
+            pdf_path (str): The PDF file.
+            file_hash (str): Hash of the file's content, the cache key.
+            page (int): Index of the page, from 0.
+            width (Optional[int]): Width of the image in pixels, the default if None.
+
+        Returns:
+            Optional[str]: Path of the PNG, None if the page does not exist or
+            cannot be rendered.
+        """
+        width = self._width(width)
+        name = f"{file_hash[:32]}-{page}-{width}.png"
+        path = os.path.join(self.cache_dir, name)
+        with self._lock:
+            cached = name in self._entries and os.path.exists(path)
+            if cached:
+                self.hits += 1
+                self._entries.move_to_end(name)
+        if cached:
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            return path
+
+        try:
+            with span("render_page", page=page, width=width), _pdfium_lock:
+                pdf = pdfium.PdfDocument(pdf_path)
+                try:
+                    if not 0 <= page < len(pdf):
+                        return None
+                    pdf_page = pdf[page]
+                    image = pdf_page.render(scale=width / pdf_page.get_width()).to_pil()
+                finally:
+                    pdf.close()
+        except Exception as e:
+            logger.warning(f"Could not render page {page} of {pdf_path}: {e}")
+            return None
+        # Written under a temporary name, so readers never see a partial file
+        temporary = f"{path}.{threading.get_ident()}.tmp"
+        image.save(temporary, format="PNG")
+        os.replace(temporary, path)
+        with self._lock:
+            self.misses += 1
+            self._size += os.path.getsize(path) - self._entries.pop(name, 0)
+            self._entries[name] = os.path.getsize(path)
+            self._evict()
+        return path
+
+    def _evict(self) -> None:
+        while self._size > self.max_bytes and len(self._entries) > 1:
+            name, size = self._entries.popitem(last=False)
+            self._size -= size
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
+
+    def prefetch(
+        self, pages: Iterable[Tuple[str, str, int]], width: Optional[int] = None
+    ) -> List[Future]:
+        """
+        Render pages in the background, so they show instantly once asked for.
+
+        Args:
+            pages (Iterable[Tuple[str, str, int]]): (pdf path, file hash, page) triples.
+            width (Optional[int]): Width of the images, the default if None.
+
+        Returns:
+            List[Future]: One future per distinct page, resolving to its PNG path.
+        """
+        return [
+            self._executor.submit(self.render, pdf_path, file_hash, page, width)
+            for pdf_path, file_hash, page in dict.fromkeys(pages)
+        ]
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and the current size of the cache."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "pages": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+            }
+
+
+page_renderer = PageRenderer(**RENDER_CONFIG)
@@ -1,23 +1,115 @@
+import hashlib
+import io
 import os
-import subprocess
+import shutil
 import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import BinaryIO, Iterator, Optional, Union
 import streamlit as st
-from langchain_community.document_loaders import PyPDFLoader
+from langchain_core.documents import Document
+from pypdf import PdfReader
 from utils.logging_utils import logger
+from utils.metrics import metrics, span
+from utils.ollama_client import catalog
 from langchain_community.document_loaders import UnstructuredWordDocumentLoader
+from config import PARSING_CONFIG
+from rag_manger.chunking import TokenChunker
+
+
+def iter_pdf_pages(file: BinaryIO, source: str) -> Iterator[Document]:
+    """
+    Lazily yield the pages of a PDF as documents, parsing each page on demand.
+
+    Args:
+        file: A seekable binary file object, e.g. a Streamlit upload.
+        source: The name recorded as the ``source`` metadata of every page.
+
+    Yields:
+        One document per page, with the same metadata as ``PyPDFLoader``.
+    """
+    file.seek(0)
+    return _read_pdf_pages(PdfReader(file), source, 0, None)
+
+
+def _read_pdf_pages(
+    reader: PdfReader, source: str, start: int, stop: Optional[int]
+) -> Iterator[Document]:
+    stop = len(reader.pages) if stop is None else min(stop, len(reader.pages))
+    for page_number in range(start, stop):
+        with span("parse", source=source, page=page_number):
+            text = reader.pages[page_number].extract_text()
+        yield Document(page_content=text, metadata={"source": source, "page": page_number})
+
+
+def iter_docx_elements(file: BinaryIO, source: str) -> Iterator[Document]:
+    """
+    Yield the content of a DOCX file as documents.
+
+    The Word loader needs a path, so the file is spilled to a temporary
+    directory that is removed as soon as loading finishes.
+
+    Args:
+        file: A seekable binary file object, e.g. a Streamlit upload.
+        source: The name recorded as the ``source`` metadata.
+    """
+    file.seek(0)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, os.path.basename(source))
+        with open(path, "wb") as f:
+            shutil.copyfileobj(file, f)
+        with span("parse", source=source):
+            data = UnstructuredWordDocumentLoader(path).load()
+    for doc in data:
+        doc.metadata["source"] = source
+        yield doc
+
+
+def iter_text(file: BinaryIO, source: str) -> Iterator[Document]:
+    """Yield a plain text file as a single document."""
+    file.seek(0)
+    with span("parse", source=source):
+        text = file.read().decode("utf-8", errors="replace")
+    yield Document(page_content=text, metadata={"source": source})
+
+
+def iter_pages(file_name: str, file: BinaryIO) -> Iterator[Document]:
+    """
+    Lazily yield the pages of a PDF, DOCX or TXT file.
+
+    Args:
+        file_name: The name of the file, used to pick the parser.
+        file: A seekable binary file object.
+    """
+    if file_name.endswith(".pdf"):
+        return iter_pdf_pages(file, file_name)
+    if file_name.endswith(".docx"):
+        return iter_docx_elements(file, file_name)
+    if file_name.endswith(".txt"):
+        return iter_text(file, file_name)
+    raise ValueError(f"Unsupported file type: {file_name}")
+
+
+def iter_chunks(file_name: str, file: BinaryIO, embeddings_model: str) -> Iterator[Document]:
+    """
+    Lazily split a file into chunks, one page at a time.
+
+    Only the page being split is held in memory, so chunks can flow on into
+    embedding while later pages are still unparsed.
+
+    Args:
+        file_name: The name of the file, used to pick the parser.
+        file: A seekable binary file object.
+        embeddings_model: The embedding model the chunks are sized for.
+    """
+    chunker = TokenChunker(embeddings_model)
+    for page in iter_pages(file_name, file):
+        yield from chunker.split_documents([page])
 
 
 def read_uploaded_docx(file_upload) -> str:
     logger.info(f"Processing file: {file_upload.name}")
-    # Save file temporarily
-    temp_dir = tempfile.mkdtemp()
-    path = os.path.join(temp_dir, file_upload.name)
-    with open(path, "wb") as f:
-        f.write(file_upload.getvalue())
-        logger.info(f"File saved to temporary path: {path}")
-        loader = UnstructuredWordDocumentLoader(path)
-        data = loader.load()
-        logger.info(f"Loaded {len(data)} documents from {file_upload.name}")
+    data = list(iter_docx_elements(file_upload, file_upload.name))
+    logger.info(f"Loaded {len(data)} documents from {file_upload.name}")
     return data
 
 def read_uploaded_pdf(file_upload) -> str:
@@ -30,15 +122,7 @@ def read_uploaded_pdf(file_upload) -> str:
     Returns:
         The content of the PDF file.
     """
-    temp_dir = tempfile.mkdtemp()
-
-    path = os.path.join(temp_dir, file_upload.name)
-    with open(path, "wb") as f:
-        f.write(file_upload.getvalue())
-        logger.info(f"File saved to temporary path: {path}")
-        loader = PyPDFLoader(path)
-        data = loader.load()
-    return data
+    return list(iter_pdf_pages(file_upload, file_upload.name))
 
 def read_sample_pdf(sample_path:str) -> str:
     """
@@ -52,23 +136,176 @@ def read_sample_pdf(sample_path:str) -> str:
     """
     if os.path.exists(sample_path):
         with open(sample_path, "rb") as f:
-            loader = PyPDFLoader(f)
-            data = loader.load()
-            return data
+            return list(iter_pdf_pages(f, sample_path))
     else:
         st.error("Sample PDF file not found in the current directory.")
 
+def content_hash(content: Union[bytes, BinaryIO]) -> str:
+    """
+    Hash the raw bytes of a file.
+
+    Args:
+        content: The raw bytes of the file, or a seekable binary file object
+            that is hashed in blocks without copying it into memory.
+
+    Returns:
+        The hex SHA-256 digest of the content.
+    """
+    if isinstance(content, bytes):
+        return hashlib.sha256(content).hexdigest()
+    digest = hashlib.sha256()
+    content.seek(0)
+    for block in iter(lambda: content.read(1 << 20), b""):
+        digest.update(block)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+def spill_to_file(file: BinaryIO) -> str:
+    """
+    Copy an upload to a temporary file, in blocks rather than as one bytes object.
+
+    Background jobs read the file from there, so a queued upload does not
+    hold its content in memory. The caller owns the file and removes it.
+
+    Args:
+        file: A seekable binary file object, e.g. a Streamlit upload.
+
+    Returns:
+        The path of the temporary file.
+    """
+    file.seek(0)
+    with tempfile.NamedTemporaryFile(prefix="upload-", delete=False) as f:
+        shutil.copyfileobj(file, f, 1 << 20)
+    file.seek(0)
+    return f.name
+
+
+def parse_file(
+    file_name: str, path: str, embeddings_model: str, first_page: int = 0, pages: int = 8
+) -> tuple:
+    """
+    Parse a range of pages of a file on disk and split them into chunks, in a worker process.
+
+    A PDF is parsed a few pages per call, so its chunks reach the parent in
+    bounded batches; other file types are parsed whole by the first call.
+
+    Args:
+        file_name: The name of the uploaded file, used to pick the loader.
+        path: Where the file was spilled, see ``spill_to_file``.
+        embeddings_model: The embedding model the chunks are sized for.
+        first_page: The first page to parse.
+        pages: The number of pages to parse.
+
+    Returns:
+        A tuple of (the chunks of those pages, the spans recorded while
+        parsing, the page count of the file or None if it has no pages).
+    """
+    chunker = TokenChunker(embeddings_model)
+    with metrics.capture() as spans, open(path, "rb") as f:
+        if file_name.endswith(".pdf"):
+            reader = PdfReader(f)
+            pages_total = len(reader.pages)
+            documents = _read_pdf_pages(reader, file_name, first_page, first_page + pages)
+        else:
+            pages_total = None
+            documents = iter_pages(file_name, f)
+        chunks = [chunk for document in documents for chunk in chunker.split_documents([document])]
+    return chunks, spans, pages_total
+
+
+def parse_and_split(file_name: str, content: bytes, embeddings_model: str) -> list:
+    """
+    Parse a single file and split it into chunks.
+
+    Runs inside a worker process, so it only takes and returns picklable values.
+
+    Args:
+        file_name: The name of the uploaded file, used to pick the loader.
+        content: The raw bytes of the file.
+        embeddings_model: The embedding model the chunks are sized for.
+
+    Returns:
+        The document chunks of the file.
+    """
+    chunks = list(iter_chunks(file_name, io.BytesIO(content), embeddings_model))
+    digest = content_hash(content)
+    for chunk in chunks:
+        chunk.metadata["content_hash"] = digest
+    return chunks
+
+
+def _parse_and_split_traced(file_name: str, content: bytes, embeddings_model: str) -> tuple:
+    """Run ``parse_and_split`` in a worker process, returning its spans alongside the chunks."""
+    with metrics.capture() as spans:
+        chunks = parse_and_split(file_name, content, embeddings_model)
+    return chunks, spans
+
+
+def read_uploaded_files(file_uploads, embeddings_model: str) -> tuple:
+    """
+    Parse and split several uploaded files in parallel across processes.
+
+    A file that fails to parse does not affect the others.
+
+    Args:
+        file_uploads: The Streamlit file upload objects.
+        embeddings_model: The embedding model the chunks are sized for.
+
+    Returns:
+        A tuple of (chunks of all files merged, {file name: error message}).
+    """
+    files = []
+    for file_upload in file_uploads:
+        with span("upload_read", source=file_upload.name) as attributes:
+            files.append((file_upload.name, file_upload.getvalue()))
+            attributes["bytes"] = len(files[-1][1])
+    chunks, errors = [], {}
+    if len(files) == 1:
+        # Not worth paying for process start-up with a single file
+        try:
+            chunks = parse_and_split(*files[0], embeddings_model)
+        except Exception as e:
+            logger.error(f"Failed to process {files[0][0]}: {e}")
+            errors[files[0][0]] = str(e)
+        return chunks, errors
+
+    max_workers = PARSING_CONFIG["max_workers"] or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=min(len(files), max_workers)) as executor:
+        futures = {
+            executor.submit(_parse_and_split_traced, name, content, embeddings_model): name
+            for name, content in files
+        }
+        results = {}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                results[name], spans = future.result()
+                for recorded in spans:
+                    metrics.record(**recorded)
+                logger.info(f"Split {name} into {len(results[name])} chunks")
+            except Exception as e:
+                logger.error(f"Failed to process {name}: {e}")
+                errors[name] = str(e)
+    # Merge in upload order so chunk order does not depend on scheduling
+    for name, _ in files:
+        chunks.extend(results.get(name, []))
+    logger.info(f"Total chunks created: {len(chunks)} from {len(results)} files")
+    return chunks, errors
+
+
 def get_ollama_models():
     """
     Get a list of Ollama models.
 
+    The list comes from the Ollama API and is cached for
+    ``OLLAMA_CONFIG["catalog_ttl"]`` seconds, so reruns do not query it again.
+
     Returns:
         A list of Ollama models.
     """
     try:
-        result = subprocess.run(["ollama", "list"], capture_output=True, text=True)
-        models = [line.split()[0] for line in result.stdout.split("\n") if line]
-        return models
+        return catalog.models()
     except Exception as e:
         st.error(f"Error fetching models: {e}")
         return []
\ No newline at end of file
@@ -5,29 +5,31 @@ This application allows users to upload a PDF, process it,
 and then ask questions about the content using a selected language model.
 """
 
-from dataclasses import asdict
 import streamlit as st
 import logging
 import os
-import tempfile
-import shutil
-import pdfplumber
-import ollama
+import uuid
 
 from langchain_community.document_loaders import UnstructuredPDFLoader
 from langchain_ollama import OllamaEmbeddings
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import Chroma
 from langchain.prompts import ChatPromptTemplate, PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_ollama.chat_models import ChatOllama
 from langchain_core.runnables import RunnablePassthrough
 from langchain.retrievers.multi_query import MultiQueryRetriever
-from typing import List, Tuple, Dict, Any, Optional
-from langchain_community.document_loaders import PyPDFLoader, UnstructuredWordDocumentLoader
+from typing import Optional
 from streamlit.runtime.uploaded_file_manager import UploadedFile
 
 import chromadb.api
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "src"))
+from rag_manger.ingestion import IngestionPipeline
+from utils.utils import content_hash, read_uploaded_files
+from utils.page_renderer import page_renderer
+from utils.ollama_client import catalog
+from rag_manger.chunking import TokenChunker
 
 # chroma_client = chromadb.Client()
 # collection = chroma_client.create_collection(name="myRAG")
@@ -73,60 +75,49 @@ def read_files_and_split(file_uploads: list[UploadedFile]) -> list:
         list: A list of document chunks.
     """
     logger.info("Reading files and splitting into chunks")
-    temp_dir = tempfile.mkdtemp()
-    all_chunks = []
-
-    try:
-        for file_upload in file_uploads:
-            logger.info(f"Processing file: {file_upload.name}")
-            # Save file temporarily
-            path = os.path.join(temp_dir, file_upload.name)
-            with open(path, "wb") as f:
-                f.write(file_upload.getvalue())
-                logger.info(f"File saved to temporary path: {path}")
-                
-                if path.endswith(".pdf"):
-                    # Load the PDF
-                    loader = PyPDFLoader(path)
-                elif path.endswith(".docx"):
-                    loader = UnstructuredWordDocumentLoader(path)
-                data = loader.load()
-                logger.info(f"Loaded {len(data)} documents from {file_upload.name}")
-
-                # Split the text into chunks
-                text_splitter = RecursiveCharacterTextSplitter(chunk_size=7500, chunk_overlap=100)
-                chunks = text_splitter.split_documents(data)
-                all_chunks.extend(chunks)  # Accumulate chunks
-
-        logger.info(f"Total chunks created: {len(all_chunks)}")
-        return all_chunks
-
-    finally:
-        # Clean up temporary files
-        shutil.rmtree(temp_dir)
-        logger.info(f"Temporary directory {temp_dir} removed")
-
-
-def create_vector_store(chunks: list, collection_name: str = "myRAG", persist_directory: str = "./app") -> Chroma:
+    all_chunks, errors = read_uploaded_files(file_uploads, "nomic-embed-text")
+    for file_name, error in errors.items():
+        st.error(f"Could not process {file_name}: {error}")
+    return all_chunks
+
+
+def session_collection() -> str:
+    """Return the collection of this session, so sessions never share or delete each other's."""
+    if "collection_name" not in st.session_state:
+        st.session_state["collection_name"] = f"session-{uuid.uuid4().hex[:12]}"
+    return st.session_state["collection_name"]
+
+
+def create_vector_store(chunks: list, collection_name: Optional[str] = None, persist_directory: str = "./app") -> Chroma:
     """
     Create a vector store from document chunks.
 
     Args:
         chunks (list): List of document chunks.
-        collection_name (str): Name of the vector store collection.
+        collection_name (Optional[str]): Name of the vector store collection,
+            the session's own if None.
         persist_directory (str): Path to save the vector store.
 
     Returns:
         Chroma: A vector store containing the processed document chunks.
     """
     logger.info("Creating vector store")
+    collection_name = collection_name or session_collection()
     embeddings = OllamaEmbeddings(model="nomic-embed-text")
-    vector_db = Chroma.from_documents(
-        documents=chunks,
-        embedding=embeddings,
+    vector_db = Chroma(
         collection_name=collection_name,
+        embedding_function=embeddings,
         persist_directory=persist_directory
     )
+    progress = st.progress(0.0, text="Embedding chunks...")
+    IngestionPipeline(embeddings).run(
+        vector_db,
+        chunks,
+        on_progress=lambda done, total: progress.progress(
+            done / total, text=f"Embedded {done}/{total} chunks"
+        ),
+    )
+    progress.empty()
     logger.info("Vector store created successfully")
     return vector_db
 
@@ -209,23 +200,25 @@ def process_question(question: str, vector_db: Chroma, selected_model: str) -> s
     return response
 
 
-@st.cache_data
-def extract_all_pages_as_images(file_upload) -> List[Any]:
+def show_pdf_page(pdf_path: str, file_hash: str, width: int) -> None:
     """
-    Extract all pages from a PDF file as images.
+    Show one page of a PDF, picked with a page selector.
 
-    Args:
-        file_upload (st.UploadedFile): Streamlit file upload object containing the PDF.
+    Only the page on screen is rendered, at the requested width, and renders
+    are cached on disk and shared across sessions.
 
-    Returns:
-        List[Any]: A list of image objects representing each page of the PDF.
+    Args:
+        pdf_path (str): The PDF file.
+        file_hash (str): Hash of the file's content, the cache key.
+        width (int): Width of the page image in pixels.
     """
-    logger.info(f"Extracting all pages as images from file: {file_upload.name}")
-    pdf_pages = []
-    with pdfplumber.open(file_upload) as pdf:
-        pdf_pages = [page.to_image().original for page in pdf.pages]
-    logger.info("PDF pages extracted as images")
-    return pdf_pages
+    page = st.number_input(
+        "Page", min_value=1, max_value=page_renderer.page_count(pdf_path), key="page_input"
+    )
+    image = page_renderer.render(pdf_path, file_hash, page - 1, width)
+    if image is not None:
+        with st.container(height=410, border=True):
+            st.image(image, width=width)
 
 
 def delete_vector_db(vector_db: Optional[Chroma]) -> None:
@@ -238,7 +231,7 @@ def delete_vector_db(vector_db: Optional[Chroma]) -> None:
     logger.info("Deleting vector DB")
     if vector_db is not None:
         vector_db.delete_collection()
-        st.session_state.pop("pdf_pages", None)
+        st.session_state.pop("pdf_source", None)
         st.session_state.pop("file_upload", None)
         st.session_state.pop("vector_db", None)
         st.success("Collection and temporary files deleted successfully.")
@@ -256,10 +249,8 @@ def main() -> None:
     st.subheader("🧠 Ollama PDF RAG playground", divider="gray", anchor=False)
 
     # Get available models
-    models_info = ollama.list()
-    # available_models = extract_model_names(models_info)
-    # print(available_models)
-    print(models_info)
+    available_models = catalog.models()
+    logger.info(f"Available models: {available_models}")
     # Create layout
     col1, col2 = st.columns([1.5, 2])
 
@@ -290,7 +281,7 @@ def main() -> None:
         if st.session_state["vector_db"] is not None:
             st.session_state["vector_db"].delete_collection()
             st.session_state["vector_db"] = None
-            st.session_state["pdf_pages"] = None
+            st.session_state["pdf_source"] = None
         st.session_state["use_sample"] = use_sample
 
     if use_sample:
@@ -301,17 +292,15 @@ def main() -> None:
                 with st.spinner("Processing sample PDF..."):
                     loader = UnstructuredPDFLoader(file_path=sample_path)
                     data = loader.load()
-                    text_splitter = RecursiveCharacterTextSplitter(chunk_size=7500, chunk_overlap=100)
-                    chunks = text_splitter.split_documents(data)
+                    chunks = TokenChunker("nomic-embed-text").split_documents(data)
                     st.session_state["vector_db"] = Chroma.from_documents(
                         documents=chunks,
                         embedding=OllamaEmbeddings(model="nomic-embed-text"),
-                        collection_name="myRAG"
+                        collection_name=session_collection()
                     )
-                    # Open and display the sample PDF
-                    with pdfplumber.open(sample_path) as pdf:
-                        pdf_pages = [page.to_image().original for page in pdf.pages]
-                        st.session_state["pdf_pages"] = pdf_pages
+                    # Pages are rendered only when displayed
+                    with open(sample_path, "rb") as f:
+                        st.session_state["pdf_source"] = (sample_path, content_hash(f))
         else:
             st.error("Sample PDF file not found in the current directory.")
     else:
@@ -331,24 +320,18 @@ def main() -> None:
                     st.success("Vector database created successfully!")
 
 
-    # Display PDF if pages are available
-    # if "pdf_pages" in st.session_state and st.session_state["pdf_pages"]:
-    #     # PDF display controls
-    #     zoom_level = col1.slider(
-    #         "Zoom Level", 
-    #         min_value=100, 
-    #         max_value=1000, 
-    #         value=700, 
-    #         step=50,
-    #         key="zoom_slider"
-    #     )
-
-        # # Display PDF pages
-        # with col1:
-        #     with st.container(height=410, border=True):
-        #         # Removed the key parameter from st.image()
-        #         for page_image in st.session_state["pdf_pages"]:
-        #             st.image(page_image, width=zoom_level)
+    # Display the PDF page by page
+    if st.session_state.get("pdf_source"):
+        zoom_level = col1.slider(
+            "Zoom Level", 
+            min_value=100, 
+            max_value=1000, 
+            value=700, 
+            step=50,
+            key="zoom_slider"
+        )
+        with col1:
+            show_pdf_page(*st.session_state["pdf_source"], width=zoom_level)
 
     # Delete collection button
     delete_collection = col1.button(
@@ -0,0 +1,24 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "src"))
+
+import config  # noqa: E402
+from utils.fake_ollama import FakeOllamaServer  # noqa: E402
+
+# Keep collections and caches created by the tests out of the working directory
+_root = tempfile.mkdtemp(prefix="askyourdoc-tests-")
+config.EMBEDDING_CACHE_CONFIG["path"] = os.path.join(_root, "embeddings.sqlite3")
+config.RENDER_CONFIG["cache_dir"] = os.path.join(_root, "pages")
+config.COLLECTIONS_CONFIG["root"] = os.path.join(_root, "collections")
+
+
+@pytest.fixture(scope="session")
+def ollama_server():
+    """A local stand-in for Ollama, used by every client of this process."""
+    with FakeOllamaServer() as server:
+        config.OLLAMA_CONFIG["host"] = server.url
+        yield server
@@ -0,0 +1,121 @@
+import io
+import os
+import threading
+import time
+
+import pytest
+
+import config
+from rag_manger.collection_manager import collection_manager
+from rag_manger.jobs import CANCELLED, DONE, QUEUED, SKIPPED, JobManager
+from utils.utils import content_hash, spill_to_file
+
+LLM_MODEL = "llama3.2:latest"
+EMBEDDINGS_MODEL = "nomic-embed-text:latest"
+
+
+@pytest.fixture
+def manager():
+    manager = JobManager(max_workers=1)
+    yield manager
+    manager._executor.shutdown(wait=True)
+    if manager._parser is not None:
+        manager._parser.shutdown(wait=True)
+
+
+@pytest.fixture
+def busy(manager):
+    """Occupy the only job worker until set, so submitted jobs stay queued."""
+    release = threading.Event()
+    manager._executor.submit(release.wait, 10)
+    yield release
+    release.set()
+
+
+def text_file(seed: str, paragraphs: int = 3) -> bytes:
+    return "\n\n".join(
+        f"Paragraph {i} about {seed}: " + " ".join(f"{seed}{i}w{j}" for j in range(60))
+        for i in range(paragraphs)
+    ).encode()
+
+
+def submit(manager: JobManager, collection: str, name: str, data: bytes):
+    path = spill_to_file(io.BytesIO(data))
+    job = manager.submit(collection, name, path, content_hash(data), LLM_MODEL, EMBEDDINGS_MODEL)
+    return job, path
+
+
+def wait_finished(job, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not job.finished:
+        assert time.monotonic() < deadline, f"job still {job.status}"
+        time.sleep(0.01)
+
+
+def test_same_file_joins_the_unfinished_job(manager, busy):
+    data = text_file("dedup")
+    first, first_path = submit(manager, "jobs-dedup", "a.txt", data)
+    second, second_path = submit(manager, "jobs-dedup", "copy-of-a.txt", data)
+    assert second is first
+    assert first.status == QUEUED
+    # The duplicate upload is dropped, the job keeps its own file
+    assert not os.path.exists(second_path)
+    assert os.path.exists(first_path)
+
+    other, _ = submit(manager, "jobs-dedup", "b.txt", text_file("other"))
+    elsewhere, _ = submit(manager, "jobs-dedup-2", "a.txt", data)
+    assert len({first.job_id, other.job_id, elsewhere.job_id}) == 3
+    assert [job.source for job in manager.list("jobs-dedup")] == ["a.txt", "b.txt"]
+    manager.cancel("jobs-dedup")
+    manager.cancel("jobs-dedup-2")
+
+
+def test_cancelled_queued_job_never_runs(manager, busy):
+    job, path = submit(manager, "jobs-cancel-queued", "a.txt", text_file("queued"))
+    assert manager.cancel("jobs-cancel-queued") == [job]
+    busy.set()
+    wait_finished(job)
+    assert job.status == CANCELLED
+    assert job.started_at is None
+    assert not os.path.exists(path)
+    assert manager._parsing == {}
+    # Only unfinished jobs are joined, so the file can be submitted again
+    again, _ = submit(manager, "jobs-cancel-queued", "a.txt", text_file("queued"))
+    assert again is not job
+    manager.cancel("jobs-cancel-queued")
+
+
+def test_finished_file_is_skipped(manager, ollama_server):
+    data = text_file("finished")
+    job, path = submit(manager, "jobs-finished", "a.txt", data)
+    wait_finished(job)
+    assert job.status == DONE
+    assert job.chunks_done > 0
+    assert not os.path.exists(path)
+    rag = collection_manager.get("jobs-finished", LLM_MODEL, EMBEDDINGS_MODEL)
+    assert [record.doc_id for record in rag.list_documents()] == [job.doc_id]
+
+    again, _ = submit(manager, "jobs-finished", "a.txt", data)
+    wait_finished(again)
+    assert again is not job
+    assert again.status == SKIPPED
+
+
+def test_cancel_running_job_removes_its_chunks(manager, ollama_server, monkeypatch):
+    # One slow batch of two chunks at a time, so the job is cancelled midway
+    monkeypatch.setitem(config.INGESTION_CONFIG, "batch_size", 2)
+    monkeypatch.setitem(config.INGESTION_CONFIG, "max_workers", 1)
+    monkeypatch.setattr(ollama_server, "embed_latency", 0.05)
+    job, path = submit(manager, "jobs-cancel-running", "a.txt", text_file("running", 200))
+    deadline = time.monotonic() + 30
+    while not job.chunks_done:
+        assert time.monotonic() < deadline and not job.finished
+        time.sleep(0.01)
+    assert manager.cancel("jobs-cancel-running") == [job]
+    wait_finished(job)
+
+    assert job.status == CANCELLED
+    assert not os.path.exists(path)
+    rag = collection_manager.get("jobs-cancel-running", LLM_MODEL, EMBEDDINGS_MODEL)
+    assert rag.list_documents() == []
+    assert rag.load_vector_db().get()["ids"] == []
@@ -0,0 +1,139 @@
+from typing import List
+
+import numpy as np
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from rag_manger.numpy_store import NumpyVectorStore
+
+DIM = 32
+
+
+class RandomEmbeddings(Embeddings):
+    """Embeds every text to a fixed random vector, derived from the text."""
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        seed = sum(map(ord, text))
+        return np.random.default_rng(seed).standard_normal(DIM).tolist()
+
+
+def random_rows(count: int, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).standard_normal((count, DIM)).astype(np.float32)
+
+
+def fill(store: NumpyVectorStore, vectors: np.ndarray) -> List[str]:
+    ids = [f"chunk-{i}" for i in range(len(vectors))]
+    store.upsert_embeddings(
+        ids,
+        vectors.tolist(),
+        [f"text {i}" for i in range(len(vectors))],
+        [{"source": f"doc-{i % 3}.pdf", "page": i % 5} for i in range(len(vectors))],
+    )
+    return ids
+
+
+def exact_top_k(vectors: np.ndarray, ids: List[str], query: np.ndarray, k: int):
+    unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = unit @ (query / np.linalg.norm(query))
+    order = np.argsort(-scores)[:k]
+    return [ids[i] for i in order], scores[order]
+
+
+def search(store: NumpyVectorStore, query: np.ndarray, k: int, filter=None):
+    results = store.similarity_search_by_vector_with_scores(query.tolist(), k, filter)
+    return [doc.id for doc, _ in results], np.array([score for _, score in results])
+
+
+def test_top_k_matches_brute_force():
+    store = NumpyVectorStore(RandomEmbeddings())
+    vectors = random_rows(500)
+    ids = fill(store, vectors)
+    for query in random_rows(20, seed=1):
+        expected_ids, expected_scores = exact_top_k(vectors, ids, query, 10)
+        found_ids, found_scores = search(store, query, 10)
+        assert found_ids == expected_ids
+        np.testing.assert_allclose(found_scores, expected_scores, rtol=1e-5, atol=1e-6)
+
+
+def test_top_k_skips_deleted_and_replaced_rows():
+    store = NumpyVectorStore(RandomEmbeddings())
+    vectors = random_rows(200)
+    ids = fill(store, vectors)
+    store.delete(ids[:50])
+    replaced = random_rows(50, seed=2)
+    store.upsert_embeddings(ids[50:100], replaced.tolist(), ["new"] * 50, [{}] * 50)
+    vectors[50:100] = replaced
+    assert store.count() == 150
+
+    query = random_rows(1, seed=3)[0]
+    expected_ids, _ = exact_top_k(vectors[50:], ids[50:], query, 20)
+    assert search(store, query, 20)[0] == expected_ids
+
+
+def test_top_k_with_filter():
+    store = NumpyVectorStore(RandomEmbeddings())
+    vectors = random_rows(300)
+    ids = fill(store, vectors)
+    rows = [i for i in range(300) if i % 3 == 1]
+    query = random_rows(1, seed=4)[0]
+    expected_ids, _ = exact_top_k(vectors[rows], [ids[i] for i in rows], query, 5)
+    assert search(store, query, 5, {"source": "doc-1.pdf"})[0] == expected_ids
+
+
+def test_k_larger_than_collection():
+    store = NumpyVectorStore(RandomEmbeddings())
+    fill(store, random_rows(3))
+    assert len(search(store, random_rows(1, seed=5)[0], 10)[0]) == 3
+
+
+@pytest.mark.parametrize("mmap", [False, True])
+def test_persist_and_reload(tmp_path, mmap):
+    store = NumpyVectorStore(RandomEmbeddings(), persist_directory=str(tmp_path), mmap=mmap)
+    vectors = random_rows(300)
+    ids = fill(store, vectors)
+    store.delete(ids[:10])
+    store.persist()
+    # Rows added after a persist are kept in RAM until the next one
+    extra = random_rows(1, seed=6)
+    store.upsert_embeddings(["extra"], extra.tolist(), ["extra"], [{}])
+    store.persist()
+
+    reloaded = NumpyVectorStore(RandomEmbeddings(), persist_directory=str(tmp_path), mmap=mmap)
+    assert reloaded.count() == 291
+    assert reloaded.get(ids=[ids[0]])["ids"] == []
+    assert reloaded.get(ids=[ids[10]])["metadatas"] == [{"source": "doc-1.pdf", "page": 0}]
+    query = random_rows(1, seed=7)[0]
+    expected_ids, expected_scores = exact_top_k(
+        np.vstack([vectors[10:], extra]), ids[10:] + ["extra"], query, 15
+    )
+    found_ids, found_scores = search(reloaded, query, 15)
+    assert found_ids == expected_ids
+    np.testing.assert_allclose(found_scores, expected_scores, rtol=1e-5, atol=1e-6)
+
+
+def test_quantized_store_reloads_its_codes(tmp_path):
+    store = NumpyVectorStore(
+        RandomEmbeddings(), persist_directory=str(tmp_path), quantization="int8"
+    )
+    vectors = random_rows(200)
+    ids = fill(store, vectors)
+    store.persist()
+
+    reloaded = NumpyVectorStore(
+        RandomEmbeddings(), persist_directory=str(tmp_path), quantization="int8"
+    )
+    # A stored vector is its own nearest neighbour
+    for i in (0, 57, 199):
+        assert search(reloaded, vectors[i], 1)[0] == [ids[i]]
+
+
+def test_delete_collection_removes_persisted_files(tmp_path):
+    store = NumpyVectorStore(RandomEmbeddings(), persist_directory=str(tmp_path))
+    fill(store, random_rows(10))
+    store.persist()
+    store.delete_collection()
+    assert store.count() == 0
+    assert NumpyVectorStore(RandomEmbeddings(), persist_directory=str(tmp_path)).count() == 0
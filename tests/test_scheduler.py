@@ -0,0 +1,76 @@
+import threading
+import time
+
+from rag_manger.scheduler import FairLimiter
+
+
+def wait_until(condition, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def queue(limiter: FairLimiter, requests, order: list) -> list:
+    """Queue ``(client, label)`` requests one after another, recording the order they run in."""
+
+    def run(client: str, label: str) -> None:
+        with limiter.slot(client):
+            order.append(label)
+
+    threads = []
+    for client, label in requests:
+        depth = limiter.queue_depth
+        thread = threading.Thread(target=run, args=(client, label))
+        thread.start()
+        wait_until(lambda: limiter.queue_depth == depth + 1)
+        threads.append(thread)
+    return threads
+
+
+def test_waiting_clients_take_turns():
+    limiter = FairLimiter(1)
+    order = []
+    with limiter.slot("busy"):
+        threads = queue(
+            limiter, [("a", "a1"), ("a", "a2"), ("a", "a3"), ("b", "b1"), ("c", "c1")], order
+        )
+    for thread in threads:
+        thread.join(5)
+    # Client a queued first but only gets every third turn while others wait
+    assert order == ["a1", "b1", "c1", "a2", "a3"]
+    assert limiter.active == 0
+    assert limiter.queue_depth == 0
+
+
+def test_requests_of_one_client_run_in_order():
+    limiter = FairLimiter(1)
+    order = []
+    with limiter.slot("busy"):
+        threads = queue(limiter, [("a", f"a{i}") for i in range(5)], order)
+    for thread in threads:
+        thread.join(5)
+    assert order == [f"a{i}" for i in range(5)]
+
+
+def test_concurrency_is_capped():
+    limiter = FairLimiter(2)
+    running, peak = [0], [0]
+    lock = threading.Lock()
+
+    def run(client: str) -> None:
+        with limiter.slot(client):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.01)
+            with lock:
+                running[0] -= 1
+
+    threads = [threading.Thread(target=run, args=(f"client-{i % 3}",)) for i in range(12)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert peak[0] == 2
+    assert limiter.active == 0